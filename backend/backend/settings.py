@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 
@@ -54,17 +55,26 @@ AUTH_USER_MODEL = 'users.CustomUser'
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
-    'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
-
-    # кастомные middleware для логирования
+    # встроенные middleware Django: в async-режиме хуки без ввода-вывода выполняются
+    # в event loop, а не в отдельном потоке (users.middleware.NonBlockingHooksMixin)
+    'users.middleware.SecurityMiddleware',
+    # сжатие ответов; до middleware, которые читают тело ответа
+    'users.middleware.CompressionMiddleware',
+    'users.middleware.SessionMiddleware',
+    'users.middleware.CommonMiddleware',
+    'users.middleware.CsrfViewMiddleware',
+    'users.middleware.AuthenticationMiddleware',
+    'users.middleware.MessageMiddleware',
+    'users.middleware.XFrameOptionsMiddleware',
+
+    # кастомные middleware для трассировки и логирования
+    'users.middleware.TracingMiddleware',
     'users.middleware.RequestResponseLoggingMiddleware',
     'users.middleware.ErrorLoggingMiddleware',
+    # профилирование запросов по флагу (только staff)
+    'users.middleware.ProfilingMiddleware',
+    # бюджеты запросов к БД (включается QUERY_BUDGET_MODE)
+    'users.middleware.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -149,10 +159,44 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Профили SQLite. tuned (по умолчанию):
+# - WAL: читатели не блокируются писателем, пишет один процесс за раз;
+# - synchronous=NORMAL: fsync только на чекпоинтах WAL (в WAL это не нарушает целостность БД);
+# - busy_timeout (timeout): ожидание блокировки вместо мгновенной ошибки "database is locked";
+# - transaction_mode=IMMEDIATE: транзакция сразу берет блокировку записи и не падает
+#   при попытке повысить блокировку чтения до записи;
+# - mmap и кеш страниц уменьшают число системных вызовов при чтении.
+# DJANGO_SQLITE_PROFILE=default — настройки SQLite по умолчанию (для сравнения в бенчмарке)
+SQLITE_PROFILES = {
+    'default': {
+        'OPTIONS': {},
+        'CONN_MAX_AGE': 0,
+    },
+    'tuned': {
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA cache_size=-65536;'
+                'PRAGMA temp_store=MEMORY'
+            ),
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Соединение переиспользуется между запросами, прагмы выполняются один раз
+        'CONN_MAX_AGE': 600,
+    },
+}
+SQLITE_PROFILE = os.environ.get('DJANGO_SQLITE_PROFILE', 'tuned')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_PROFILES[SQLITE_PROFILE]['OPTIONS'],
+        'CONN_MAX_AGE': SQLITE_PROFILES[SQLITE_PROFILE]['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -211,17 +255,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        # JWT первым: запросы с токеном не проверяют сессию, а 401 содержит WWW-Authenticate
+        'users.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # orjson вместо json + JSONEncoder; без установленного orjson — стандартное поведение DRF
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'users.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'users.renderers.ORJSONParser',
         'rest_framework.parsers.MultiPartParser',
         'rest_framework.parsers.FormParser',
     ],
@@ -234,8 +280,94 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    # Ротация с отзывом старого токена через users.RevokedToken
+    'TOKEN_REFRESH_SERIALIZER': 'users.tokens.TokenRefreshSerializer',
 }
 
+# Отозванные refresh-токены: фильтр Блума в памяти каждого процесса перед запросом к БД.
+# Новые отзывы из других процессов подхватываются не реже раза в TOKEN_BLACKLIST_SYNC_SECONDS;
+# истекшие записи удаляет prune_token_blacklist (например, по cron раз в сутки)
+TOKEN_BLACKLIST_SYNC_SECONDS = 5
+TOKEN_BLACKLIST_FILTER_CAPACITY = 100000
+TOKEN_BLACKLIST_FP_RATE = 0.01
+
+# Cache
+# Локальный кеш процесса. При нескольких воркерах используйте общий кеш (Redis/Memcached):
+# снимки пользователей JWT-аутентификации кешируются только в общем кеше
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Сжатие ответов (CompressionMiddleware). Кодировки в порядке предпочтения сервера;
+# br и zstd требуют пакетов brotli и zstandard, без них используется gzip
+RESPONSE_COMPRESSION_ENCODINGS = ['zstd', 'br', 'gzip']
+# Меньшие ответы отдаются как есть: выигрыш меньше накладных расходов
+RESPONSE_COMPRESSION_MIN_BYTES = 1024
+# Маршруты, ответы которых не сжимаются (BREACH): в них токены рядом с данными из запроса,
+# и по размеру сжатого ответа можно подбирать секрет
+RESPONSE_COMPRESSION_EXCLUDE_VIEWS = ['users:register', 'users:login', 'users:token_refresh']
+# Уже сжатые форматы (файлы пользователей из download_file_view)
+RESPONSE_COMPRESSION_SKIP_TYPES = [
+    'image/', 'audio/', 'video/', 'application/zip', 'application/gzip', 'application/octet-stream',
+]
+# Кеш сжатых вариантов (по хешу содержимого) для ответов до указанного размера
+RESPONSE_COMPRESSION_CACHE_MAX_BYTES = 1024 * 1024
+RESPONSE_COMPRESSION_CACHE_TIMEOUT = 300
+
+# Очередь фоновых задач в БД (users.utils.task_queue, manage.py run_workers)
+# Через сколько секунд взятая, но не завершенная задача снова доступна другим воркерам
+TASK_QUEUE_VISIBILITY_TIMEOUT = 300
+TASK_QUEUE_MAX_ATTEMPTS = 5
+# Задержка перед повтором (секунды): удваивается с каждой попыткой, но не больше максимума
+TASK_QUEUE_RETRY_BACKOFF = 10
+TASK_QUEUE_RETRY_BACKOFF_MAX = 3600
+TASK_QUEUE_POLL_INTERVAL = 1.0
+
+# Миниатюры изображений (UserFilePreview): сторона квадрата, формат Pillow и качество
+THUMBNAIL_SIZE = 256
+THUMBNAIL_FORMAT = 'WEBP'
+THUMBNAIL_QUALITY = 80
+# Кеширование миниатюр браузером (секунды); содержимое файла не меняется
+THUMBNAIL_CACHE_MAX_AGE = 7 * 24 * 3600
+# Миниатюры строятся только для файлов не больше этого размера: исходник расшифровывается целиком
+THUMBNAIL_MAX_SOURCE_BYTES = 20 * 1024 * 1024
+# Retry-After (секунды) для 202, пока миниатюру строит воркер очереди
+THUMBNAIL_RETRY_AFTER = 2
+
+# Число пиков волны аудиофайла (UserFile.metadata['audio']['peaks'], значения 0..255)
+AUDIO_PEAKS_POINTS = 200
+# Анализ аудио пропускается для файлов больше этого размера: файл расшифровывается
+# и декодируется в PCM целиком (после декодирования объем вырастает в разы)
+AUDIO_ANALYSIS_MAX_BYTES = 50 * 1024 * 1024
+
+# Загрузка по частям (UploadSession): размер части не больше DATA_UPLOAD_MAX_MEMORY_SIZE,
+# так как тело PUT читается в память целиком; в памяти запроса — одна часть
+CHUNKED_UPLOAD_CHUNK_SIZE = 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = 200 * 1024 * 1024
+# Незавершенные сессии удаляются вместе с сегментами через сутки
+CHUNKED_UPLOAD_SESSION_TTL = 24 * 3600
+
+# Ключ HMAC для слепых индексов (поиск по зашифрованным email/имени).
+# Если не задан, выводится из SECRET_KEY; смена ключа требует backfill_blind_index --all
+BLIND_INDEX_KEY = None
+
+# Фильтр Блума утекших паролей для PasswordStrengthValidator (собирается build_password_filter).
+# Файл отображается в память и разделяется всеми воркерами; если его нет, проверка пропускается
+PASSWORD_BLOOM_FILTER_PATH = BASE_DIR / 'data' / 'breached_passwords.bloom'
+
+# Квота хранилища пользователя (суммарный размер файлов в байтах); None — без ограничения
+USER_STORAGE_QUOTA_BYTES = 500 * 1024 * 1024
+
+# Кеш снимков пользователей JWT-аутентификации. Сброс снимка при деактивации или смене пароля
+# должен быть виден всем воркерам, поэтому с LocMemCache/DummyCache снимки не кешируются
+# (пользователь загружается при каждом запросе). Для кеширования укажите алиас общего кеша,
+# например 'users' с RedisCache; None — не кешировать
+JWT_USER_CACHE_ALIAS = 'default'
+# Время жизни снимка пользователя в кеше JWT-аутентификации (секунды)
+JWT_USER_CACHE_TIMEOUT = 60
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -244,6 +376,42 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Request profiling settings
+# Включается заголовком X-Profile: 1 или параметром ?_profile=1 (только для staff).
+# По умолчанию только в DEBUG: в продакшене профилирование включается явно
+REQUEST_PROFILING_ENABLED = DEBUG
+REQUEST_PROFILING_DIR = BASE_DIR / 'logs' / 'profiles'
+REQUEST_PROFILING_TOP_N = 25
+# Сколько последних профилей хранить на диске; более старые удаляются при сохранении нового
+REQUEST_PROFILING_MAX_PROFILES = 200
+
+# Query budgets
+# Пределы на запрос к маршруту: число SQL-запросов, суммарное время SQL (секунды)
+# и объем выбранных данных (байты). Проверяются тестами (QueryBudgetTestMixin)
+# и middleware: QUERY_BUDGET_MODE = 'off' | 'log' | 'raise'
+QUERY_BUDGET_MODE = 'off'
+QUERY_BUDGETS = {
+    # две проверки уникальности (username, email_bidx) и один INSERT в savepoint
+    # (SAVEPOINT/RELEASE: при гонке за email откатывается только INSERT)
+    'users:register': {'queries': 5, 'bytes': 1024},
+    'users:login': {'queries': 2, 'bytes': 4 * 1024},
+    # пользователь (при промахе кеша), версия для ETag, профиль, агрегаты хранилища
+    'users:profile': {'queries': 4, 'bytes': 4 * 1024},
+    # без содержимого файлов: блобы сразу выходят за лимит по байтам
+    'users:files': {'queries': 3, 'bytes': 64 * 1024},
+    # пользователь, ETag, файл без содержимого, миниатюра (без исходного изображения)
+    'users:file_thumbnail': {'queries': 4, 'bytes': 64 * 1024},
+    'users:weather': {'queries': 2, 'bytes': 16 * 1024},
+}
+
+# Tracing settings
+# Span'ы (views, шифрование, БД, парсер погоды) экспортируются в JSON-lines файл
+TRACING_ENABLED = False
+TRACING_EXPORTER = 'users.utils.tracing.JsonLinesExporter'
+TRACING_EXPORTER_OPTIONS = {
+    'path': BASE_DIR / 'logs' / 'traces.jsonl',
+}
+
 # Media files settings
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Ключ шифрования выводится до fork воркеров (при preload), а не в первом запросе
+from users.utils.encryption import warm_up  # noqa: E402
+
+warm_up()
@@ -0,0 +1,55 @@
+"""
+Бенчмарки производительности backend.
+
+Запуск из каталога backend:
+    python -m benchmarks.<модуль> [опции]
+
+Бенчмарки работают с временной тестовой БД и не трогают db.sqlite3.
+"""
+import logging
+import os
+import statistics
+import time
+
+
+def setup_django(quiet=True):
+    """Инициализация Django и создание временной тестовой БД"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    if quiet:
+        # Логи запросов не должны влиять на замеры и засорять вывод
+        logging.disable(logging.CRITICAL)
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+
+def measure(func, repeat=5, number=1):
+    """
+    Запускает func() repeat раз по number вызовов.
+    Возвращает медианное и минимальное время одного вызова (в секундах).
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        'median': statistics.median(timings),
+        'min': min(timings),
+    }
+
+
+def print_table(rows, columns):
+    """Простой табличный вывод результатов"""
+    widths = [max(len(str(col)), *(len(str(row.get(col, ''))) for row in rows)) for col in columns]
+    print('  '.join(str(col).ljust(width) for col, width in zip(columns, widths)))
+    print('  '.join('-' * width for width in widths))
+    for row in rows:
+        print('  '.join(str(row.get(col, '')).ljust(width) for col, width in zip(columns, widths)))
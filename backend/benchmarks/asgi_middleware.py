@@ -0,0 +1,161 @@
+"""
+Пропускная способность ASGI, цепочка MIDDLEWARE до и после перехода на async:
+до — кастомные middleware на MiddlewareMixin с синхронным __call__ (Django выполняет
+их в sync-режиме) и стандартные встроенные middleware Django; после — AsyncCapableMiddleware
+и встроенные middleware с NonBlockingHooksMixin.
+
+    python -m benchmarks.asgi_middleware --requests 2000 --concurrency 20
+"""
+import argparse
+import asyncio
+import time
+
+from . import print_table, setup_django
+
+
+def mixin_baseline(cls):
+    """Прежняя версия middleware: MiddlewareMixin, вся логика в синхронном __call__"""
+    from django.utils.deprecation import MiddlewareMixin
+
+    class Baseline(MiddlewareMixin):
+        sync_capable = True
+        async_capable = False
+
+        def __init__(self, get_response):
+            super().__init__(get_response)
+            self.middleware = cls(get_response)
+            if hasattr(self.middleware, 'process_exception'):
+                self.process_exception = self.middleware.process_exception
+
+        def __call__(self, request):
+            return self.middleware(request)
+
+    Baseline.__name__ = Baseline.__qualname__ = f'Baseline{cls.__name__}'
+    return Baseline
+
+
+def middleware_variants(base):
+    """MIDDLEWARE до (стандартные встроенные и кастомные на MiddlewareMixin) и после перехода"""
+    from django.utils.module_loading import import_string
+    from users.middleware import NonBlockingHooksMixin
+
+    baseline = []
+    for name in base:
+        cls = import_string(name)
+        if issubclass(cls, NonBlockingHooksMixin):
+            # Исходный класс Django, например django.middleware.csrf.CsrfViewMiddleware
+            django_cls = cls.__bases__[1]
+            name = f'{django_cls.__module__}.{django_cls.__name__}'
+        elif name.startswith('users.middleware.'):
+            cls = mixin_baseline(cls)
+            globals()[cls.__name__] = cls
+            name = f'{__name__}.{cls.__name__}'
+        baseline.append(name)
+    return {'before': baseline, 'after': list(base)}
+
+
+def create_fixtures():
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from users.models import CustomUser, WeatherData
+
+    user = CustomUser.objects.create_user(username='bench', password='BenchPass123!')
+    user.save_encrypted_data({'email': 'bench@example.com', 'first_name': 'Bench', 'last_name': 'User'})
+    user.save()
+    WeatherData.objects.bulk_create([
+        WeatherData(temperature=f'+{i}°C', description='Ясно', source_url='https://example.com')
+        for i in range(20)
+    ])
+    return str(RefreshToken.for_user(user).access_token)
+
+
+async def call(app, path, token):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [
+            (b'host', b'testserver'),
+            (b'authorization', f'Bearer {token}'.encode()),
+        ],
+        'client': ('127.0.0.1', 12345),
+        'server': ('testserver', 80),
+    }
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            await asyncio.sleep(3600)
+        received = True
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    status = None
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await app(scope, receive, send)
+    return status
+
+
+async def run_load(app, path, token, total, concurrency):
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            if await call(app, path, token) != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000, help='Количество запросов на эндпоинт')
+    parser.add_argument('--concurrency', type=int, default=20, help='Число одновременных запросов')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.core.handlers.asgi import ASGIHandler
+    from django.test.utils import override_settings
+
+    token = create_fixtures()
+
+    rows = []
+    for path in ('/api/auth/weather/', '/api/auth/profile/'):
+        for variant, middleware in middleware_variants(settings.MIDDLEWARE).items():
+            with override_settings(MIDDLEWARE=middleware):
+                app = ASGIHandler()
+                # Прогрев (соединения с БД, кеши URL-резолвера)
+                asyncio.run(run_load(app, path, token, 50, args.concurrency))
+                duration, errors = asyncio.run(run_load(app, path, token, args.requests, args.concurrency))
+            rows.append({
+                'path': path,
+                'middleware': variant,
+                'requests': args.requests,
+                'seconds': f'{duration:.3f}',
+                'req/s': f'{args.requests / duration:.1f}',
+                'errors': errors,
+            })
+
+    print_table(rows, ['path', 'middleware', 'requests', 'seconds', 'req/s', 'errors'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Сериализация ответов API в JSON: стандартные JSONRenderer/JSONParser DRF
+против ORJSONRenderer/ORJSONParser на списке файлов (user_files_view)
+и истории погоды (weather_view).
+
+    python -m benchmarks.json_render --sizes 100 1000 10000 --repeat 5
+"""
+import argparse
+import io
+import sys
+
+from . import measure, print_table, setup_django
+
+
+def files_payload(size):
+    """Как в user_files_view: словари с datetime, сериализуемым рендерером"""
+    from django.utils import timezone
+
+    now = timezone.now()
+    return [{
+        'id': i,
+        'name': f'Фото_{i}.png',
+        'size': 1024 * (i % 500 + 1),
+        'type': 'image/png',
+        'description': 'Загружено с телефона',
+        'uploaded_at': now,
+    } for i in range(size)]
+
+
+def weather_payload(size):
+    """Как в weather_view: ReturnList из WeatherSerializer"""
+    from django.utils import timezone
+
+    from users.models import WeatherData
+    from users.serializers import WeatherSerializer
+
+    now = timezone.now()
+    history = WeatherSerializer([
+        WeatherData(id=i, date=now, temperature='+5°C', description='Облачно, небольшой снег',
+                    source_url='https://www.gismeteo.ru/')
+        for i in range(size)
+    ], many=True).data
+    return {'current': history[0], 'history': history[::-1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000], help='Число записей в ответе')
+    parser.add_argument('--repeat', type=int, default=5, help='Число повторов каждого замера')
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+
+    from users import renderers
+
+    if renderers.orjson is None:
+        print('orjson не установлен: ORJSONRenderer использует стандартный рендерер', file=sys.stderr)
+
+    stock_renderer, fast_renderer = JSONRenderer(), renderers.ORJSONRenderer()
+    stock_parser, fast_parser = JSONParser(), renderers.ORJSONParser()
+    rows = []
+    for name, build in (('files', files_payload), ('weather', weather_payload)):
+        for size in args.sizes:
+            data = build(size)
+            body = stock_renderer.render(data)
+            number = max(1, 10000 // size)
+            timings = {
+                'render stock': measure(lambda: stock_renderer.render(data), args.repeat, number),
+                'render orjson': measure(lambda: fast_renderer.render(data), args.repeat, number),
+                'parse stock': measure(lambda: stock_parser.parse(io.BytesIO(body)), args.repeat, number),
+                'parse orjson': measure(lambda: fast_parser.parse(io.BytesIO(body)), args.repeat, number),
+            }
+            row = {'payload': f'{name}[{size}]', 'KB': f'{len(body) / 1024:.1f}'}
+            for label, timing in timings.items():
+                row[f'{label} ms'] = f"{timing['min'] * 1000:.3f}"
+            for op in ('render', 'parse'):
+                row[f'{op} speedup'] = f"x{timings[f'{op} stock']['min'] / timings[f'{op} orjson']['min']:.1f}"
+            rows.append(row)
+
+    print_table(rows, ['payload', 'KB', 'render stock ms', 'render orjson ms', 'render speedup',
+                       'parse stock ms', 'parse orjson ms', 'parse speedup'])
+
+
+if __name__ == '__main__':
+    main()
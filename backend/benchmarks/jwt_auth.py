@@ -0,0 +1,58 @@
+"""
+JWT-аутентификация: стандартный JWTAuthentication (полная строка пользователя на каждый
+запрос) против CachedJWTAuthentication (кеш снимков без тяжелых колонок).
+
+    python -m benchmarks.jwt_auth --requests 2000 --media-size 1048576
+"""
+import argparse
+
+from . import measure, print_table, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='Число аутентификаций на замер')
+    parser.add_argument('--media-size', type=int, default=1024 * 1024,
+                        help='Размер зашифрованного медиа пользователя в байтах')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from users.authentication import CachedJWTAuthentication
+    from users.models import CustomUser, UserMedia
+
+    user = CustomUser.objects.create_user(username='bench', password='BenchPass123!')
+    user.save_encrypted_data({'email': 'bench@example.com', 'first_name': 'Bench', 'last_name': 'User'})
+    user.save()
+    UserMedia.objects.create(user=user, encrypted_media=b'x' * args.media_size)
+
+    token = str(RefreshToken.for_user(user).access_token)
+    request = Request(APIRequestFactory().get('/api/auth/profile/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+
+    rows = []
+    for name, authenticator in (('JWTAuthentication', JWTAuthentication()),
+                                ('CachedJWTAuthentication', CachedJWTAuthentication())):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(args.requests):
+                authenticator.authenticate(request)
+        timing = measure(lambda: authenticator.authenticate(request), repeat=5, number=args.requests)
+        rows.append({
+            'authenticator': name,
+            'queries/request': f'{len(queries) / args.requests:.3f}',
+            'us/request (median)': f"{timing['median'] * 1e6:.1f}",
+            'us/request (min)': f"{timing['min'] * 1e6:.1f}",
+        })
+
+    print_table(rows, ['authenticator', 'queries/request', 'us/request (median)', 'us/request (min)'])
+
+
+if __name__ == '__main__':
+    main()
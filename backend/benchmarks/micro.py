@@ -0,0 +1,194 @@
+"""
+Микробенчмарки строительных блоков запроса: шифрование, профиль пользователя,
+сериализаторы и валидатор паролей. Результаты выводятся таблицей и в JSON
+и сравниваются с сохраненной базовой линией.
+
+    python -m benchmarks.micro                      # замер и сравнение с baseline
+    python -m benchmarks.micro --update-baseline    # сохранить результаты как baseline
+    python -m benchmarks.micro --filter crypto --threshold 0.25 --json results.json
+
+Код возврата 1, если хотя бы один замер медленнее baseline больше чем на threshold.
+Базовая линия зависит от машины: обновляйте ее на той же машине, где идет сравнение.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+
+from . import measure, print_table, setup_django
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+CRYPTO_SIZES = (1024, 64 * 1024, 1024 * 1024, 10 * 1024 * 1024)
+PROFILE_BATCHES = (1, 10, 100)
+WEATHER_BATCHES = (1, 100, 1000)
+
+
+def size_label(size):
+    return f'{size // (1024 * 1024)}MB' if size >= 1024 * 1024 else f'{size // 1024}KB'
+
+
+def crypto_cases():
+    from users.utils.encryption import encryptor
+
+    for size in CRYPTO_SIZES:
+        payload = os.urandom(size)
+        ciphertext = encryptor.encrypt_data(payload)
+        # Большие блоки — меньше повторов, чтобы замер укладывался в секунды
+        number = max(1, (4 * 1024 * 1024) // size)
+        yield f'crypto.encrypt_data[{size_label(size)}]', lambda p=payload: encryptor.encrypt_data(p), number, size
+        yield (f'crypto.decrypt_binary[{size_label(size)}]',
+               lambda c=ciphertext: encryptor.decrypt_binary(c), number, size)
+
+
+def profile_cases():
+    from users.models import CustomUser
+
+    profile = {'email': 'bench@example.com', 'first_name': 'Иван', 'last_name': 'Петров'}
+    user = CustomUser(username='bench')
+
+    def round_trip():
+        user.save_encrypted_data(profile)
+        user.get_decrypted_data()
+
+    yield 'model.profile_round_trip', round_trip, 200, None
+
+
+def serializer_cases():
+    from django.utils import timezone
+
+    from users.models import CustomUser, WeatherData
+    from users.serializers import UserProfileSerializer, WeatherSerializer
+
+    users = []
+    for i in range(max(PROFILE_BATCHES)):
+        user = CustomUser(username=f'bench{i}', date_joined=timezone.now())
+        user.save_encrypted_data({'email': f'bench{i}@example.com', 'first_name': 'Иван', 'last_name': 'Петров'})
+        users.append(user)
+    CustomUser.objects.bulk_create(users)
+    users = list(CustomUser.objects.order_by('pk'))
+
+    for batch in PROFILE_BATCHES:
+        # Один сериализатор на объект, как в user_profile_view
+        yield (f'serializer.user_profile[x{batch}]',
+               lambda b=batch: [UserProfileSerializer(user).data for user in users[:b]], max(1, 100 // batch), None)
+
+    now = timezone.now()
+    weather = [WeatherData(id=i, date=now, temperature='+5°C', description='Облачно',
+                           source_url='https://www.gismeteo.ru/') for i in range(max(WEATHER_BATCHES))]
+    for batch in WEATHER_BATCHES:
+        yield (f'serializer.weather[x{batch}]',
+               lambda b=batch: WeatherSerializer(weather[:b], many=True).data, max(1, 1000 // batch), None)
+
+
+def validator_cases():
+    from django.core.exceptions import ValidationError
+
+    from users.validators import PasswordStrengthValidator
+
+    validator = PasswordStrengthValidator()
+
+    def validate_weak():
+        try:
+            validator.validate('qwerty')
+        except ValidationError:
+            pass
+
+    yield 'validator.password_strong', lambda: validator.validate('Xk7#mRq2vLp9'), 1000, None
+    yield 'validator.password_weak', validate_weak, 1000, None
+
+
+def run_cases(name_filter, repeat):
+    results = {}
+    for group in (crypto_cases, profile_cases, serializer_cases, validator_cases):
+        for name, func, number, size in group():
+            if name_filter and name_filter not in name:
+                continue
+            func()  # прогрев
+            timing = measure(func, repeat=repeat, number=number)
+            result = {'median_us': timing['median'] * 1e6, 'min_us': timing['min'] * 1e6}
+            if size:
+                result['mb_per_s'] = size / timing['min'] / (1024 * 1024)
+            results[name] = result
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Сравнение по минимальному времени (наименее шумная оценка); список регрессий"""
+    rows = []
+    regressions = []
+    for name, result in results.items():
+        row = {
+            'benchmark': name,
+            'median us': f"{result['median_us']:.1f}",
+            'min us': f"{result['min_us']:.1f}",
+            'MB/s': f"{result['mb_per_s']:.1f}" if 'mb_per_s' in result else '',
+        }
+        base = baseline.get(name)
+        if base:
+            change = result['min_us'] / base['min_us'] - 1
+            row['vs baseline'] = f'{change:+.1%}'
+            if change > threshold:
+                row['vs baseline'] += ' REGRESSION'
+                regressions.append(name)
+        rows.append(row)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filter', default='', help='Запускать только замеры, содержащие подстроку')
+    parser.add_argument('--repeat', type=int, default=5, help='Число повторов каждого замера')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Файл базовой линии (JSON)')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Допустимое замедление относительно baseline (0.2 = 20%%)')
+    parser.add_argument('--update-baseline', action='store_true', help='Сохранить результаты как baseline')
+    parser.add_argument('--json', dest='json_path', help='Записать результаты в JSON-файл ("-" — stdout)')
+    args = parser.parse_args()
+
+    setup_django()
+    results = run_cases(args.filter, args.repeat)
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+
+    rows, regressions = compare(results, baseline, args.threshold)
+    report['regressions'] = regressions
+
+    if args.json_path == '-':
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        print_table(rows, ['benchmark', 'median us', 'min us', 'MB/s', 'vs baseline'])
+        if args.json_path:
+            with open(args.json_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.update_baseline:
+        if args.filter and os.path.exists(args.baseline):
+            # Частичный запуск обновляет только свои замеры
+            with open(args.baseline, encoding='utf-8') as f:
+                stored = json.load(f)
+            stored['results'].update(results)
+            report['results'] = stored['results']
+        report.pop('regressions')
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'Baseline сохранен: {args.baseline}', file=sys.stderr)
+        return 0
+
+    if regressions:
+        print(f'Регрессии (> {args.threshold:.0%}): {", ".join(regressions)}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Проверка утекших паролей: CommonPasswordValidator (gz-список в set каждого процесса)
+против фильтра Блума, отображенного в память (build_password_filter).
+
+Память считается по /proc/self/smaps_rollup (Linux): Private — то, что копируется
+в каждый воркер, Shared/Rss — страницы, которые могут разделяться через page cache.
+
+    python -m benchmarks.password_filter --passwords 1000000 --workers 4
+"""
+import argparse
+import gzip
+import io
+import mmap
+import multiprocessing
+import os
+import secrets
+import tempfile
+
+from . import measure, print_table
+
+
+def memory_kb():
+    """Rss и Private (КБ) текущего процесса; Private = None вне Linux"""
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line and not line.startswith(' '))
+    except OSError:
+        import resource
+        return {'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, 'private': None}
+
+    def kb(name):
+        return int(fields.get(name, '0 kB').split()[0])
+    return {'rss': kb('Rss'), 'private': kb('Private_Clean') + kb('Private_Dirty')}
+
+
+def worker_memory(args):
+    """Прирост памяти одного воркера после загрузки структуры и серии проверок"""
+    kind, path, probes = args
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+    from users.utils.bloom import BloomFilter
+    from users.validators import password_fingerprint
+
+    before = memory_kb()
+    if kind == 'set':
+        from django.contrib.auth.password_validation import CommonPasswordValidator
+        validator = CommonPasswordValidator(password_list_path=path)
+        hits = sum(probe in validator.passwords for probe in probes)
+    else:
+        bloom = BloomFilter.open(path)
+        # Полный проход по страницам фильтра: худший случай для Rss
+        hits = sum(password_fingerprint(probe) in bloom for probe in probes)
+        sum(bloom.bits[offset] for offset in range(0, len(bloom.bits), mmap.PAGESIZE))
+    after = memory_kb()
+    return {
+        'rss': after['rss'] - before['rss'],
+        'private': None if after['private'] is None else after['private'] - before['private'],
+        'hits': hits,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--passwords', type=int, default=1000000, help='Размер синтетического списка паролей')
+    parser.add_argument('--fp-rate', type=float, default=0.001, help='Доля ложных срабатываний фильтра')
+    parser.add_argument('--workers', type=int, default=4, help='Число воркеров для замера памяти')
+    parser.add_argument('--lookups', type=int, default=20000, help='Проверок на замер задержки')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+    from django.contrib.auth.password_validation import CommonPasswordValidator
+    from django.core.management import call_command
+
+    from users.validators import PasswordStrengthValidator, get_breached_password_filter, password_fingerprint
+
+    with tempfile.TemporaryDirectory() as tmp:
+        list_path = os.path.join(tmp, 'passwords.txt.gz')
+        bloom_path = os.path.join(tmp, 'passwords.bloom')
+        passwords = [secrets.token_urlsafe(9) for _ in range(args.passwords)]
+        with gzip.open(list_path, 'wt', encoding='utf-8') as f:
+            f.write('\n'.join(passwords))
+        call_command('build_password_filter', list_path, output=bloom_path, fp_rate=args.fp_rate,
+                     capacity=args.passwords, stdout=io.StringIO())
+
+        probes = passwords[:args.lookups // 2] + [secrets.token_urlsafe(9) for _ in range(args.lookups // 2)]
+        fresh = probes[args.lookups // 2:]
+
+        common = CommonPasswordValidator(password_list_path=list_path)
+        bloom = get_breached_password_filter(bloom_path)
+        false_positives = sum(password_fingerprint(probe) in bloom for probe in fresh)
+
+        def check_set():
+            for probe in probes:
+                probe in common.passwords
+
+        def check_bloom():
+            for probe in probes:
+                password_fingerprint(probe) in bloom
+
+        strength = PasswordStrengthValidator(breached_filter_path=bloom_path)
+
+        def validate_full():
+            for probe in probes[:1000]:
+                try:
+                    strength.validate(probe + 'Aa1!')
+                except Exception:
+                    pass
+
+        rows = []
+        context = multiprocessing.get_context('spawn')
+        for name, kind, path, lookup in (('CommonPasswordValidator (set)', 'set', list_path, check_set),
+                                         ('BloomFilter (mmap)', 'bloom', bloom_path, check_bloom)):
+            with context.Pool(args.workers) as pool:
+                usage = pool.map(worker_memory, [(kind, path, probes[:1000])] * args.workers)
+            timing = measure(lookup, repeat=5)
+            private = [u['private'] for u in usage if u['private'] is not None]
+            rows.append({
+                'structure': name,
+                'file MB': f'{os.path.getsize(path) / 1024 / 1024:.1f}',
+                'rss/worker MB': f"{max(u['rss'] for u in usage) / 1024:.1f}",
+                'private/worker MB': f'{max(private) / 1024:.1f}' if private else 'n/a',
+                'us/lookup': f"{timing['median'] / len(probes) * 1e6:.2f}",
+            })
+
+        print_table(rows, ['structure', 'file MB', 'rss/worker MB', 'private/worker MB', 'us/lookup'])
+        print(f'\nЛожные срабатывания фильтра: {false_positives}/{len(fresh)} '
+              f'(цель {args.fp_rate}, оценка {bloom.estimated_fp_rate():.5f})')
+        timing = measure(validate_full, repeat=3)
+        print(f'PasswordStrengthValidator.validate с фильтром: {timing["median"] / 1000 * 1e6:.1f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Конкурентные читатели и писатели на файловой SQLite: профиль default (настройки
+SQLite по умолчанию) против tuned (WAL, synchronous=NORMAL, busy_timeout, IMMEDIATE).
+
+Писатели имитируют загрузки (проверка квоты и вставка зашифрованного блоба в одной
+транзакции) и вставки планировщика погоды; читатели — список файлов и профиль.
+
+    python -m benchmarks.sqlite_contention --writers 4 --readers 8 --duration 10 --blob-size 1048576
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from . import print_table
+
+
+def setup_worker(profile, path):
+    os.environ['DJANGO_SQLITE_PROFILE'] = profile
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import logging
+
+    import django
+    django.setup()
+    logging.disable(logging.CRITICAL)
+
+    from django.db import connection
+    # Соединение еще не открыто: подменяем файл БД на временный
+    connection.settings_dict['NAME'] = path
+
+
+def run_worker(args):
+    role, profile, path, deadline, blob_size = args
+    setup_worker(profile, path)
+    from django.db import OperationalError, close_old_connections, transaction
+
+    from users.models import CustomUser, UserFile, UserStorageUsage, WeatherData
+
+    user = CustomUser.objects.get(username='bench')
+    blob = os.urandom(blob_size)
+    ops = errors = 0
+    latencies = []
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            if role == 'writer':
+                with transaction.atomic():
+                    UserStorageUsage.used_bytes(user.pk)
+                    UserFile.objects.create(user=user, original_name='bench.bin', file_size=blob_size,
+                                            content_type='image/png', encrypted_data=blob)
+                WeatherData.objects.create(temperature='0', description='bench', source_url='https://example.com')
+            else:
+                list(UserFile.objects.filter(user=user).values('id', 'original_name', 'file_size')[:50])
+                CustomUser.objects.defer(*CustomUser.BLOB_FIELDS).get(pk=user.pk)
+            ops += 1
+            latencies.append(time.perf_counter() - start)
+        except OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            errors += 1
+        # Как между запросами: соединение закрывается или переиспользуется по CONN_MAX_AGE
+        close_old_connections()
+    return role, ops, errors, latencies
+
+
+def prepare_database(profile, path):
+    setup_worker(profile, path)
+    from django.core.management import call_command
+    from django.db import connection
+
+    from users.models import CustomUser
+
+    call_command('migrate', verbosity=0)
+    CustomUser.objects.create_user(username='bench', password='BenchPass123!')
+    connection.close()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='Длительность замера (секунды)')
+    parser.add_argument('--blob-size', type=int, default=1024 * 1024, help='Размер загружаемого блоба в байтах')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    for profile in ('default', 'tuned'):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.sqlite3')
+            with context.Pool(1) as pool:
+                pool.apply(prepare_database, (profile, path))
+
+            workers = args.writers + args.readers
+            with context.Pool(workers) as pool:
+                # Старт после импорта Django во всех процессах
+                deadline = time.time() + 3 + args.duration
+                tasks = ([('writer', profile, path, deadline, args.blob_size)] * args.writers
+                         + [('reader', profile, path, deadline, args.blob_size)] * args.readers)
+                results = pool.map(run_worker, tasks)
+
+        for role in ('writer', 'reader'):
+            ops = sum(r[1] for r in results if r[0] == role)
+            errors = sum(r[2] for r in results if r[0] == role)
+            latencies = [lat for r in results if r[0] == role for lat in r[3]]
+            rows.append({
+                'profile': profile,
+                'role': role,
+                'ops/s': f'{ops / args.duration:.1f}',
+                'locked errors': errors,
+                'p50 ms': f'{percentile(latencies, 50) * 1000:.1f}',
+                'p99 ms': f'{percentile(latencies, 99) * 1000:.1f}',
+            })
+
+    print_table(rows, ['profile', 'role', 'ops/s', 'locked errors', 'p50 ms', 'p99 ms'])
+
+
+if __name__ == '__main__':
+    main()
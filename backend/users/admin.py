@@ -1,35 +1,167 @@
+from functools import lru_cache
+
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, UserFile
+from django.db.models import Q
+from django.db.models.functions import Length
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+from .models import CustomUser, Task, UserFile, UserMedia
+from .utils.blind_index import INDEXED_FIELDS, blind_index
+
+
+@lru_cache(maxsize=4096)
+def decrypt_profile_cached(encrypted_data):
+    """
+    Кеш дешифрованных профилей по шифртексту: при изменении профиля меняется
+    и шифртекст, поэтому устаревших записей в кеше не бывает
+    """
+    return CustomUser.decrypt_profile(encrypted_data)
+
+
+def attach_profiles(users):
+    """Пакетная дешифровка профилей для страницы списка: один запрос за encrypted_data"""
+    users = list(users)
+    encrypted = dict(
+        CustomUser.objects.filter(pk__in=[user.pk for user in users]).values_list('pk', 'encrypted_data')
+    )
+    for user in users:
+        data = encrypted.get(user.pk)
+        user._admin_profile = decrypt_profile_cached(bytes(data)) if data else {}
+
+
+class DecryptingChangeList(ChangeList):
+    """ChangeList, который дешифрует профили только видимой страницы"""
+
+    def get_results(self, request):
+        super().get_results(request)
+        attach_profiles(self.result_list)
+
+
+def size_summary(size):
+    if size is None:
+        return '—'
+    return f'{filesizeformat(size)} ({size} байт)'
+
+
+class UserMediaInline(admin.StackedInline):
+    """Медиаданные на форме пользователя: метаданные и размер, без загрузки самого блоба"""
+    model = UserMedia
+    can_delete = False
+    fields = ('encrypted_media_size', 'file_metadata')
+    readonly_fields = ('encrypted_media_size',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('encrypted_media').annotate(
+            encrypted_media_bytes=Length('encrypted_media'),
+        )
+
+    @admin.display(description='Зашифрованные медиафайлы')
+    def encrypted_media_size(self, obj):
+        return size_summary(getattr(obj, 'encrypted_media_bytes', None))
 
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
-    list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'is_active')
+    list_display = ('username', 'profile_email', 'profile_first_name', 'profile_last_name', 'is_staff', 'is_active')
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'date_joined')
-    search_fields = ('username', 'email', 'first_name', 'last_name')
+    # email/имя/фамилия зашифрованы: поиск по ним идет через слепые индексы (см. get_search_results)
+    search_fields = ('username',)
 
     fieldsets = UserAdmin.fieldsets + (
+        ('Зашифрованный профиль', {
+            'fields': ('profile_email', 'profile_first_name', 'profile_last_name')
+        }),
         ('Дополнительные поля', {
-            'fields': ('encrypted_data', 'encrypted_media', 'file_metadata')
+            'fields': ('encrypted_data_size',)
         }),
     )
 
-    readonly_fields = ('date_joined', 'last_login')
+    readonly_fields = ('date_joined', 'last_login', 'profile_email', 'profile_first_name', 'profile_last_name',
+                       'encrypted_data_size')
+    inlines = (UserMediaInline,)
+
+    def get_queryset(self, request):
+        # Зашифрованный профиль не загружается; его размер считает СУБД
+        return super().get_queryset(request).defer(*CustomUser.BLOB_FIELDS).annotate(
+            encrypted_data_bytes=Length('encrypted_data'),
+        )
+
+    def get_changelist(self, request, **kwargs):
+        return DecryptingChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        """Точный поиск по email, имени или фамилии через слепые индексы (индексный запрос)"""
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        term = search_term.strip()
+        if term:
+            index_filter = Q()
+            for field in INDEXED_FIELDS:
+                index_filter |= Q(**{f'{field}_bidx': blind_index(field, term)})
+            results = results | queryset.filter(index_filter)
+        return results, may_have_duplicates
+
+    def get_profile(self, obj):
+        if not hasattr(obj, '_admin_profile'):
+            # Форма редактирования: дешифруем один объект
+            attach_profiles([obj])
+        return obj._admin_profile
+
+    @admin.display(description='Email')
+    def profile_email(self, obj):
+        return self.get_profile(obj).get('email') or '—'
+
+    @admin.display(description='Имя')
+    def profile_first_name(self, obj):
+        return self.get_profile(obj).get('first_name') or '—'
+
+    @admin.display(description='Фамилия')
+    def profile_last_name(self, obj):
+        return self.get_profile(obj).get('last_name') or '—'
+
+    @admin.display(description='Зашифрованные данные')
+    def encrypted_data_size(self, obj):
+        return size_summary(getattr(obj, 'encrypted_data_bytes', None))
 
 
 @admin.register(UserFile)
 class UserFileAdmin(admin.ModelAdmin):
     list_display = ('original_name', 'user', 'file_size', 'content_type', 'uploaded_at')
     list_filter = ('content_type', 'uploaded_at')
+    list_select_related = ('user',)
     search_fields = ('original_name', 'user__username', 'description')
-    readonly_fields = ('uploaded_at',)
+    readonly_fields = ('uploaded_at', 'encrypted_size_display')
 
     fieldsets = (
         ('Основная информация', {
             'fields': ('user', 'original_name', 'file_size', 'content_type')
         }),
         ('Дополнительно', {
-            'fields': ('description', 'uploaded_at', 'encrypted_data')
+            'fields': ('description', 'uploaded_at', 'encrypted_size_display')
         }),
-    )
\ No newline at end of file
+    )
+
+    def get_queryset(self, request):
+        # Ни содержимое файла, ни тяжелые колонки владельца не загружаются
+        return super().get_queryset(request).defer(
+            'encrypted_data', *(f'user__{field}' for field in CustomUser.BLOB_FIELDS)
+        )
+
+    @admin.display(description='Зашифрованные данные файла')
+    def encrypted_size_display(self, obj):
+        return size_summary(obj.encrypted_size)
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_after', 'locked_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('attempts', 'locked_until', 'locked_by', 'last_error', 'created_at', 'finished_at')
+    actions = ('retry_tasks',)
+
+    @admin.action(description='Повторить выбранные задачи')
+    def retry_tasks(self, request, queryset):
+        updated = queryset.exclude(status=Task.RUNNING).update(
+            status=Task.PENDING, attempts=0, run_after=timezone.now(), locked_until=None, finished_at=None)
+        self.message_user(request, f'Задач поставлено в очередь: {updated}')
@@ -7,6 +7,8 @@ class UsersConfig(AppConfig):
     verbose_name = 'Пользователи'
 
     def ready(self):
+        from . import signals, tasks  # noqa: F401
+
         # Проверяем, что это основной процесс (чтобы не запускать дважды при авто-перезагрузке)
         if os.environ.get('RUN_MAIN') == 'true':
             from .utils.scheduler import start_scheduler
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+USER_CACHE_KEY = 'jwt_user:{user_id}'
+
+# Кеши, не общие для процессов: сброс снимка дошел бы только до воркера, сохранившего
+# пользователя, а остальные принимали бы токены деактивированного пользователя до истечения TTL
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+def user_cache_key(user_id):
+    return USER_CACHE_KEY.format(user_id=user_id)
+
+
+def snapshot_cache():
+    """Кеш снимков пользователей (JWT_USER_CACHE_ALIAS) или None, если он локален для процесса"""
+    alias = getattr(settings, 'JWT_USER_CACHE_ALIAS', 'default')
+    if not alias:
+        return None
+    user_cache = caches[alias]
+    if isinstance(user_cache, PROCESS_LOCAL_CACHES):
+        return None
+    return user_cache
+
+
+def invalidate_cached_user(user_id):
+    """Сброс снимка пользователя (вызывается при сохранении/удалении пользователя)"""
+    user_cache = snapshot_cache()
+    if user_cache is not None:
+        user_cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация с кешем пользователей.
+    Пользователь по user_id из токена берется из общего кеша (короткий TTL), а при промахе
+    загружается без тяжелых колонок (зашифрованные данные, медиа, метаданные).
+    С локальным кешем процесса снимки не кешируются (см. snapshot_cache).
+    """
+
+    def get_user_snapshot(self, user_id):
+        user_cache = snapshot_cache()
+        key = user_cache_key(user_id)
+        user = user_cache.get(key) if user_cache is not None else None
+        if user is None:
+            queryset = self.user_model.objects.defer(*getattr(self.user_model, 'BLOB_FIELDS', ()))
+            try:
+                user = queryset.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            if user_cache is not None:
+                user_cache.set(key, user, getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 60))
+        return user
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user = self.get_user_snapshot(user_id)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
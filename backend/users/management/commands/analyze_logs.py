@@ -0,0 +1,115 @@
+import csv
+import glob
+import json
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from users.utils.log_analytics import LogReport, analyze_file
+
+RELATIVE_RE = re.compile(r'^(\d+)([smhd])$')
+RELATIVE_UNITS = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days'}
+
+CSV_COLUMNS = ['method', 'path', 'requests', 'rps', 'error_rate', 'client_errors', 'server_errors',
+               'avg', 'p50', 'p90', 'p95', 'p99', 'max']
+
+
+def parse_time(value):
+    """Абсолютное время (ISO) или относительное: 30m, 2h, 7d"""
+    if value is None:
+        return None
+    match = RELATIVE_RE.match(value)
+    if match:
+        return timezone.now() - timedelta(**{RELATIVE_UNITS[match[2]]: int(match[1])})
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Некорректное время: {value}')
+    # Время без зоны трактуем как TIME_ZONE: метки в логах сравниваются как aware
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+class Command(BaseCommand):
+    help = ('Анализ requests.log: пропускная способность, перцентили задержек, доля ошибок '
+            'и самые медленные запросы по путям')
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*',
+                            help='Лог-файлы или шаблоны (по умолчанию logs/requests.log*, включая .gz)')
+        parser.add_argument('--since', help='Начало окна: ISO-время или относительно (30m, 2h, 7d)')
+        parser.add_argument('--until', help='Конец окна: ISO-время или относительно')
+        parser.add_argument('--jobs', type=int, default=1, help='Число процессов (по одному файлу на процесс)')
+        parser.add_argument('--top', type=int, default=20, help='Сколько самых медленных запросов показать')
+        parser.add_argument('--no-normalize', action='store_true',
+                            help='Не схлопывать числовые/UUID-сегменты путей')
+        parser.add_argument('--format', choices=['text', 'json', 'csv'], default='text')
+        parser.add_argument('--output', help='Файл для отчета (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        files = self.collect_files(options['files'])
+        if not files:
+            raise CommandError('Лог-файлы не найдены')
+
+        analyze = partial(
+            analyze_file,
+            since=parse_time(options['since']),
+            until=parse_time(options['until']),
+            top_slowest=options['top'],
+            normalize=not options['no_normalize'],
+        )
+        report = LogReport(since=analyze.keywords['since'], until=analyze.keywords['until'],
+                           top_slowest=options['top'])
+        if options['jobs'] > 1 and len(files) > 1:
+            with ProcessPoolExecutor(max_workers=options['jobs']) as pool:
+                for partial_report in pool.map(analyze, files):
+                    report.merge(partial_report)
+        else:
+            for path in files:
+                report.merge(analyze(path))
+
+        output = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            getattr(self, f"write_{options['format']}")(report, output)
+        finally:
+            if options['output']:
+                output.close()
+
+    def collect_files(self, patterns):
+        if not patterns:
+            patterns = [str(settings.BASE_DIR / 'logs' / 'requests.log*')]
+        files = []
+        for pattern in patterns:
+            files.extend(sorted(glob.glob(pattern)))
+        return files
+
+    def write_json(self, report, output):
+        json.dump(report.to_dict(), output, ensure_ascii=False, indent=2)
+        output.write('\n')
+
+    def write_csv(self, report, output):
+        writer = csv.DictWriter(output, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(report.rows())
+
+    def write_text(self, report, output):
+        data = report.to_dict()
+        window = data['window']
+        output.write(f"Окно: {window['start']} — {window['end']} ({window['seconds']:.0f} c), "
+                     f"строк: {data['lines']}, пропущено: {data['skipped']}\n\n")
+
+        rows = [{col: row.get(col, '') for col in CSV_COLUMNS} for row in data['paths']]
+        widths = {col: max([len(col)] + [len(str(row[col])) for row in rows]) for col in CSV_COLUMNS}
+        output.write('  '.join(col.ljust(widths[col]) for col in CSV_COLUMNS) + '\n')
+        for row in rows:
+            output.write('  '.join(str(row[col]).ljust(widths[col]) for col in CSV_COLUMNS) + '\n')
+
+        output.write('\nСамые медленные запросы:\n')
+        for entry in data['slowest']:
+            output.write(f"  {entry['duration_seconds']:.3f}s  {entry['timestamp']}  {entry['status_code']}  "
+                         f"{entry['method']} {entry['path']}\n")
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.models import CustomUser
+from users.utils.blind_index import blind_indexes
+
+INDEX_FIELDS = ['email_bidx', 'first_name_bidx', 'last_name_bidx']
+
+
+class Command(BaseCommand):
+    help = 'Заполнение слепых индексов (email, имя, фамилия) из зашифрованных данных пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Размер пачки для bulk_update')
+        parser.add_argument('--all', action='store_true',
+                            help='Пересчитать индексы у всех пользователей (например, после смены ключа)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = CustomUser.objects.only('pk', 'encrypted_data', *INDEX_FIELDS).order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(email_bidx__isnull=True)
+
+        self.updated = self.conflicts = 0
+        seen_emails = set()
+        batch = []
+        for user in queryset.iterator(chunk_size=batch_size):
+            indexes = blind_indexes(user.get_decrypted_data())
+            if indexes['email_bidx'] in seen_emails:
+                # Дубликат email среди старых записей: индекс уникален, оставляем пустым
+                self.report_conflict(user)
+                indexes['email_bidx'] = None
+            elif indexes['email_bidx'] is not None:
+                seen_emails.add(indexes['email_bidx'])
+            for field, value in indexes.items():
+                setattr(user, field, value)
+            batch.append(user)
+            if len(batch) >= batch_size:
+                self.flush(batch)
+                batch = []
+        if batch:
+            self.flush(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено пользователей: {self.updated}, конфликтов email: {self.conflicts}'
+        ))
+
+    def report_conflict(self, user):
+        self.conflicts += 1
+        self.stderr.write(f'Email пользователя id={user.pk} уже проиндексирован у другого пользователя')
+
+    def flush(self, batch):
+        with transaction.atomic():
+            # Индексы, уже занятые пользователями вне текущей пачки
+            taken = set(
+                CustomUser.objects.filter(email_bidx__in=[u.email_bidx for u in batch if u.email_bidx])
+                .exclude(pk__in=[u.pk for u in batch])
+                .values_list('email_bidx', flat=True)
+            )
+            for user in batch:
+                if user.email_bidx in taken:
+                    self.report_conflict(user)
+                    user.email_bidx = None
+            CustomUser.objects.bulk_update(batch, INDEX_FIELDS)
+        self.updated += len(batch)
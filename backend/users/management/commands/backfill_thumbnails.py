@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from users.models import UserFile, UserFilePreview
+from users.utils.task_queue import enqueue
+
+
+class Command(BaseCommand):
+    help = 'Создание миниатюр для уже загруженных изображений, у которых их нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enqueue', action='store_true',
+                            help='Поставить задачи в очередь (выполнят run_workers) вместо построения здесь')
+        parser.add_argument('--all', action='store_true',
+                            help='Пересоздать все миниатюры (например, после смены THUMBNAIL_SIZE)')
+        parser.add_argument('--batch-size', type=int, default=100, help='Файлов на одну выборку из БД')
+
+    def handle(self, *args, **options):
+        files = UserFile.objects.filter(content_type__startswith='image/').order_by('pk')
+        if not options['all']:
+            files = files.filter(preview__isnull=True)
+
+        if options['enqueue']:
+            queued = 0
+            for file_id in files.values_list('pk', flat=True).iterator(chunk_size=options['batch_size']):
+                enqueue('files.generate_thumbnail', file_id=file_id)
+                queued += 1
+            self.stdout.write(self.style.SUCCESS(f'Поставлено задач: {queued}'))
+            return
+
+        created = skipped = 0
+        # Блобы читаются пачками: в памяти не больше batch_size файлов
+        for user_file in files.iterator(chunk_size=options['batch_size']):
+            if UserFilePreview.generate(user_file):
+                created += 1
+            else:
+                skipped += 1
+                self.stderr.write(f'Файл id={user_file.pk} не удалось прочитать как изображение')
+        self.stdout.write(self.style.SUCCESS(f'Создано миниатюр: {created}, пропущено: {skipped}'))
@@ -0,0 +1,109 @@
+import gzip
+import os
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.password_validation import CommonPasswordValidator
+from django.core.management.base import BaseCommand, CommandError
+
+from users.utils.bloom import BloomFilter
+from users.validators import password_fingerprint
+
+# Строка выгрузки Have I Been Pwned: SHA-1 и число появлений в утечках
+SHA1_LINE_RE = re.compile(r'^([0-9A-Fa-f]{40})(?::(\d+))?$')
+
+
+def read_corpus(path, encoding, skipped):
+    """
+    Строки словаря (в т.ч. .gz). Файл читается в байтах и декодируется явно:
+    с заменой невалидных байт на U+FFFD в фильтр попал бы SHA-1 другого пароля,
+    поэтому такие строки пропускаются и считаются в skipped[path].
+    """
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        for line in f:
+            line = line.rstrip(b'\r\n')
+            if not line:
+                continue
+            try:
+                yield line.decode(encoding)
+            except UnicodeDecodeError:
+                skipped[path] += 1
+
+
+class Command(BaseCommand):
+    help = ('Сборка фильтра Блума утекших паролей для PasswordStrengthValidator '
+            '(списки паролей или SHA-1 в формате HIBP, в т.ч. .gz)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='*', help='Файлы: один пароль (или SHA-1[:count]) на строку')
+        parser.add_argument('--format', choices=['plain', 'sha1'], default='plain',
+                            help='plain — пароли в открытом виде, sha1 — хеши SHA-1 (HIBP)')
+        parser.add_argument('--encoding', default='utf-8',
+                            help='Кодировка словарей plain (строки в другой кодировке пропускаются)')
+        parser.add_argument('--min-count', type=int, default=1,
+                            help='Для sha1: минимальное число появлений хеша в утечках')
+        parser.add_argument('--django-common', action='store_true',
+                            help='Добавить встроенный список CommonPasswordValidator')
+        parser.add_argument('--fp-rate', type=float, default=0.001,
+                            help='Допустимая доля ложных срабатываний (по умолчанию 0.001)')
+        parser.add_argument('--capacity', type=int,
+                            help='Ожидаемое число паролей (по умолчанию считается первым проходом)')
+        parser.add_argument('--output', help='Файл фильтра (по умолчанию PASSWORD_BLOOM_FILTER_PATH)')
+
+    def handle(self, *args, **options):
+        sources = list(options['sources'])
+        if options['django_common']:
+            sources.append(('plain', CommonPasswordValidator.DEFAULT_PASSWORD_LIST_PATH))
+        if not sources:
+            raise CommandError('Укажите файлы с паролями или --django-common')
+        sources = [source if isinstance(source, tuple) else (options['format'], source) for source in sources]
+
+        output = options['output'] or getattr(settings, 'PASSWORD_BLOOM_FILTER_PATH', None)
+        if not output:
+            raise CommandError('Не задан --output и PASSWORD_BLOOM_FILTER_PATH')
+
+        started = time.perf_counter()
+        capacity = options['capacity']
+        encoding = options['encoding']
+        if capacity is None:
+            capacity = sum(1 for _ in self.read_fingerprints(sources, encoding, options['min_count']))
+        try:
+            bloom = BloomFilter.create(capacity, options['fp_rate'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for fingerprint in self.read_fingerprints(sources, encoding, options['min_count']):
+            bloom.add(fingerprint)
+
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        bloom.save(output)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Фильтр: {output}, паролей: {len(bloom)}, размер: {bloom.size_bytes / 1024 / 1024:.1f} МБ, '
+            f'хешей: {bloom.num_hashes}, ожидаемая доля ложных срабатываний: {bloom.estimated_fp_rate():.5f}, '
+            f'время: {elapsed:.1f} c'
+        ))
+        for path, count in self.skipped.items():
+            self.stderr.write(f'{path}: пропущено строк не в кодировке {encoding}: {count}')
+        if len(bloom) > capacity:
+            self.stderr.write(f'Паролей больше, чем --capacity={capacity}: доля ложных срабатываний выше заданной')
+
+    def read_fingerprints(self, sources, encoding, min_count):
+        # Счетчик пропусков последнего прохода (при подсчете capacity проходов два)
+        self.skipped = Counter()
+        for file_format, path in sources:
+            if file_format == 'plain':
+                for line in read_corpus(path, encoding, self.skipped):
+                    yield password_fingerprint(line.strip())
+                continue
+            # Выгрузка HIBP — только ASCII
+            for line in read_corpus(path, 'ascii', self.skipped):
+                match = SHA1_LINE_RE.match(line.strip())
+                if not match:
+                    continue
+                if match[2] is not None and int(match[2]) < min_count:
+                    continue
+                yield match[1].upper()
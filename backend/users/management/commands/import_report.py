@@ -0,0 +1,105 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Строка вывода python -X importtime: "import time: self [us] | cumulative | imported package"
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+# Запуск в отдельном интерпретаторе: текущий процесс уже импортировал все модули
+STARTUP_SCRIPT = '''
+import json, os, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', {settings_module!r})
+import django
+django.setup()
+phases = {{'django.setup': time.perf_counter() - start}}
+target = {target!r}
+if target:
+    mark = time.perf_counter()
+    __import__(target)
+    phases['import ' + target] = time.perf_counter() - mark
+if {warm_up!r}:
+    mark = time.perf_counter()
+    from users.utils.encryption import warm_up
+    warm_up()
+    phases['encryptor.warm_up'] = time.perf_counter() - mark
+phases['total'] = time.perf_counter() - start
+sys.stdout.write(json.dumps(phases))
+'''
+
+
+def parse_importtime(lines):
+    """Модули с собственным и накопленным временем импорта (мкс) и глубиной вложенности"""
+    modules = []
+    for line in lines:
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            modules.append({
+                'module': match[4],
+                'self_us': int(match[1]),
+                'cumulative_us': int(match[2]),
+                'depth': len(match[3]) // 2,
+            })
+    return modules
+
+
+class Command(BaseCommand):
+    help = ('Отчет о времени старта процесса: время импорта каждого модуля (python -X importtime) '
+            'и общее время django.setup() в чистом интерпретаторе')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', default='',
+                            help='Дополнительно импортируемый модуль, например backend.wsgi')
+        parser.add_argument('--warm-up', action='store_true',
+                            help='Учесть вывод ключа шифрования (users.utils.encryption.warm_up)')
+        parser.add_argument('--top', type=int, default=25, help='Сколько модулей показать')
+        parser.add_argument('--sort', choices=['self', 'cumulative'], default='cumulative')
+        parser.add_argument('--top-level', action='store_true',
+                            help='Только пакеты верхнего уровня (накопленное время)')
+        parser.add_argument('--format', choices=['text', 'json'], default='text')
+
+    def handle(self, *args, **options):
+        script = STARTUP_SCRIPT.format(
+            settings_module=os.environ.get('DJANGO_SETTINGS_MODULE', 'backend.settings'),
+            target=options['target'],
+            warm_up=options['warm_up'],
+        )
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        wall = time.perf_counter() - started
+        if result.returncode != 0:
+            raise CommandError(f'Запуск завершился с ошибкой:\n{result.stderr[-2000:]}')
+
+        phases = json.loads(result.stdout.strip().splitlines()[-1])
+        modules = parse_importtime(result.stderr.splitlines())
+        shown = [m for m in modules if m['depth'] == 0] if options['top_level'] else modules
+        key = 'self_us' if options['sort'] == 'self' else 'cumulative_us'
+        top = sorted(shown, key=lambda m: m[key], reverse=True)[:options['top']]
+
+        if options['format'] == 'json':
+            self.stdout.write(json.dumps({
+                'process_seconds': round(wall, 4),
+                'phases': phases,
+                'modules_imported': len(modules),
+                'top': top,
+            }, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(f"{'self, ms':>10}  {'cumul., ms':>10}  module")
+        for module in top:
+            self.stdout.write(f"{module['self_us'] / 1000:>10.1f}  {module['cumulative_us'] / 1000:>10.1f}  "
+                              f"{'  ' * module['depth']}{module['module']}")
+        self.stdout.write('')
+        for name, seconds in phases.items():
+            self.stdout.write(f'{name}: {seconds * 1000:.1f} ms')
+        self.stdout.write(f'Процесс целиком (с запуском интерпретатора): {wall * 1000:.1f} ms, '
+                          f'модулей: {len(modules)}')
@@ -0,0 +1,159 @@
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from users.models import CustomUser
+from users.utils.blind_index import blind_indexes
+from users.utils.encryption import encryptor
+
+
+def read_rows(path, file_format):
+    """Потоковое чтение CSV (с заголовком) или JSONL"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if file_format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def prepare_chunk(rows, hasher=None):
+    """
+    CPU-тяжелая часть импорта (выполняется в пуле процессов):
+    хеширование паролей, шифрование профиля, слепые индексы.
+    Возвращает (готовые значения полей, ошибки).
+    """
+    prepared = []
+    errors = []
+    for row in rows:
+        username = (row.get('username') or '').strip()
+        if not username:
+            errors.append(f'Пустой username: {row!r}')
+            continue
+
+        password_hash = row.get('password_hash')
+        if password_hash:
+            try:
+                identify_hasher(password_hash)
+            except ValueError:
+                errors.append(f'{username}: неизвестный формат password_hash')
+                continue
+        elif row.get('password'):
+            password_hash = make_password(row['password'], hasher=hasher or 'default')
+        else:
+            # Без пароля пользователь не сможет войти, пока не задаст пароль
+            password_hash = make_password(None)
+
+        profile = {
+            'email': (row.get('email') or '').strip(),
+            'first_name': (row.get('first_name') or '').strip(),
+            'last_name': (row.get('last_name') or '').strip(),
+        }
+        prepared.append({
+            'username': username,
+            'password': password_hash,
+            'encrypted_data': encryptor.encrypt_data(json.dumps(profile)),
+            **blind_indexes(profile),
+        })
+    return prepared, errors
+
+
+class Command(BaseCommand):
+    help = ('Массовый импорт пользователей из CSV/JSONL: хеширование и шифрование в пуле процессов, '
+            'запись пачками bulk_create внутри транзакций')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл CSV (с заголовком) или JSONL')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Формат файла (по умолчанию по расширению)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Число процессов (по умолчанию = числу CPU, 0 — без пула)')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Строк на задачу пула и на одну транзакцию')
+        parser.add_argument('--hasher', default=None,
+                            help='Алгоритм из PASSWORD_HASHERS для паролей в открытом виде '
+                                 '(пароль будет перехеширован основным алгоритмом при входе)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size должен быть положительным')
+
+        self.created = self.skipped = 0
+        started = time.perf_counter()
+        chunks = chunked(read_rows(path, file_format), chunk_size)
+
+        workers = options['workers']
+        if workers < 1:
+            for chunk in chunks:
+                self.write_chunk(*prepare_chunk(chunk, options['hasher']))
+        else:
+            # Рабочие процессы не обращаются к БД: пишет только основной процесс
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Ограничиваем число задач в полете: память не зависит от размера файла
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(prepare_chunk, chunk, options['hasher']))
+                    if len(pending) >= workers * 2:
+                        self.write_chunk(*pending.popleft().result())
+                while pending:
+                    self.write_chunk(*pending.popleft().result())
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано: {self.created}, пропущено: {self.skipped}, время: {elapsed:.1f} c'
+        ))
+
+    def write_chunk(self, prepared, errors):
+        for error in errors:
+            self.stderr.write(error)
+        self.skipped += len(errors)
+        if not prepared:
+            return
+
+        with transaction.atomic():
+            usernames = [item['username'] for item in prepared]
+            emails = [item['email_bidx'] for item in prepared if item['email_bidx']]
+            taken_usernames = set(
+                CustomUser.objects.filter(username__in=usernames).values_list('username', flat=True)
+            )
+            taken_emails = set(
+                CustomUser.objects.filter(email_bidx__in=emails).values_list('email_bidx', flat=True)
+            )
+
+            users = []
+            for item in prepared:
+                if item['username'] in taken_usernames or (item['email_bidx'] and item['email_bidx'] in taken_emails):
+                    self.stderr.write(f"{item['username']}: пользователь с таким username или email уже существует")
+                    self.skipped += 1
+                    continue
+                taken_usernames.add(item['username'])
+                if item['email_bidx']:
+                    taken_emails.add(item['email_bidx'])
+                user = CustomUser(**item)
+                user.email = user.placeholder_email()
+                users.append(user)
+
+            CustomUser.objects.bulk_create(users)
+        self.created += len(users)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from users.utils.token_blacklist import prune_expired
+
+
+class Command(BaseCommand):
+    help = 'Удаление отозванных refresh-токенов с истекшим сроком действия (пачками)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Записей на один DELETE (короткие транзакции не блокируют БД надолго)')
+
+    def handle(self, *args, **options):
+        deleted = prune_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено истекших записей: {deleted}'))
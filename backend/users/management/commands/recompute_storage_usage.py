@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from users.models import UserStorageUsage
+
+
+class Command(BaseCommand):
+    help = 'Пересчет агрегатов хранилища пользователей по таблице файлов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='id пользователя (можно указать несколько раз; по умолчанию все)')
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        UserStorageUsage.rebuild(user_ids)
+        usage = UserStorageUsage.objects.all()
+        if user_ids is not None:
+            usage = usage.filter(user_id__in=user_ids)
+        self.stdout.write(self.style.SUCCESS(f'Строк агрегатов: {usage.count()}'))
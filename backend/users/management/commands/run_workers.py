@@ -0,0 +1,65 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+
+from users.utils.task_queue import default_worker_id, prune_finished, work
+
+
+def _handle_stop_signals(stop_event):
+    """SIGTERM/SIGINT: закончить текущую задачу и выйти"""
+    def handler(signum, frame):
+        stop_event.set()
+    signal.signal(signal.SIGTERM, handler)
+    signal.signal(signal.SIGINT, handler)
+
+
+def run_worker_process(stop_event, poll_interval, burst):
+    """Точка входа дочернего процесса (spawn): своя инициализация Django и соединение с БД"""
+    import django
+    django.setup()
+    _handle_stop_signals(stop_event)
+    work(stop_event, poll_interval=poll_interval, burst=burst)
+
+
+class Command(BaseCommand):
+    help = ('Воркеры очереди фоновых задач (модель Task). Несколько процессов безопасно '
+            'разбирают одну очередь: задача берется атомарно и не видна другим до таймаута видимости')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Число процессов-воркеров')
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='Пауза при пустой очереди, секунд (по умолчанию TASK_QUEUE_POLL_INTERVAL)')
+        parser.add_argument('--burst', action='store_true',
+                            help='Выйти, когда очередь опустеет (для cron и CI)')
+        parser.add_argument('--prune-days', type=int, default=7,
+                            help='При старте удалить выполненные задачи старше N дней (0 — не удалять)')
+
+    def handle(self, *args, **options):
+        if options['prune_days']:
+            pruned = prune_finished(options['prune_days'])
+            if pruned:
+                self.stdout.write(f'Удалено выполненных задач: {pruned}')
+
+        if options['processes'] <= 1:
+            stop_event = multiprocessing.Event()
+            _handle_stop_signals(stop_event)
+            processed = work(stop_event, worker_id=default_worker_id(),
+                             poll_interval=options['poll_interval'], burst=options['burst'])
+            self.stdout.write(self.style.SUCCESS(f'Обработано задач: {processed}'))
+            return
+
+        # spawn: дочерние процессы не наследуют открытые соединения с БД
+        context = multiprocessing.get_context('spawn')
+        stop_event = context.Event()
+        workers = [
+            context.Process(target=run_worker_process, args=(stop_event, options['poll_interval'], options['burst']))
+            for _ in range(options['processes'])
+        ]
+        for process in workers:
+            process.start()
+        _handle_stop_signals(stop_event)
+        self.stdout.write(f'Запущено воркеров: {len(workers)}')
+        for process in workers:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('Воркеры остановлены'))
@@ -1,94 +1,191 @@
-import time
 import logging
 import json
-from django.utils.deprecation import MiddlewareMixin
+import re
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.messages import middleware as messages_middleware
+from django.contrib.sessions import middleware as sessions_middleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.middleware import clickjacking, common, csrf, security
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import empty
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .authentication import CachedJWTAuthentication
+from .utils import compression, request_context, tracing
+from .utils.profiling import RequestProfiler
+from .utils.query_budget import QueryBudgetExceeded, check_budget, format_report, get_budget, record_queries
+from .utils.request_context import RequestContext, get_client_ip
 
 # Создаем логгер для API запросов
 logger = logging.getLogger('api')
 
 
-class RequestResponseLoggingMiddleware(MiddlewareMixin):
+class AsyncCapableMiddleware:
     """
-    Middleware для логирования всех входящих запросов и исходящих ответов
+    Базовый класс для middleware, работающих и в sync (WSGI), и в async (ASGI) режиме.
+    Django не переключает потоки вокруг такого middleware: режим выбирается по get_response.
     """
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        # Засекаем время начала обработки запроса
-        start_time = time.time()
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.get_response(request)
 
-        # Логируем входящий запрос
-        self.log_request(request)
+    async def __acall__(self, request):
+        return await self.get_response(request)
 
-        # Получаем ответ
-        response = self.get_response(request)
 
-        # Засекаем время окончания обработки
-        duration = time.time() - start_time
+class NonBlockingHooksMixin:
+    """
+    Для встроенных middleware Django (MiddlewareMixin). В async-режиме MiddlewareMixin
+    переводит в поток каждый process_request/process_response, хотя большинство из них
+    только читает и ставит заголовки. Здесь такие хуки выполняются прямо в event loop;
+    в поток уходит только process_response, которому нужна БД (response_needs_thread).
+    В sync-режиме поведение не меняется.
+    """
 
-        # Логируем исходящий ответ
-        self.log_response(request, response, duration)
+    def response_needs_thread(self, request, response):
+        return False
 
+    async def __acall__(self, request):
+        response = None
+        if hasattr(self, 'process_request'):
+            response = self.process_request(request)
+        response = response or await self.get_response(request)
+        if hasattr(self, 'process_response'):
+            if self.response_needs_thread(request, response):
+                response = await sync_to_async(self.process_response, thread_sensitive=True)(request, response)
+            else:
+                response = self.process_response(request, response)
         return response
 
-    def get_client_ip(self, request):
-        """
-        Получение IP адреса клиента
-        """
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
-
-    def log_request(self, request):
-        """
-        Логирование входящего запроса
-        """
+
+class SecurityMiddleware(NonBlockingHooksMixin, security.SecurityMiddleware):
+    pass
+
+
+class SessionMiddleware(NonBlockingHooksMixin, sessions_middleware.SessionMiddleware):
+    def response_needs_thread(self, request, response):
+        # Сессия сохраняется (или удаляется) только если к ней обращались
+        session = request.session
+        return session.accessed or session.modified
+
+
+class CommonMiddleware(NonBlockingHooksMixin, common.CommonMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(NonBlockingHooksMixin, csrf.CsrfViewMiddleware):
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        # process_view Django оборачивает в sync_to_async, если метод синхронный
+        if iscoroutinefunction(self):
+            self.process_view = self.aprocess_view
+
+    async def aprocess_view(self, request, callback, callback_args, callback_kwargs):
+        # Views DRF освобождены от CSRF, безопасные методы тело не читают; проверка
+        # с чтением тела (request.POST) остается в потоке
+        if getattr(callback, 'csrf_exempt', False) or request.method in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            return csrf.CsrfViewMiddleware.process_view(self, request, callback, callback_args, callback_kwargs)
+        return await sync_to_async(csrf.CsrfViewMiddleware.process_view, thread_sensitive=True)(
+            self, request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(NonBlockingHooksMixin, auth_middleware.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(NonBlockingHooksMixin, messages_middleware.MessageMiddleware):
+    def response_needs_thread(self, request, response):
+        # Хранилище сообщений пишет в сессию, только если сообщения читали или добавляли
+        storage = getattr(request, '_messages', None)
+        return storage is not None and (storage.used or storage.added_new)
+
+
+class XFrameOptionsMiddleware(NonBlockingHooksMixin, clickjacking.XFrameOptionsMiddleware):
+    pass
+
+
+class RequestResponseLoggingMiddleware(AsyncCapableMiddleware):
+    """
+    Middleware для логирования запросов: создает RequestContext, в который views
+    добавляют события через log_* хелперы, и пишет одну итоговую запись на запрос
+    """
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        context = self.start_context(request)
+        token = request_context.activate(context)
         try:
-            # Собираем информацию о запросе
-            request_info = {
-                'method': request.method,
-                'path': request.path,
-                'query_params': dict(request.GET),
-                'client_ip': self.get_client_ip(request),
-                'user_agent': request.META.get('HTTP_USER_AGENT', ''),
-                'user': str(request.user) if request.user.is_authenticated else 'Anonymous',
-            }
+            response = self.get_response(request)
+        finally:
+            request_context.deactivate(token)
 
-            # Для POST/PUT запросов логируем тело (кроме паролей)
-            if request.method in ['POST', 'PUT', 'PATCH']:
-                body = self.safe_get_request_body(request)
-                if body:
-                    request_info['request_body'] = body
+        context.set_user(request.user)
+        self.log_context(context, response)
+        return response
 
-            logger.info(f"REQUEST: {json.dumps(request_info, ensure_ascii=False)}")
+    async def __acall__(self, request):
+        context = self.start_context(request)
+        token = request_context.activate(context)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_context.deactivate(token)
 
-        except Exception as e:
-            logger.error(f"Error logging request: {str(e)}")
+        # DRF подставляет пользователя из JWT в request.user. Если ленивый request.user
+        # так и не вычислялся, в async-режиме берем пользователя сессии через auser()
+        user = request.user
+        if getattr(user, '_wrapped', None) is empty:
+            user = await request.auser()
+        context.set_user(user)
+        self.log_context(context, response)
+        return response
+
+    def start_context(self, request):
+        context = RequestContext(request)
+        request.log_context = context
 
-    def log_response(self, request, response, duration):
+        # Для POST/PUT запросов сохраняем тело (кроме паролей) до того, как его прочитает view
+        if request.method in ['POST', 'PUT', 'PATCH']:
+            context.request_body = self.safe_get_request_body(request) or None
+        return context
+
+    def log_context(self, context, response):
         """
-        Логирование исходящего ответа
+        Итоговая запись о запросе: данные запроса, ответа, тайминги и бизнес-события
         """
         try:
-            response_info = {
-                'method': request.method,
-                'path': request.path,
-                'status_code': response.status_code,
-                'duration_seconds': round(duration, 3),
-                'client_ip': self.get_client_ip(request),
-                'user': str(request.user) if request.user.is_authenticated else 'Anonymous',
-            }
+            record = context.to_record(response.status_code, context.elapsed())
+            span = tracing.current_span()
+            if span is not None:
+                record['trace_id'] = span.trace_id
 
             # Для ошибок логируем дополнительную информацию
             if response.status_code >= 400:
-                response_info['response_body'] = self.safe_get_response_body(response)
+                record['response_body'] = self.safe_get_response_body(response)
 
-            logger.info(f"RESPONSE: {json.dumps(response_info, ensure_ascii=False)}")
+            if context.exception or response.status_code >= 500:
+                level = logging.ERROR
+            elif context.has_security_events:
+                level = logging.WARNING
+            else:
+                level = logging.INFO
+            logger.log(level, f"RESPONSE: {json.dumps(record, ensure_ascii=False, default=str)}")
 
         except Exception as e:
             logger.error(f"Error logging response: {str(e)}")
@@ -97,12 +194,16 @@ class RequestResponseLoggingMiddleware(MiddlewareMixin):
         """
         Безопасное получение тела запроса (исключая чувствительные данные)
         """
+        # multipart (загрузка файлов) не разбирается: request.POST прочитал бы все тело
+        # здесь, до view, где разбор измеряется span'ом upload.parse_multipart
+        if request.content_type == 'multipart/form-data':
+            return None
         try:
             # Копируем POST данные
             body = request.POST.copy()
 
             # Удаляем чувствительные данные
-            sensitive_fields = ['password', 'password1', 'password2', 'token', 'secret']
+            sensitive_fields = ['password', 'password1', 'password2', 'token', 'secret', 'refresh', 'access']
             for field in sensitive_fields:
                 if field in body:
                     body[field] = '***HIDDEN***'
@@ -132,44 +233,230 @@ class RequestResponseLoggingMiddleware(MiddlewareMixin):
         try:
             if hasattr(response, 'data'):
                 return response.data
-            return getattr(response, 'content', '')[:1000]  # Ограничиваем длину
+            if getattr(response, 'streaming', False):
+                return None
+            # Ограничиваем длину
+            return response.content[:1000].decode('utf-8', errors='replace')
         except Exception as e:
             logger.warning(f"Could not read response body: {str(e)}")
             return None
 
 
-class ErrorLoggingMiddleware(MiddlewareMixin):
+class ErrorLoggingMiddleware(AsyncCapableMiddleware):
     """
     Middleware для логирования ошибок
     """
 
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
-        response = self.get_response(request)
-        return response
-
     def process_exception(self, request, exception):
         """
-        Обработка исключений
+        Обработка исключений: исключение попадает в итоговую запись о запросе
         """
+        context = getattr(request, 'log_context', None)
+        if context is not None:
+            context.set_exception(exception)
+            return None
+
         logger.error(
             f"EXCEPTION: {str(exception)} | "
             f"URL: {request.path} | "
             f"Method: {request.method} | "
             f"User: {request.user} | "
-            f"IP: {self.get_client_ip(request)}"
+            f"IP: {get_client_ip(request)}"
         )
         return None
 
-    def get_client_ip(self, request):
+
+class ProfilingMiddleware(AsyncCapableMiddleware):
+    """
+    Middleware для профилирования отдельных запросов.
+    Включается заголовком X-Profile: 1 или параметром ?_profile=1 и только для staff-пользователей.
+    Профиль и сводка сохраняются в REQUEST_PROFILING_DIR, идентификатор возвращается в X-Profile-Id.
+    """
+
+    header = 'HTTP_X_PROFILE'
+    query_param = '_profile'
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.is_profiling_requested(request) or not self.is_staff(request):
+            return self.get_response(request)
+        return self.profile(request, self.get_response)
+
+    async def __acall__(self, request):
+        if not self.is_profiling_requested(request) or not await sync_to_async(self.is_staff)(request):
+            return await self.get_response(request)
+        # cProfile видит только текущий поток: выполняем цепочку в sync-потоке,
+        # туда же (thread_sensitive) будет направлено и синхронное view
+        return await sync_to_async(self.profile)(request, async_to_sync(self.get_response))
+
+    def profile(self, request, get_response):
+        profiler = RequestProfiler(request)
+        with profiler:
+            response = get_response(request)
+
+        try:
+            summary = profiler.save(response)
+            response['X-Profile-Id'] = summary['profile_id']
+            profile_info = {
+                'profile_id': summary['profile_id'],
+                'sql_count': summary['sql']['count'],
+                'sql_seconds': summary['sql']['duration_seconds'],
+                'encryption_seconds': summary['encryption_seconds'],
+            }
+            context = getattr(request, 'log_context', None)
+            if context is not None:
+                context.add_event('profile', **profile_info)
+            else:
+                logger.info(f"PROFILE: {json.dumps(profile_info)}")
+        except Exception as e:
+            logger.error(f"Error saving profile: {str(e)}")
+
+        return response
+
+    def is_profiling_requested(self, request):
+        if not getattr(settings, 'REQUEST_PROFILING_ENABLED', False):
+            return False
+        flag = request.META.get(self.header) or request.GET.get(self.query_param)
+        return flag in ('1', 'true', 'yes')
+
+    def is_staff(self, request):
         """
-        Получение IP адреса клиента
+        Проверка прав: сессионный пользователь или пользователь из JWT-токена
+        (JWT-аутентификация DRF выполняется только во view, поэтому проверяем токен заранее)
         """
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
\ No newline at end of file
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+        try:
+            result = CachedJWTAuthentication().authenticate(request)
+        except (AuthenticationFailed, InvalidToken):
+            return False
+        return bool(result) and result[0].is_staff
+
+
+class TracingMiddleware(AsyncCapableMiddleware):
+    """
+    Middleware для трассировки: открывает корневой span запроса.
+    Идентификатор трассы берется из заголовка X-Trace-Id (если корректен) и возвращается в ответе.
+    """
+
+    trace_id_re = re.compile(r'^[0-9a-f]{32}$')
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not tracing.is_enabled():
+            return self.get_response(request)
+        with self.start_span(request) as root:
+            response = self.get_response(request)
+            self.finish_span(root, response)
+        return response
+
+    async def __acall__(self, request):
+        if not tracing.is_enabled():
+            return await self.get_response(request)
+        with self.start_span(request) as root:
+            response = await self.get_response(request)
+            self.finish_span(root, response)
+        return response
+
+    def start_span(self, request):
+        trace_id = request.META.get('HTTP_X_TRACE_ID', '').lower()
+        if not self.trace_id_re.match(trace_id):
+            trace_id = None
+        return tracing.span('http.request', trace_id=trace_id, method=request.method, path=request.path)
+
+    def finish_span(self, root, response):
+        root.set_attribute('status_code', response.status_code)
+        response['X-Trace-Id'] = root.trace_id
+
+
+class QueryBudgetMiddleware(AsyncCapableMiddleware):
+    """
+    Контроль бюджета запросов по имени маршрута (QUERY_BUDGETS).
+    QUERY_BUDGET_MODE: 'off' — middleware отключается при старте, 'log' — предупреждение
+    в лог и событие в контексте запроса, 'raise' — QueryBudgetExceeded (для разработки и CI).
+    """
+
+    def __init__(self, get_response):
+        self.mode = getattr(settings, 'QUERY_BUDGET_MODE', 'off')
+        if self.mode not in ('log', 'raise'):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.measure(request, self.get_response)
+
+    async def __acall__(self, request):
+        # Соединение с БД привязано к потоку: запросы view выполняются в том же
+        # sync-потоке (thread_sensitive), где подменены курсоры
+        return await sync_to_async(self.measure)(request, async_to_sync(self.get_response))
+
+    def measure(self, request, get_response):
+        with record_queries() as recorder:
+            response = get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        violations = check_budget(recorder, get_budget(view_name)) if view_name else []
+        if not violations:
+            return response
+
+        report = format_report(view_name, recorder, violations)
+        if self.mode == 'raise':
+            raise QueryBudgetExceeded(report)
+        context = getattr(request, 'log_context', None)
+        if context is not None:
+            context.add_event('query_budget', view=view_name, violations=violations, **recorder.summary())
+        logger.warning(report)
+        return response
+
+
+class CompressionMiddleware(AsyncCapableMiddleware):
+    """
+    Сжатие ответов (zstd, br, gzip — по Accept-Encoding клиента).
+    Не сжимаются маленькие и потоковые ответы, уже сжатые типы (картинки, аудио
+    из download_file_view) и ответы с токенами (RESPONSE_COMPRESSION_EXCLUDE_VIEWS, защита
+    от BREACH). Сжатые варианты кешируются, кроме ответов с no-store.
+    Стоит в начале MIDDLEWARE, чтобы остальные middleware видели несжатое тело.
+    """
+
+    def __init__(self, get_response):
+        if not any(encoding in compression.CODECS
+                   for encoding in getattr(settings, 'RESPONSE_COMPRESSION_ENCODINGS', [])):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if compression.is_excluded(request) or not compression.is_compressible(response):
+            return response
+        # Ответ зависит от Accept-Encoding, даже если этот клиент сжатие не принимает
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        use_cache = 'no-store' not in response.get('Cache-Control', '')
+        compressed = compression.compress(response.content, encoding, use_cache=use_cache)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # Сжатое тело побайтно отличается от исходного: ETag становится слабым
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
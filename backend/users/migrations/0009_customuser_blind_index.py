@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_alter_weatherdata_options_customuser_encrypted_media_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='email_bidx',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True, verbose_name='Слепой индекс email'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='first_name_bidx',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, null=True, verbose_name='Слепой индекс имени'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='last_name_bidx',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, null=True, verbose_name='Слепой индекс фамилии'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:10
+
+import users.utils.conditional
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_customuser_blind_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='data_version',
+            field=models.CharField(default=users.utils.conditional.new_data_version, editable=False, max_length=32, verbose_name='Версия данных'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_media_to_side_table(apps, schema_editor):
+    """Перенос медиа и метаданных в UserMedia (только для пользователей, у которых они есть)"""
+    CustomUser = apps.get_model('users', 'CustomUser')
+    UserMedia = apps.get_model('users', 'UserMedia')
+    users = (CustomUser.objects.exclude(encrypted_media__isnull=True, file_metadata={})
+             .values_list('pk', 'encrypted_media', 'file_metadata'))
+    batch = []
+    for pk, encrypted_media, file_metadata in users.iterator(chunk_size=100):
+        batch.append(UserMedia(user_id=pk, encrypted_media=encrypted_media, file_metadata=file_metadata or {}))
+        if len(batch) >= 100:
+            UserMedia.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        UserMedia.objects.bulk_create(batch)
+
+
+def copy_media_back(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    UserMedia = apps.get_model('users', 'UserMedia')
+    for media in UserMedia.objects.iterator(chunk_size=100):
+        CustomUser.objects.filter(pk=media.user_id).update(
+            encrypted_media=media.encrypted_media, file_metadata=media.file_metadata
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserMedia',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='media', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('encrypted_media', models.BinaryField(blank=True, null=True, verbose_name='Зашифрованные медиафайлы')),
+                ('file_metadata', models.JSONField(blank=True, default=dict, verbose_name='Метаданные файлов')),
+            ],
+            options={
+                'verbose_name': 'Медиаданные пользователя',
+                'verbose_name_plural': 'Медиаданные пользователей',
+            },
+        ),
+        migrations.RunPython(copy_media_to_side_table, copy_media_back),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='encrypted_media',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='file_metadata',
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Length
+
+
+def fill_storage_usage(apps, schema_editor):
+    """Размер шифртекста существующих файлов и начальные агрегаты по пользователям"""
+    UserFile = apps.get_model('users', 'UserFile')
+    UserStorageUsage = apps.get_model('users', 'UserStorageUsage')
+    UserFile.objects.update(encrypted_size=Length('encrypted_data'))
+    rows = UserFile.objects.values('user_id', 'content_type').annotate(
+        count=Count('pk'), plaintext=Sum('file_size'), ciphertext=Sum('encrypted_size'),
+    ).order_by()
+    UserStorageUsage.objects.bulk_create([
+        UserStorageUsage(user_id=row['user_id'], content_type=row['content_type'], file_count=row['count'],
+                         plaintext_bytes=row['plaintext'] or 0, ciphertext_bytes=row['ciphertext'] or 0)
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_usermedia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userfile',
+            name='encrypted_size',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Размер зашифрованных данных'),
+        ),
+        migrations.CreateModel(
+            name='UserStorageUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_type', models.CharField(max_length=100, verbose_name='Тип содержимого')),
+                ('file_count', models.PositiveIntegerField(default=0, verbose_name='Число файлов')),
+                ('plaintext_bytes', models.PositiveBigIntegerField(default=0, verbose_name='Объем файлов')),
+                ('ciphertext_bytes', models.PositiveBigIntegerField(default=0, verbose_name='Объем зашифрованных данных')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='storage_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Использование хранилища',
+                'verbose_name_plural': 'Использование хранилища',
+                'constraints': [models.UniqueConstraint(fields=('user', 'content_type'), name='unique_user_storage_usage')],
+            },
+        ),
+        migrations.RunPython(fill_storage_usage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_task_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserFilePreview',
+            fields=[
+                ('file', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='preview', serialize=False, to='users.userfile')),
+                ('encrypted_thumbnail', models.BinaryField(verbose_name='Зашифрованная миниатюра')),
+                ('content_type', models.CharField(max_length=100, verbose_name='Тип миниатюры')),
+                ('width', models.PositiveIntegerField(verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='Высота')),
+                ('generated_at', models.DateTimeField(auto_now=True, verbose_name='Создана')),
+            ],
+            options={
+                'verbose_name': 'Миниатюра файла',
+                'verbose_name_plural': 'Миниатюры файлов',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0015_userfilepreview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userfile',
+            name='metadata',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Метаданные'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:38
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_userfile_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userfile',
+            name='segment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число сегментов'),
+        ),
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('original_name', models.CharField(max_length=255, verbose_name='Оригинальное имя файла')),
+                ('content_type', models.CharField(max_length=100, verbose_name='Тип содержимого')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('total_size', models.PositiveBigIntegerField(verbose_name='Размер файла')),
+                ('chunk_size', models.PositiveIntegerField(verbose_name='Размер части')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Истекает')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Сессия загрузки',
+                'verbose_name_plural': 'Сессии загрузки',
+            },
+        ),
+        migrations.CreateModel(
+            name='FileSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField(verbose_name='Номер части')),
+                ('size', models.PositiveIntegerField(verbose_name='Размер части')),
+                ('encrypted_data', models.BinaryField(verbose_name='Зашифрованные данные части')),
+                ('file', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='users.userfile')),
+                ('session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='users.uploadsession')),
+            ],
+            options={
+                'verbose_name': 'Сегмент файла',
+                'verbose_name_plural': 'Сегменты файлов',
+                'constraints': [models.UniqueConstraint(fields=('session', 'index'), name='unique_session_segment'), models.UniqueConstraint(fields=('file', 'index'), name='unique_file_segment')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0017_chunked_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStorageQuota',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='storage_quota', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('used_bytes', models.PositiveBigIntegerField(default=0, verbose_name='Занято')),
+                ('pending_bytes', models.PositiveBigIntegerField(default=0, verbose_name='Зарезервировано')),
+            ],
+            options={
+                'verbose_name': 'Квота хранилища',
+                'verbose_name_plural': 'Квоты хранилища',
+            },
+        ),
+    ]
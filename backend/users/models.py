@@ -1,7 +1,16 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce, Greatest, Length
+from django.utils import timezone
+from .utils.blind_index import blind_index, blind_indexes
+from .utils.conditional import new_data_version
 from .utils.encryption import encryptor
+from .utils.tracing import span
 import json
+import uuid
+from datetime import timedelta
 
 
 class CustomUser(AbstractUser):
@@ -14,15 +23,30 @@ class CustomUser(AbstractUser):
         null=True,
         verbose_name="Зашифрованные данные"
     )
-    encrypted_media = models.BinaryField(
+    # Слепые индексы (HMAC) зашифрованных полей для поиска без дешифрования
+    email_bidx = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
         blank=True,
+        editable=False,
+        verbose_name="Слепой индекс email"
+    )
+    first_name_bidx = models.CharField(
+        max_length=64,
+        db_index=True,
         null=True,
-        verbose_name="Зашифрованные медиафайлы"
+        blank=True,
+        editable=False,
+        verbose_name="Слепой индекс имени"
     )
-    file_metadata = models.JSONField(
-        default=dict,
+    last_name_bidx = models.CharField(
+        max_length=64,
+        db_index=True,
+        null=True,
         blank=True,
-        verbose_name="Метаданные файлов"
+        editable=False,
+        verbose_name="Слепой индекс фамилии"
     )
 
     groups = models.ManyToManyField(
@@ -42,6 +66,18 @@ class CustomUser(AbstractUser):
         related_query_name='customuser',
     )
 
+    # Версия данных пользователя (профиль, файлы) для ETag; меняется при каждом изменении
+    data_version = models.CharField(
+        max_length=32,
+        default=new_data_version,
+        editable=False,
+        verbose_name="Версия данных"
+    )
+
+    # Колонки, которые не нужны для аутентификации и списков.
+    # Медиа и метаданные файлов вынесены в UserMedia и загружаются только по запросу
+    BLOB_FIELDS = ('encrypted_data',)
+
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
@@ -49,22 +85,54 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.username
 
+    @classmethod
+    def bump_data_version(cls, user_id):
+        """Смена версии данных пользователя (UPDATE одной строки, без сигналов)"""
+        cls.objects.filter(pk=user_id).update(data_version=new_data_version())
+
+    def get_media(self):
+        """Медиаданные пользователя (отдельная таблица); создаются при первом обращении"""
+        try:
+            return self.media
+        except UserMedia.DoesNotExist:
+            media, _ = UserMedia.objects.get_or_create(user=self)
+            self.media = media
+            return media
+
+    @classmethod
+    def find_by_email(cls, email):
+        """Поиск пользователя по email через слепой индекс (без дешифрования)"""
+        index = blind_index('email', email)
+        if index is None:
+            return None
+        return cls.objects.filter(email_bidx=index).first()
+
+    def placeholder_email(self):
+        """Маркер вместо настоящего email (реальный email хранится зашифрованным)"""
+        return f"encrypted_{self.username}@placeholder.com"
+
     def save_encrypted_data(self, data):
         """Метод для сохранения зашифрованных текстовых данных"""
         try:
             # Сериализуем dict в JSON-строку, потом шифруем
             data_json = json.dumps(data)
             self.encrypted_data = encryptor.encrypt_data(data_json.encode('utf-8'))
+            # Обновляем слепые индексы вместе с зашифрованными данными
+            for field, index in blind_indexes(data).items():
+                setattr(self, field, index)
         except Exception as e:
             print(f"Failed to encrypt data: {e}")
 
     def get_decrypted_data(self):
         """Метод для получения дешифрованных текстовых данных"""
-        if not self.encrypted_data:
+        return self.decrypt_profile(self.encrypted_data)
+
+    @staticmethod
+    def decrypt_profile(encrypted_data):
+        """Дешифрование профиля из значения колонки encrypted_data"""
+        if not encrypted_data:
             return {}
         try:
-            encrypted_data = self.encrypted_data
-
             # Защита от разного поведения драйверов БД с BinaryField
             if isinstance(encrypted_data, str):
                 encrypted_data = encrypted_data.encode('latin-1')
@@ -83,6 +151,36 @@ class CustomUser(AbstractUser):
             return {}
 
 
+class UserMedia(models.Model):
+    """
+    Крупные зашифрованные данные пользователя, вынесенные из строки CustomUser:
+    аутентификация и списки читают только компактные строки пользователей
+    """
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='media'
+    )
+    encrypted_media = models.BinaryField(
+        blank=True,
+        null=True,
+        verbose_name="Зашифрованные медиафайлы"
+    )
+    file_metadata = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Метаданные файлов"
+    )
+
+    class Meta:
+        verbose_name = 'Медиаданные пользователя'
+        verbose_name_plural = 'Медиаданные пользователей'
+
+    def __str__(self):
+        return f"Медиаданные {self.user_id}"
+
+
 class UserFile(models.Model):
     """Модель для хранения зашифрованных файлов пользователей"""
     user = models.ForeignKey(
@@ -93,9 +191,16 @@ class UserFile(models.Model):
     original_name = models.CharField(max_length=255, verbose_name="Оригинальное имя файла")
     encrypted_data = models.BinaryField(verbose_name="Зашифрованные данные файла")
     file_size = models.IntegerField(verbose_name="Размер файла")
+    encrypted_size = models.PositiveBigIntegerField(default=0, editable=False,
+                                                    verbose_name="Размер зашифрованных данных")
+    # Файлы, загруженные по частям, хранятся в FileSegment, а encrypted_data пуст
+    segment_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Число сегментов")
     content_type = models.CharField(max_length=100, verbose_name="Тип содержимого")
     description = models.TextField(blank=True, verbose_name="Описание")
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата загрузки")
+    # Результаты анализа содержимого (для аудио — длительность и пики волны),
+    # чтобы клиент не скачивал и не расшифровывал файл ради отображения
+    metadata = models.JSONField(default=dict, blank=True, verbose_name="Метаданные")
 
     class Meta:
         verbose_name = 'Файл пользователя'
@@ -106,18 +211,411 @@ class UserFile(models.Model):
         return f"{self.original_name} ({self.user.username})"
 
     def save(self, *args, **kwargs):
-        # Шифруем данные перед сохранением
-        if not self.pk:  # Только для новых файлов
-            if hasattr(self, '_file_data'):
-                # _file_data - временный атрибут, передаваемый из view
-                self.encrypted_data = encryptor.encrypt_data(self._file_data)
-        super().save(*args, **kwargs)
+        with span('userfile.save', content_type=self.content_type, size=self.file_size):
+            # Шифруем данные перед сохранением
+            if not self.pk:  # Только для новых файлов
+                if hasattr(self, '_file_data'):
+                    # _file_data - временный атрибут, передаваемый из view
+                    self.encrypted_data = encryptor.encrypt_data(self._file_data)
+                if not self.segment_count:
+                    self.encrypted_size = len(self.encrypted_data or b'')
+            with span('db.insert' if not self.pk else 'db.update', table=self._meta.db_table):
+                super().save(*args, **kwargs)
 
     def get_decrypted_data(self):
         """Получение дешифрованных данных файла (байты)"""
+        if self.segment_count:
+            return b''.join(self.iter_decrypted_segments())
         # Используем decrypt_binary, так как файлы могут быть не текстом
         return encryptor.decrypt_binary(self.encrypted_data)
 
+    def iter_decrypted_chunks(self):
+        """
+        Содержимое файла по частям для потоковой выдачи: загруженный по частям
+        файл — по сегменту, загруженный одним запросом — одним блоком (до 10MB)
+        """
+        if self.segment_count:
+            yield from self.iter_decrypted_segments()
+        else:
+            yield self.get_decrypted_data()
+
+    def iter_decrypted_segments(self):
+        """Расшифрованные сегменты по порядку; в памяти одновременно один сегмент"""
+        blobs = self.segments.order_by('index').values_list('encrypted_data', flat=True)
+        for encrypted_data in blobs.iterator(chunk_size=1):
+            yield encryptor.decrypt_binary(bytes(encrypted_data))
+
+    def analyze_audio(self):
+        """
+        Длительность и пики волны аудиофайла в metadata. UPDATE одной колонки без
+        save(): блоб не перезаписывается, версия данных владельца меняется явно.
+        """
+        from .utils.audio import analyze_audio
+
+        if not self.content_type.startswith('audio/'):
+            return None
+        if self.file_size > getattr(settings, 'AUDIO_ANALYSIS_MAX_BYTES', 50 * 1024 * 1024):
+            return None
+        with span('audio.analyze', file_id=self.pk, size=self.file_size):
+            audio = analyze_audio(self.get_decrypted_data(), self.content_type)
+        if audio is None:
+            return None
+        self.metadata = {**self.metadata, 'audio': audio}
+        UserFile.objects.filter(pk=self.pk).update(metadata=self.metadata)
+        CustomUser.bump_data_version(self.user_id)
+        return audio
+
+
+class UploadSession(models.Model):
+    """
+    Сессия загрузки файла по частям. Части принимаются в любом порядке (в т.ч.
+    параллельно) и сразу шифруются в FileSegment; завершение превращает
+    сегменты в UserFile без копирования данных.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions'
+    )
+    original_name = models.CharField(max_length=255, verbose_name="Оригинальное имя файла")
+    content_type = models.CharField(max_length=100, verbose_name="Тип содержимого")
+    description = models.TextField(blank=True, verbose_name="Описание")
+    total_size = models.PositiveBigIntegerField(verbose_name="Размер файла")
+    chunk_size = models.PositiveIntegerField(verbose_name="Размер части")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    expires_at = models.DateTimeField(db_index=True, verbose_name="Истекает")
+
+    class Meta:
+        verbose_name = 'Сессия загрузки'
+        verbose_name_plural = 'Сессии загрузки'
+
+    def __str__(self):
+        return f"{self.original_name} ({self.user_id})"
+
+    def save(self, *args, **kwargs):
+        if self.expires_at is None:
+            ttl = getattr(settings, 'CHUNKED_UPLOAD_SESSION_TTL', 24 * 3600)
+            self.expires_at = timezone.now() + timedelta(seconds=ttl)
+        super().save(*args, **kwargs)
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+
+    def expected_size(self, index):
+        """Размер части: все полные, кроме последней"""
+        if index == self.chunk_count - 1:
+            return self.total_size - index * self.chunk_size
+        return self.chunk_size
+
+    def received_chunks(self):
+        return list(self.segments.order_by('index').values_list('index', flat=True))
+
+    def missing_chunks(self):
+        received = set(self.received_chunks())
+        return [index for index in range(self.chunk_count) if index not in received]
+
+    def store_chunk(self, offset, data):
+        """
+        Шифрование и сохранение части по смещению. Повторная отправка той же
+        части (после обрыва соединения) заменяет ее. ValueError при неверном
+        смещении или размере.
+        """
+        if offset % self.chunk_size or offset >= max(self.total_size, 1):
+            raise ValueError(f'Смещение должно быть кратно {self.chunk_size} и меньше размера файла')
+        index = offset // self.chunk_size
+        if len(data) != self.expected_size(index):
+            raise ValueError(f'Размер части {index}: ожидается {self.expected_size(index)} байт, '
+                             f'получено {len(data)}')
+        with span('upload.store_chunk', index=index, bytes=len(data)):
+            segment, _ = FileSegment.objects.update_or_create(session=self, index=index, defaults={
+                'size': len(data),
+                'encrypted_data': encryptor.encrypt_data(data),
+            })
+        return segment
+
+    @transaction.atomic
+    def finalize(self):
+        """
+        Создание UserFile из полученных сегментов: сегменты переходят к файлу
+        одним UPDATE, блобы не читаются. ValueError, если не все части получены.
+        """
+        missing = self.missing_chunks()
+        if missing:
+            raise ValueError(f'Не получены части: {missing[:20]}')
+        totals = self.segments.aggregate(plaintext=models.Sum('size'),
+                                         ciphertext=models.Sum(Length('encrypted_data')))
+        if (totals['plaintext'] or 0) != self.total_size:
+            raise ValueError('Размер полученных частей не совпадает с размером файла')
+
+        user_file = UserFile(
+            user_id=self.user_id,
+            original_name=self.original_name,
+            file_size=self.total_size,
+            content_type=self.content_type,
+            description=self.description,
+            encrypted_data=b'',
+            encrypted_size=totals['ciphertext'] or 0,
+            segment_count=self.chunk_count,
+        )
+        # Задачи из post_save (миниатюры, анализ аудио) увидят файл только после
+        # фиксации транзакции, когда сегменты уже привязаны к нему
+        user_file.save()
+        self.segments.update(file=user_file, session=None)
+        self.delete()
+        return user_file
+
+    @classmethod
+    def prune_expired(cls, now=None):
+        """Удаление незавершенных сессий с истекшим сроком вместе с их сегментами"""
+        return cls.objects.filter(expires_at__lt=now or timezone.now()).delete()[0]
+
+
+class FileSegment(models.Model):
+    """
+    Зашифрованная часть файла. Пока загрузка не завершена, сегмент принадлежит
+    сессии, после завершения — файлу. Каждая часть шифруется отдельно, поэтому
+    чтение и выгрузка файла идут по одному сегменту.
+    """
+    session = models.ForeignKey(
+        UploadSession,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='segments'
+    )
+    file = models.ForeignKey(
+        UserFile,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='segments'
+    )
+    index = models.PositiveIntegerField(verbose_name="Номер части")
+    size = models.PositiveIntegerField(verbose_name="Размер части")
+    encrypted_data = models.BinaryField(verbose_name="Зашифрованные данные части")
+
+    class Meta:
+        verbose_name = 'Сегмент файла'
+        verbose_name_plural = 'Сегменты файлов'
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'index'], name='unique_session_segment'),
+            models.UniqueConstraint(fields=['file', 'index'], name='unique_file_segment'),
+        ]
+
+    def __str__(self):
+        return f"{self.file_id or self.session_id} #{self.index}"
+
+
+class UserFilePreview(models.Model):
+    """
+    Зашифрованная миниатюра изображения. Хранится отдельно от UserFile,
+    чтобы галерея не загружала и не расшифровывала исходные файлы.
+    """
+    file = models.OneToOneField(
+        UserFile,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='preview'
+    )
+    encrypted_thumbnail = models.BinaryField(verbose_name="Зашифрованная миниатюра")
+    content_type = models.CharField(max_length=100, verbose_name="Тип миниатюры")
+    width = models.PositiveIntegerField(verbose_name="Ширина")
+    height = models.PositiveIntegerField(verbose_name="Высота")
+    generated_at = models.DateTimeField(auto_now=True, verbose_name="Создана")
+
+    class Meta:
+        verbose_name = 'Миниатюра файла'
+        verbose_name_plural = 'Миниатюры файлов'
+
+    def __str__(self):
+        return f"{self.file_id} {self.width}x{self.height}"
+
+    @classmethod
+    def is_supported(cls, content_type):
+        return content_type.startswith('image/')
+
+    @classmethod
+    def can_generate(cls, user_file):
+        """Изображение не больше THUMBNAIL_MAX_SOURCE_BYTES: проверка без расшифровки"""
+        return (cls.is_supported(user_file.content_type)
+                and user_file.file_size <= getattr(settings, 'THUMBNAIL_MAX_SOURCE_BYTES', 20 * 1024 * 1024))
+
+    @classmethod
+    def generate(cls, user_file):
+        """
+        Создание (или пересоздание) миниатюры по расшифрованному файлу.
+        None, если файл не изображение, больше THUMBNAIL_MAX_SOURCE_BYTES
+        или Pillow не может его прочитать.
+        """
+        from PIL import Image, UnidentifiedImageError
+
+        from .utils.thumbnails import make_thumbnail
+
+        if not cls.can_generate(user_file):
+            return None
+        try:
+            with span('thumbnail.generate', file_id=user_file.pk):
+                data, width, height, content_type = make_thumbnail(user_file.get_decrypted_data())
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError):
+            return None
+        preview, _ = cls.objects.update_or_create(file=user_file, defaults={
+            'encrypted_thumbnail': encryptor.encrypt_data(data),
+            'content_type': content_type,
+            'width': width,
+            'height': height,
+        })
+        return preview
+
+    def get_decrypted_thumbnail(self):
+        return encryptor.decrypt_binary(self.encrypted_thumbnail)
+
+
+class UserStorageUsage(models.Model):
+    """
+    Агрегаты хранилища пользователя по типу содержимого.
+    Обновляются атомарно (UPDATE ... SET x = x + delta) при загрузке и удалении файлов,
+    поэтому объем хранилища не требует суммирования по всем файлам пользователя.
+    """
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='storage_usage'
+    )
+    content_type = models.CharField(max_length=100, verbose_name="Тип содержимого")
+    file_count = models.PositiveIntegerField(default=0, verbose_name="Число файлов")
+    plaintext_bytes = models.PositiveBigIntegerField(default=0, verbose_name="Объем файлов")
+    ciphertext_bytes = models.PositiveBigIntegerField(default=0, verbose_name="Объем зашифрованных данных")
+
+    class Meta:
+        verbose_name = 'Использование хранилища'
+        verbose_name_plural = 'Использование хранилища'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'content_type'], name='unique_user_storage_usage'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.content_type}: {self.plaintext_bytes} байт"
+
+    @classmethod
+    def record(cls, user_id, content_type, files, plaintext_bytes, ciphertext_bytes):
+        """Атомарное изменение агрегатов на дельту (files=1 при загрузке, -1 при удалении)"""
+        deltas = {
+            'file_count': F('file_count') + files,
+            'plaintext_bytes': F('plaintext_bytes') + plaintext_bytes,
+            'ciphertext_bytes': F('ciphertext_bytes') + ciphertext_bytes,
+        }
+        UserStorageQuota.objects.filter(user_id=user_id).update(
+            used_bytes=Greatest(F('used_bytes') + plaintext_bytes, 0))
+        if cls.objects.filter(user_id=user_id, content_type=content_type).update(**deltas) or files < 0:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, content_type=content_type, file_count=files,
+                                   plaintext_bytes=plaintext_bytes, ciphertext_bytes=ciphertext_bytes)
+        except IntegrityError:
+            # Строку создал параллельный запрос
+            cls.objects.filter(user_id=user_id, content_type=content_type).update(**deltas)
+
+    @classmethod
+    def summary(cls, user_id):
+        """Сводка по пользователю: один запрос по индексу (строк не больше, чем типов файлов)"""
+        summary = {'file_count': 0, 'plaintext_bytes': 0, 'ciphertext_bytes': 0, 'bytes_by_type': {}}
+        rows = cls.objects.filter(user_id=user_id).values_list(
+            'content_type', 'file_count', 'plaintext_bytes', 'ciphertext_bytes')
+        for content_type, file_count, plaintext_bytes, ciphertext_bytes in rows:
+            summary['file_count'] += file_count
+            summary['plaintext_bytes'] += plaintext_bytes
+            summary['ciphertext_bytes'] += ciphertext_bytes
+            if file_count:
+                summary['bytes_by_type'][content_type] = plaintext_bytes
+        return summary
+
+    @classmethod
+    def used_bytes(cls, user_id):
+        """Занятый объем (байты файлов) для проверки квоты"""
+        return cls.objects.filter(user_id=user_id).aggregate(total=models.Sum('plaintext_bytes'))['total'] or 0
+
+    @classmethod
+    def rebuild(cls, user_ids=None):
+        """Пересчет агрегатов по файлам (исправление расхождений и первичное заполнение)"""
+        files = UserFile.objects.all()
+        usage = cls.objects.all()
+        if user_ids is not None:
+            files = files.filter(user_id__in=user_ids)
+            usage = usage.filter(user_id__in=user_ids)
+        rows = files.values('user_id', 'content_type').annotate(
+            count=models.Count('pk'),
+            plaintext=models.Sum('file_size'),
+            ciphertext=models.Sum('encrypted_size'),
+        ).order_by()
+        with transaction.atomic():
+            usage.delete()
+            cls.objects.bulk_create([
+                cls(user_id=row['user_id'], content_type=row['content_type'], file_count=row['count'],
+                    plaintext_bytes=row['plaintext'] or 0, ciphertext_bytes=row['ciphertext'] or 0)
+                for row in rows
+            ], batch_size=500)
+            quotas = UserStorageQuota.objects.all()
+            if user_ids is not None:
+                quotas = quotas.filter(user_id__in=user_ids)
+            used = cls.objects.filter(user_id=models.OuterRef('user_id')).values('user_id').annotate(
+                total=models.Sum('plaintext_bytes')).values('total')
+            quotas.update(used_bytes=Coalesce(models.Subquery(used), 0))
+
+
+class UserStorageQuota(models.Model):
+    """
+    Счетчики квоты пользователя: занятый объем и место, зарезервированное под
+    загрузки в процессе. Резервирование — один условный UPDATE
+    (pending = pending + n WHERE used + pending + n <= квота), поэтому параллельные
+    загрузки и сессии не могут вместе превысить квоту.
+    """
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='storage_quota'
+    )
+    used_bytes = models.PositiveBigIntegerField(default=0, verbose_name="Занято")
+    pending_bytes = models.PositiveBigIntegerField(default=0, verbose_name="Зарезервировано")
+
+    class Meta:
+        verbose_name = 'Квота хранилища'
+        verbose_name_plural = 'Квоты хранилища'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.used_bytes} + {self.pending_bytes} байт"
+
+    @classmethod
+    def ensure(cls, user_id):
+        """Строка счетчиков; при первом обращении заполняется по агрегатам и открытым сессиям"""
+        if cls.objects.filter(user_id=user_id).exists():
+            return
+        pending = UploadSession.objects.filter(user_id=user_id).aggregate(total=models.Sum('total_size'))
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, used_bytes=UserStorageUsage.used_bytes(user_id),
+                                   pending_bytes=pending['total'] or 0)
+        except IntegrityError:
+            pass  # строку создал параллельный запрос
+
+    @classmethod
+    def reserve(cls, user_id, size, quota=None):
+        """Резервирование size байт; False, если с ним занятое и зарезервированное превысит квоту"""
+        cls.ensure(user_id)
+        rows = cls.objects.filter(user_id=user_id)
+        if quota is not None:
+            rows = rows.alias(total=F('used_bytes') + F('pending_bytes')).filter(total__lte=quota - size)
+        return bool(rows.update(pending_bytes=F('pending_bytes') + size))
+
+    @classmethod
+    def release(cls, user_id, size):
+        """Снятие резерва: загрузка завершена (объем уже учтен в used_bytes) или отменена"""
+        cls.objects.filter(user_id=user_id).update(pending_bytes=Greatest(F('pending_bytes') - size, 0))
+
+
 class WeatherData(models.Model):
     """
     Модель для хранения истории погоды
@@ -133,4 +631,60 @@ class WeatherData(models.Model):
         ordering = ['-date']
 
     def __str__(self):
-        return f"{self.date.strftime('%Y-%m-%d %H:%M')} - {self.temperature}"
\ No newline at end of file
+        return f"{self.date.strftime('%Y-%m-%d %H:%M')} - {self.temperature}"
+
+class RevokedToken(models.Model):
+    """
+    Отозванный refresh-токен: хранится только jti и срок действия.
+    Записи с истекшим сроком удаляет prune_token_blacklist.
+    """
+    jti = models.CharField(max_length=64, unique=True, verbose_name="Идентификатор токена")
+    expires_at = models.DateTimeField(db_index=True, verbose_name="Истекает")
+
+    class Meta:
+        verbose_name = 'Отозванный токен'
+        verbose_name_plural = 'Отозванные токены'
+
+    def __str__(self):
+        return self.jti
+
+
+class Task(models.Model):
+    """
+    Фоновая задача в очереди на основе БД (users.utils.task_queue).
+    Выполняется процессами manage.py run_workers; взятая задача невидима
+    для других воркеров до locked_until, после чего может быть взята повторно.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name="Задача")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Аргументы")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="Статус")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток")
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name="Максимум попыток")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="Не раньше")
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name="Занята до")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="Воркер")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершена")
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            # Выборка готовых к выполнению задач воркером
+            models.Index(fields=['status', 'run_after'], name='task_ready_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
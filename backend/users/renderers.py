@@ -0,0 +1,49 @@
+from django.conf import settings
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # без orjson работают стандартные классы DRF
+    orjson = None
+
+# datetime с UTC сериализуется как '...Z', как у encoders.JSONEncoder
+ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def _default(obj):
+    """Типы, которых нет в orjson (Decimal, ленивые строки, QuerySet), — как в DRF"""
+    return encoders.JSONEncoder().default(obj)
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """
+    JSON-рендерер на orjson: datetime, date, UUID сериализуются без Python-кода,
+    остальное — через кодировщик DRF. Отступы (Accept: ...; indent=N) и
+    отсутствие orjson обрабатывает стандартный JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+
+
+class ORJSONParser(JSONParser):
+    """JSON-парсер на orjson (тело в UTF-8); при другой кодировке — стандартный JSONParser"""
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -1,11 +1,17 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
-from .models import CustomUser
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from .models import CustomUser, UserStorageUsage
 from .validators import PasswordStrengthValidator
 import json
+from .utils.blind_index import blind_index
 from .utils.encryption import encryptor
 from .models import WeatherData
 
+EMAIL_EXISTS_MESSAGE = "Пользователь с таким email уже существует."
+USERNAME_EXISTS_MESSAGE = "Пользователь с таким именем уже существует."
+
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
@@ -26,6 +32,12 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         validator.validate(value)
         return value
 
+    def validate_email(self, value):
+        """Проверка уникальности email по слепому индексу (индексный запрос, без дешифрования)"""
+        if CustomUser.objects.filter(email_bidx=blind_index('email', value)).exists():
+            raise serializers.ValidationError(EMAIL_EXISTS_MESSAGE)
+        return value
+
     def validate(self, attrs):
         if attrs['password'] != attrs['password2']:
             raise serializers.ValidationError({"password": "Пароли не совпадают."})
@@ -41,25 +53,33 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         first_name = validated_data.pop('first_name', '')
         last_name = validated_data.pop('last_name', '')
 
-        # 3. Создаем пользователя только с НЕШИФРУЕМЫМИ полями
-        user = CustomUser.objects.create(**validated_data)
+        # 3. Собираем пользователя в памяти только с НЕШИФРУЕМЫМИ полями
+        user = CustomUser(**validated_data)
 
         # 4. Устанавливаем пароль (хешируется)
         user.set_password(password)
 
-        # 5. Собираем, шифруем и сохраняем остальные данные
-        data_to_encrypt = {
+        # 5. Собираем и шифруем остальные данные (заодно считаются слепые индексы)
+        user.save_encrypted_data({
             'email': email,
             'first_name': first_name,
             'last_name': last_name
-        }
-        user.save_encrypted_data(data_to_encrypt)
-
-        # 6. Сохраняем email как маркер (или можно хранить хеш для поиска)
-        user.email = f"encrypted_{user.id}@placeholder.com"
-
-        # Сохраняем пользователя
-        user.save()
+        })
+
+        # 6. Email заменяем маркером (поиск идет по слепому индексу)
+        user.email = user.placeholder_email()
+
+        # Один INSERT со всеми полями. Уникальность проверена при валидации, но параллельная
+        # регистрация может успеть между проверкой и INSERT: тогда ошибка валидации, а не 500
+        try:
+            with transaction.atomic():
+                user.save(force_insert=True)
+        except IntegrityError:
+            if CustomUser.objects.filter(email_bidx=user.email_bidx).exists():
+                raise serializers.ValidationError({'email': [EMAIL_EXISTS_MESSAGE]})
+            if CustomUser.objects.filter(username=user.username).exists():
+                raise serializers.ValidationError({'username': [USERNAME_EXISTS_MESSAGE]})
+            raise
         return user
 
 class UserLoginSerializer(serializers.Serializer):
@@ -79,11 +99,12 @@ class UserProfileSerializer(serializers.ModelSerializer):
     email = serializers.SerializerMethodField()
     first_name = serializers.SerializerMethodField()
     last_name = serializers.SerializerMethodField()
+    storage = serializers.SerializerMethodField()
 
     class Meta:
         model = CustomUser
-        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'date_joined', 'last_login')
-        read_only_fields = ('id', 'date_joined', 'last_login', 'email', 'first_name', 'last_name')
+        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'date_joined', 'last_login', 'storage')
+        read_only_fields = ('id', 'date_joined', 'last_login', 'email', 'first_name', 'last_name', 'storage')
 
     def get_decrypted_data(self, obj):
         # Кэшируем результат, чтобы не дешифровать 3 раза
@@ -100,16 +121,24 @@ class UserProfileSerializer(serializers.ModelSerializer):
     def get_last_name(self, obj):
         return self.get_decrypted_data(obj).get('last_name')
 
+    def get_storage(self, obj):
+        """Объем хранилища из агрегатов (без обхода файлов пользователя)"""
+        storage = UserStorageUsage.summary(obj.pk)
+        storage['quota_bytes'] = getattr(settings, 'USER_STORAGE_QUOTA_BYTES', None)
+        return storage
+
+ALLOWED_UPLOAD_TYPES = ['image/jpeg', 'image/png', 'image/gif', 'audio/mpeg', 'audio/wav']
+UNSUPPORTED_TYPE_MESSAGE = "Неподдерживаемый тип файла. Разрешены: изображения (JPEG, PNG, GIF) и аудио (MP3, WAV)."
+
+
 class FileUploadSerializer(serializers.Serializer):
     file = serializers.FileField(required=True)
     description = serializers.CharField(required=False, max_length=255)
 
     def validate_file(self, value):
         # Проверка типа файла
-        allowed_types = ['image/jpeg', 'image/png', 'image/gif', 'audio/mpeg', 'audio/wav']
-        if value.content_type not in allowed_types:
-            raise serializers.ValidationError(
-                "Неподдерживаемый тип файла. Разрешены: изображения (JPEG, PNG, GIF) и аудио (MP3, WAV).")
+        if value.content_type not in ALLOWED_UPLOAD_TYPES:
+            raise serializers.ValidationError(UNSUPPORTED_TYPE_MESSAGE)
 
         # Проверка размера файла (максимум 10MB)
         max_size = 10 * 1024 * 1024
@@ -118,6 +147,26 @@ class FileUploadSerializer(serializers.Serializer):
 
         return value
 
+
+class UploadSessionSerializer(serializers.Serializer):
+    """Параметры загрузки по частям: файл описывается заранее, данные идут отдельными PUT"""
+    name = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    content_type = serializers.CharField(max_length=100)
+    description = serializers.CharField(required=False, allow_blank=True, max_length=255)
+
+    def validate_content_type(self, value):
+        if value not in ALLOWED_UPLOAD_TYPES:
+            raise serializers.ValidationError(UNSUPPORTED_TYPE_MESSAGE)
+        return value
+
+    def validate_size(self, value):
+        max_size = getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 200 * 1024 * 1024)
+        if value > max_size:
+            raise serializers.ValidationError(f"Файл слишком большой. Максимальный размер: {max_size} байт.")
+        return value
+
+
 class WeatherSerializer(serializers.ModelSerializer):
     class Meta:
         model = WeatherData
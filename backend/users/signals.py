@@ -0,0 +1,69 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_cached_user
+from .models import CustomUser, UploadSession, UserFile, UserFilePreview, UserStorageQuota, UserStorageUsage
+from .utils.task_queue import enqueue
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Сохранение (в т.ч. деактивация) или удаление пользователя сбрасывает его снимок в кеше"""
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=CustomUser)
+def bump_user_data_version(sender, instance, created, **kwargs):
+    """Любое сохранение пользователя (профиль, last_login) меняет версию для ETag"""
+    if not created:
+        CustomUser.bump_data_version(instance.pk)
+
+
+@receiver(post_save, sender=UserFile)
+@receiver(post_delete, sender=UserFile)
+def bump_files_data_version(sender, instance, **kwargs):
+    """Изменение списка файлов меняет версию данных владельца"""
+    CustomUser.bump_data_version(instance.user_id)
+
+
+@receiver(post_save, sender=UserFile)
+def count_uploaded_file(sender, instance, created, **kwargs):
+    """Новый файл увеличивает агрегаты хранилища владельца"""
+    if created:
+        UserStorageUsage.record(instance.user_id, instance.content_type, 1,
+                                instance.file_size, instance.encrypted_size)
+
+
+@receiver(post_delete, sender=UserFile)
+def count_deleted_file(sender, instance, origin=None, **kwargs):
+    """Удаленный файл уменьшает агрегаты (при удалении самого пользователя агрегаты удаляются каскадом)"""
+    if isinstance(origin, CustomUser):
+        return
+    UserStorageUsage.record(instance.user_id, instance.content_type, -1,
+                            -instance.file_size, -instance.encrypted_size)
+
+
+@receiver(post_delete, sender=UploadSession)
+def release_upload_reservation(sender, instance, origin=None, **kwargs):
+    """
+    Сессия резервирует место в квоте при создании; резерв снимается при ее удалении:
+    после завершения (объем уже учтен файлом, в той же транзакции), отмене или истечении
+    """
+    if isinstance(origin, CustomUser):
+        return
+    UserStorageQuota.release(instance.user_id, instance.total_size)
+
+
+@receiver(post_save, sender=UserFile)
+def schedule_thumbnail(sender, instance, created, **kwargs):
+    """Миниатюра нового изображения строится воркером очереди, а не в запросе загрузки"""
+    if created and UserFilePreview.is_supported(instance.content_type):
+        enqueue('files.generate_thumbnail', file_id=instance.pk)
+
+
+@receiver(post_save, sender=UserFile)
+def schedule_audio_analysis(sender, instance, created, **kwargs):
+    """Длительность и пики волны нового аудиофайла считает воркер очереди"""
+    if created and instance.content_type.startswith('audio/'):
+        enqueue('files.analyze_audio', file_id=instance.pk)
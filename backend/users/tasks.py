@@ -0,0 +1,37 @@
+"""
+Фоновые задачи, выполняемые воркерами очереди (manage.py run_workers).
+Ставятся в очередь по имени: enqueue('users.recompute_storage_usage', user_ids=[1]).
+"""
+from .models import UploadSession, UserFile, UserFilePreview, UserStorageUsage
+from .utils.task_queue import task
+from .utils.token_blacklist import prune_expired
+
+
+@task('users.prune_token_blacklist')
+def prune_token_blacklist(batch_size=1000):
+    prune_expired(batch_size=batch_size)
+
+
+@task('users.recompute_storage_usage')
+def recompute_storage_usage(user_ids=None):
+    UserStorageUsage.rebuild(user_ids)
+
+
+@task('uploads.prune_expired')
+def prune_expired_uploads():
+    UploadSession.prune_expired()
+
+
+@task('files.generate_thumbnail')
+def generate_thumbnail(file_id):
+    # Блоб загружается только если размер файла прошел проверку в generate()
+    user_file = UserFile.objects.defer('encrypted_data').filter(pk=file_id).first()
+    if user_file is not None:  # файл могли удалить до выполнения задачи
+        UserFilePreview.generate(user_file)
+
+
+@task('files.analyze_audio')
+def analyze_audio(file_id):
+    user_file = UserFile.objects.defer('encrypted_data').filter(pk=file_id).first()
+    if user_file is not None:
+        user_file.analyze_audio()
@@ -1,11 +1,43 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import re
+import struct
+import tempfile
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import AsyncClient, Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.core.exceptions import ValidationError
-from .validators import PasswordValidator
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import CustomUser, FileSegment, RevokedToken, Task, UploadSession, UserFile, UserFilePreview, UserMedia, UserStorageQuota, UserStorageUsage, WeatherData
+from .renderers import ORJSONParser, ORJSONRenderer
+from .serializers import UserRegistrationSerializer
+from .utils import archive, audio, compression, task_queue, tracing
+from .utils.log_analytics import LogReport, analyze_file
+from .utils.query_budget import QueryBudgetExceeded, QueryBudgetTestMixin, record_queries
+from .utils.token_blacklist import revocation_filter
+from .validators import PasswordStrengthValidator
 
 
 class PasswordValidatorTest(TestCase):
     def setUp(self):
-        self.validator = PasswordValidator()
+        self.validator = PasswordStrengthValidator()
 
     def test_strong_password(self):
         """Тест сильного пароля"""
@@ -28,4 +60,1174 @@ class PasswordValidatorTest(TestCase):
     def test_common_sequence(self):
         """Тест пароля с простой последовательностью"""
         with self.assertRaises(ValidationError):
-            self.validator.validate("qwerty123!")
\ No newline at end of file
+            self.validator.validate("qwerty123!")
+
+
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.profiles_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profiles_dir.cleanup)
+        self.override = override_settings(REQUEST_PROFILING_ENABLED=True, REQUEST_PROFILING_DIR=self.profiles_dir.name)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+        self.client = APIClient()
+        self.staff = CustomUser.objects.create_user(username='staff', password='StrongPass123!', is_staff=True)
+        self.user = CustomUser.objects.create_user(username='user', password='StrongPass123!')
+
+    def auth(self, user):
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_staff_request_is_profiled(self):
+        """Профиль сохраняется для staff по заголовку X-Profile"""
+        self.auth(self.staff)
+        response = self.client.get('/api/auth/weather/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+
+        summary = self.client.get(f'/api/auth/profiles/{profile_id}/')
+        self.assertEqual(summary.status_code, 200)
+        data = json.loads(b''.join(summary.streaming_content))
+        self.assertEqual(data['path'], '/api/auth/weather/')
+        self.assertGreaterEqual(data['sql']['count'], 1)
+        self.assertIn('encryption_seconds', data)
+        self.assertTrue(data['top_functions'])
+
+    def test_disabled_by_setting(self):
+        """При REQUEST_PROFILING_ENABLED=False заголовок X-Profile игнорируется"""
+        self.auth(self.staff)
+        with self.settings(REQUEST_PROFILING_ENABLED=False):
+            response = self.client.get('/api/auth/weather/', HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(os.listdir(self.profiles_dir.name), [])
+
+    def test_old_profiles_are_pruned(self):
+        """На диске остаются только REQUEST_PROFILING_MAX_PROFILES последних профилей"""
+        self.auth(self.staff)
+        with self.settings(REQUEST_PROFILING_MAX_PROFILES=2):
+            profile_ids = [self.client.get('/api/auth/weather/', HTTP_X_PROFILE='1')['X-Profile-Id']
+                           for _ in range(3)]
+        stems = {name.rsplit('.', 1)[0] for name in os.listdir(self.profiles_dir.name)}
+        self.assertEqual(len(stems), 2)
+        self.assertEqual(len(os.listdir(self.profiles_dir.name)), 4)
+        self.assertLessEqual(stems, set(profile_ids))
+
+    def test_regular_user_is_not_profiled(self):
+        """Обычный пользователь не может включить профилирование"""
+        self.auth(self.user)
+        response = self.client.get('/api/auth/weather/?_profile=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_invalid_profile_id(self):
+        """Некорректный идентификатор профиля не приводит к чтению произвольных файлов"""
+        self.auth(self.staff)
+        response = self.client.get('/api/auth/profiles/..%2Fsettings/')
+        self.assertEqual(response.status_code, 404)
+
+
+class AsyncMiddlewareTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='user', password='StrongPass123!')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    async def test_request_through_async_chain(self):
+        """Логирующие middleware работают в ASGI-режиме без вычисления ленивого request.user"""
+        with self.assertLogs('api', level='INFO') as logs:
+            response = await self.async_client.get(
+                '/api/auth/weather/', headers={'Authorization': f'Bearer {self.token}'}
+            )
+        self.assertEqual(response.status_code, 200)
+        response_logs = [line for line in logs.output if 'RESPONSE:' in line]
+        self.assertEqual(len(response_logs), 1)
+        self.assertIn('"user": "user"', response_logs[0])
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+
+    async def test_builtin_hooks_with_session_and_csrf(self):
+        """CSRF-проверка и сохранение сессии в async-цепочке работают как в sync"""
+        await sync_to_async(CustomUser.objects.create_superuser)('admin', 'admin@example.com', 'StrongPass123!')
+        client = AsyncClient(enforce_csrf_checks=True)
+        data = {'username': 'admin', 'password': 'StrongPass123!', 'next': '/admin/'}
+        self.assertEqual((await client.post('/admin/login/', data)).status_code, 403)
+
+        await client.get('/admin/login/')
+        data['csrfmiddlewaretoken'] = client.cookies['csrftoken'].value
+        response = await client.post('/admin/login/', data)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('sessionid', response.cookies)
+        self.assertEqual((await client.get('/admin/')).status_code, 200)
+
+
+class TracingTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(username='user', password='StrongPass123!')
+        self.client.force_authenticate(self.user)
+
+    def test_disabled_tracing_is_noop(self):
+        """При выключенной трассировке span() возвращает общую заглушку"""
+        self.assertIs(tracing.span('anything'), tracing.NOOP_SPAN)
+
+    @override_settings(TRACING_ENABLED=True, TRACING_EXPORTER='users.utils.tracing.MemoryExporter',
+                       TRACING_EXPORTER_OPTIONS={})
+    def test_upload_spans(self):
+        """Загрузка файла порождает дерево span'ов одной трассы"""
+        upload = SimpleUploadedFile('a.png', b'\x89PNG' + b'0' * 1024, content_type='image/png')
+        response = self.client.post('/api/auth/upload/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        spans = {s['name']: s for s in tracing.get_exporter().spans}
+        root = spans['http.request']
+        self.assertEqual(response['X-Trace-Id'], root['trace_id'])
+        self.assertIsNone(root['parent_id'])
+        for name in ('view.file_upload', 'upload.parse_multipart', 'userfile.save', 'crypto.encrypt', 'db.insert'):
+            self.assertEqual(spans[name]['trace_id'], root['trace_id'])
+        self.assertEqual(spans['view.file_upload']['parent_id'], root['span_id'])
+        self.assertEqual(spans['crypto.encrypt']['parent_id'], spans['userfile.save']['span_id'])
+        self.assertEqual(spans['db.insert']['parent_id'], spans['userfile.save']['span_id'])
+
+    @override_settings(TRACING_ENABLED=True, TRACING_EXPORTER='users.utils.tracing.MemoryExporter',
+                       TRACING_EXPORTER_OPTIONS={})
+    def test_multipart_parsed_inside_parse_span(self):
+        """Тело multipart разбирается во view (span upload.parse_multipart), а не в логирующем middleware"""
+        from django.http.multipartparser import MultiPartParser
+
+        parse = MultiPartParser.parse
+        parsed_in = []
+
+        def tracked_parse(parser):
+            parsed_in.append(tracing.current_span().name)
+            return parse(parser)
+
+        upload = SimpleUploadedFile('a.png', b'\x89PNG' + b'0' * 1024, content_type='image/png')
+        with mock.patch.object(MultiPartParser, 'parse', tracked_parse):
+            response = self.client.post('/api/auth/upload/', {'file': upload, 'description': 'x'}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(parsed_in, ['upload.parse_multipart'])
+
+
+class AnalyzeLogsCommandTest(TestCase):
+    LOG_LINES = [
+        '2025-11-21 10:00:00,001 | INFO | REQUEST: {"method": "GET", "path": "/api/auth/files/"}',
+        '2025-11-21 10:00:00,101 | INFO | RESPONSE: {"method": "GET", "path": "/api/auth/files/", '
+        '"status_code": 200, "duration_seconds": 0.010}',
+        '2025-11-21 10:00:01,101 | INFO | RESPONSE: {"method": "GET", "path": "/api/auth/files/", '
+        '"status_code": 200, "duration_seconds": 0.030}',
+        '2025-11-21 10:00:02,101 | INFO | RESPONSE: {"method": "GET", "path": "/api/auth/files/5/content/", '
+        '"status_code": 500, "duration_seconds": 1.5}',
+        '2025-11-21 10:00:10,101 | INFO | RESPONSE: {"method": "GET", "path": "/api/auth/files/7/content/", '
+        '"status_code": 404, "duration_seconds": 0.002}',
+    ]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.log_path = os.path.join(self.tmp.name, 'requests.log')
+        with open(self.log_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.LOG_LINES) + '\n')
+
+    def run_report(self, *args):
+        output = os.path.join(self.tmp.name, 'report.json')
+        call_command('analyze_logs', self.log_path, '--format', 'json', '--output', output, *args)
+        with open(output, encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_per_path_stats(self):
+        """Агрегаты по нормализованным путям и самые медленные запросы"""
+        report = self.run_report()
+        paths = {row['path']: row for row in report['paths']}
+        files = paths['/api/auth/files/']
+        self.assertEqual(files['requests'], 2)
+        self.assertEqual(files['p50'], 0.01)
+        self.assertEqual(files['p99'], 0.03)
+        content = paths['/api/auth/files/<id>/content/']
+        self.assertEqual(content['error_rate'], 1.0)
+        self.assertEqual(content['server_errors'], 1)
+        self.assertEqual(report['slowest'][0]['path'], '/api/auth/files/5/content/')
+        self.assertEqual(report['window']['seconds'], 10.0)
+
+    def test_time_window(self):
+        """Записи вне окна не учитываются"""
+        report = self.run_report('--since', '2025-11-21 10:00:01', '--until', '2025-11-21 10:00:05')
+        self.assertEqual(sum(row['requests'] for row in report['paths']), 2)
+
+    def test_time_window_timezones(self):
+        """Окно без зоны, с явной зоной и относительное сравнивается с метками логов без TypeError"""
+        report = self.run_report('--since', '2025-11-21')
+        self.assertEqual(sum(row['requests'] for row in report['paths']), 4)
+        report = self.run_report('--since', '2025-11-21T13:00:01+03:00', '--until', '2025-11-21T10:00:05+00:00')
+        self.assertEqual(sum(row['requests'] for row in report['paths']), 2)
+        report = self.run_report('--since', '1d')
+        self.assertEqual(report['paths'], [])
+
+    def test_top_zero(self):
+        """--top 0 отключает список самых медленных запросов, в т.ч. при слиянии отчетов"""
+        report = self.run_report('--top', '0')
+        self.assertEqual(report['slowest'], [])
+        self.assertEqual(len(report['paths']), 2)
+        merged = LogReport(top_slowest=0).merge(analyze_file(self.log_path))
+        self.assertEqual(merged.slowest, [])
+
+
+class RequestContextLoggingTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def response_records(self, logs):
+        return [json.loads(line.split('RESPONSE: ', 1)[1]) for line in logs.output if 'RESPONSE: ' in line]
+
+    def test_registration_single_record(self):
+        """Регистрация пишет одну итоговую запись с бизнес-событиями"""
+        with self.assertLogs('api', level='INFO') as logs:
+            response = self.client.post('/api/auth/register/', {
+                'username': 'newuser', 'email': 'new@example.com',
+                'password': 'StrongPass123!', 'password2': 'StrongPass123!',
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(logs.output), 1)
+        record = self.response_records(logs)[0]
+        self.assertEqual(record['view'], 'register_view')
+        self.assertEqual(record['client_ip'], '127.0.0.1')
+        self.assertEqual(record['request_body']['password'], '***HIDDEN***')
+        self.assertEqual(record['events'][0]['action'], 'registration_success')
+
+    def test_tokens_in_request_body_masked(self):
+        """refresh-токен из тела запроса не попадает в лог"""
+        user = CustomUser.objects.create_user(username='user', password='StrongPass123!')
+        refresh = str(RefreshToken.for_user(user))
+        with self.assertLogs('api', level='INFO') as logs:
+            response = self.client.post('/api/auth/token/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(refresh, '\n'.join(logs.output))
+        self.assertEqual(self.response_records(logs)[0]['request_body']['refresh'], '***HIDDEN***')
+
+    def test_failed_login_is_warning(self):
+        """Security-событие повышает уровень итоговой записи"""
+        with self.assertLogs('api', level='INFO') as logs:
+            response = self.client.post('/api/auth/login/', {'username': 'nobody', 'password': 'x'}, format='json')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].levelname, 'WARNING')
+        record = self.response_records(logs)[0]
+        self.assertEqual(record['events'][0]['security_event'], 'login_failed')
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        # Снимки пользователей кешируются только в общем для процессов кеше
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        shared_cache = override_settings(CACHES={
+            **settings.CACHES,
+            'users': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tmp.name},
+        }, JWT_USER_CACHE_ALIAS='users')
+        shared_cache.enable()
+        self.addCleanup(shared_cache.disable)
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(username='user', password='StrongPass123!')
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_user_query_is_cached(self):
+        """Повторный запрос не загружает пользователя из БД; тяжелые колонки не читаются"""
+        with CaptureQueriesContext(connection) as first:
+            self.client.get('/api/auth/weather/')
+        user_queries = [q['sql'] for q in first if 'users_customuser' in q['sql']]
+        self.assertEqual(len(user_queries), 1)
+        self.assertNotIn('encrypted_media', user_queries[0])
+
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get('/api/auth/weather/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in second if 'users_customuser' in q['sql']])
+
+    def test_deactivation_invalidates_cache(self):
+        """Деактивация пользователя сбрасывает снимок в кеше"""
+        self.assertEqual(self.client.get('/api/auth/weather/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/weather/').status_code, 401)
+
+    def test_process_local_cache_not_used(self):
+        """С LocMemCache снимок не кешируется: сброс в одном воркере не виден другим"""
+        with self.settings(JWT_USER_CACHE_ALIAS='default'):
+            for _ in range(2):
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(self.client.get('/api/auth/weather/').status_code, 200)
+                self.assertEqual(len([q for q in queries if 'users_customuser' in q['sql']]), 1)
+
+
+class BlindIndexTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def register(self, username, email):
+        return self.client.post('/api/auth/register/', {
+            'username': username, 'email': email, 'first_name': 'Иван',
+            'password': 'StrongPass123!', 'password2': 'StrongPass123!',
+        }, format='json')
+
+    def test_lookup_and_uniqueness(self):
+        """Поиск по email без дешифрования и запрет дубликатов при регистрации"""
+        self.assertEqual(self.register('first', 'User@Example.com').status_code, 201)
+        user = CustomUser.find_by_email(' user@example.com ')
+        self.assertEqual(user.username, 'first')
+        self.assertNotIn('example.com', user.email_bidx)
+
+        response = self.register('second', 'user@example.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.data)
+
+    def test_backfill_command(self):
+        """Команда заполняет индексы для старых пользователей"""
+        user = CustomUser.objects.create_user(username='legacy', password='StrongPass123!')
+        user.save_encrypted_data({'email': 'legacy@example.com', 'first_name': 'Old', 'last_name': 'User'})
+        CustomUser.objects.filter(pk=user.pk).update(
+            encrypted_data=user.encrypted_data, email_bidx=None, first_name_bidx=None, last_name_bidx=None
+        )
+
+        call_command('backfill_blind_index', stdout=io.StringIO())
+        self.assertEqual(CustomUser.find_by_email('legacy@example.com').pk, user.pk)
+        self.assertTrue(CustomUser.objects.filter(last_name_bidx__isnull=False, pk=user.pk).exists())
+
+
+class RegistrationAndImportTest(TestCase):
+    def test_registration_single_insert(self):
+        """Регистрация выполняет ровно один INSERT пользователя и ни одного UPDATE"""
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().post('/api/auth/register/', {
+                'username': 'newuser', 'email': 'new@example.com', 'last_name': 'Петров',
+                'password': 'StrongPass123!', 'password2': 'StrongPass123!',
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        user_writes = [q['sql'] for q in queries
+                       if q['sql'].startswith(('INSERT', 'UPDATE')) and 'users_customuser' in q['sql']]
+        self.assertEqual(len(user_writes), 1)
+        self.assertTrue(user_writes[0].startswith('INSERT'))
+
+        user = CustomUser.objects.get(username='newuser')
+        self.assertTrue(user.check_password('StrongPass123!'))
+        self.assertEqual(user.get_decrypted_data()['last_name'], 'Петров')
+        self.assertEqual(user.email, 'encrypted_newuser@placeholder.com')
+
+    def test_registration_race_on_email(self):
+        """Email, занятый между проверкой и INSERT, дает 400, а не IntegrityError"""
+        client = APIClient()
+        data = {'username': 'first', 'email': 'race@example.com',
+                'password': 'StrongPass123!', 'password2': 'StrongPass123!'}
+        self.assertEqual(client.post('/api/auth/register/', data, format='json').status_code, 201)
+        # Проверка validate_email прошла до INSERT параллельного запроса
+        with mock.patch.object(UserRegistrationSerializer, 'validate_email', lambda self, value: value):
+            response = client.post('/api/auth/register/', {**data, 'username': 'second'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'email': ['Пользователь с таким email уже существует.']})
+        self.assertFalse(CustomUser.objects.filter(username='second').exists())
+
+    def test_import_users(self):
+        """Импорт CSV: пароли хешируются, профиль шифруется, дубликаты пропускаются"""
+        CustomUser.objects.create_user(username='existing', password='StrongPass123!')
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as f:
+            f.write('username,email,password,first_name,last_name\n')
+            f.write('alice,alice@example.com,AlicePass123!,Alice,A\n')
+            f.write('bob,bob@example.com,BobPass123!,Bob,B\n')
+            f.write('existing,other@example.com,Pass123!,,\n')
+            f.write('carol,ALICE@example.com,CarolPass123!,,\n')
+        self.addCleanup(os.remove, f.name)
+
+        out = io.StringIO()
+        call_command('import_users', f.name, '--workers', '2', '--chunk-size', '2', stdout=out, stderr=io.StringIO())
+        self.assertIn('Импортировано: 2, пропущено: 2', out.getvalue())
+
+        alice = CustomUser.find_by_email('alice@example.com')
+        self.assertEqual(alice.username, 'alice')
+        self.assertTrue(alice.check_password('AlicePass123!'))
+        self.assertEqual(alice.get_decrypted_data()['first_name'], 'Alice')
+        self.assertFalse(CustomUser.objects.filter(username='carol').exists())
+
+
+class AdminChangelistTest(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(username='admin', password='StrongPass123!')
+        for i in range(5):
+            user = CustomUser(username=f'user{i}')
+            user.save_encrypted_data({'email': f'user{i}@example.com', 'first_name': f'Name{i}', 'last_name': ''})
+            user.save()
+            UserMedia.objects.create(user=user, encrypted_media=b'm' * 100000)
+            UserFile.objects.create(user=user, original_name=f'{i}.png', file_size=3, content_type='image/png',
+                                    encrypted_data=b'x' * 50000)
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_user_changelist_decrypts_page_without_blobs(self):
+        """Список пользователей показывает дешифрованный email и не читает медиа"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/users/customuser/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'user3@example.com')
+        list_queries = [q['sql'] for q in queries if 'FROM "users_customuser"' in q['sql'] and 'ORDER BY' in q['sql']]
+        self.assertTrue(list_queries)
+        # Размер блоба считается в СУБД (LENGTH), сами байты не выбираются
+        self.assertFalse([sql for sql in list_queries
+                          if '"users_customuser"."encrypted_data"' in re.sub(r'LENGTH\([^)]*\)', '', sql)])
+        self.assertFalse([q for q in queries if 'users_usermedia' in q['sql']])
+
+    def test_change_form_shows_sizes(self):
+        """Форма пользователя показывает размер блоба, а не его содержимое"""
+        user = CustomUser.objects.get(username='user1')
+        response = self.client.get(f'/admin/users/customuser/{user.pk}/change/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '100000 байт')
+        self.assertContains(response, 'user1@example.com')
+
+    def test_file_changelist_without_blobs(self):
+        """Список файлов не загружает зашифрованное содержимое"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/users/userfile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries
+                          if '"users_userfile"."encrypted_data"' in re.sub(r'LENGTH\([^)]*\)', '', q['sql'])])
+
+
+class ConditionalRequestTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(username='user', password='StrongPass123!')
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_profile_not_modified(self):
+        """Совпадающий If-None-Match дает 304 без дешифрования профиля"""
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('private', response['Cache-Control'])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/auth/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in queries if 'encrypted_data' in q['sql']])
+
+        self.user.save_encrypted_data({'email': 'new@example.com', 'first_name': '', 'last_name': ''})
+        self.user.save()
+        response = self.client.get('/api/auth/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_files_etag_changes_on_upload(self):
+        """Загрузка и удаление файла меняют ETag списка файлов"""
+        etag = self.client.get('/api/auth/files/')['ETag']
+        self.assertEqual(self.client.get('/api/auth/files/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        upload = SimpleUploadedFile('a.png', b'\x89PNG' + b'0' * 16, content_type='image/png')
+        self.assertEqual(self.client.post('/api/auth/upload/', {'file': upload}, format='multipart').status_code, 201)
+        response = self.client.get('/api/auth/files/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+
+        etag = response['ETag']
+        UserFile.objects.filter(user=self.user).get().delete()
+        self.assertEqual(self.client.get('/api/auth/files/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class BreachedPasswordFilterTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.source = os.path.join(self.tmp.name, 'breached.txt')
+        self.output = os.path.join(self.tmp.name, 'breached.bloom')
+        with open(self.source, 'w', encoding='utf-8') as f:
+            f.write('Summer2023!\nP@ssw0rd!\n' + '\n'.join(f'Leaked{i}!' for i in range(1000)))
+
+    def test_build_and_validate(self):
+        """Пароль из утечки отклоняется, пароль вне утечки проходит"""
+        call_command('build_password_filter', self.source, output=self.output, fp_rate=0.0001, stdout=io.StringIO())
+        validator = PasswordStrengthValidator(breached_filter_path=self.output)
+        with self.assertRaisesMessage(ValidationError, 'утечках'):
+            validator.validate('Summer2023!')
+        validator.validate('Xk7#mRq2vLp9')
+
+    def test_corpus_encoding(self):
+        """Строки не в заданной кодировке пропускаются и считаются, а не портятся заменой байт"""
+        source = os.path.join(self.tmp.name, 'latin1.txt.gz')
+        with gzip.open(source, 'wb') as f:
+            f.write('Summer2023!\nCafé2023!\n'.encode('latin-1'))
+        stderr = io.StringIO()
+        call_command('build_password_filter', source, output=self.output, stdout=io.StringIO(), stderr=stderr)
+        self.assertIn('пропущено строк не в кодировке utf-8: 1', stderr.getvalue())
+        validator = PasswordStrengthValidator(breached_filter_path=self.output)
+        with self.assertRaisesMessage(ValidationError, 'утечках'):
+            validator.validate('Summer2023!')
+        validator.validate('Café2023!')
+
+        call_command('build_password_filter', source, output=self.output, encoding='latin-1',
+                     stdout=io.StringIO(), stderr=io.StringIO())
+        with self.assertRaisesMessage(ValidationError, 'утечках'):
+            PasswordStrengthValidator(breached_filter_path=self.output).validate('Café2023!')
+
+    def test_missing_filter_is_skipped(self):
+        """Без собранного фильтра проверка утечек не выполняется"""
+        PasswordStrengthValidator(breached_filter_path=self.output).validate('Summer2023!')
+
+
+class TokenBlacklistTest(TestCase):
+    def setUp(self):
+        revocation_filter.reset()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(username='user', password='StrongPass123!')
+        self.refresh = str(RefreshToken.for_user(self.user))
+
+    def test_rotated_token_is_revoked(self):
+        """После ротации старый refresh-токен больше не принимается"""
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['refresh'], self.refresh)
+        self.assertEqual(RevokedToken.objects.count(), 1)
+
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_unrevoked_token_skips_lookup(self):
+        """Неотозванный токен проверяется фильтром в памяти, без запроса к RevokedToken"""
+        revocation_filter.sync(force=True)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/auth/token/refresh/', {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if 'SELECT' in q['sql'] and 'users_revokedtoken' in q['sql']])
+
+    def test_prune_expired(self):
+        """Команда удаляет только истекшие записи"""
+        now = timezone.now()
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti=f'old{i}', expires_at=now - timedelta(days=1)) for i in range(5)]
+            + [RevokedToken(jti='fresh', expires_at=now + timedelta(days=1))]
+        )
+        out = io.StringIO()
+        call_command('prune_token_blacklist', batch_size=2, stdout=out)
+        self.assertIn('5', out.getvalue())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['fresh'])
+
+
+class UserMediaTest(TestCase):
+    def test_login_does_not_load_media(self):
+        """Вход читает только строку пользователя; медиа лежат в отдельной таблице"""
+        user = CustomUser.objects.create_user(username='user', password='StrongPass123!')
+        user.get_media().encrypted_media = b'm' * 100000
+        user.media.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().post('/api/auth/login/', {'username': 'user', 'password': 'StrongPass123!'},
+                                        format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if 'users_usermedia' in q['sql']])
+        self.assertEqual(len(CustomUser.objects.get(pk=user.pk).get_media().encrypted_media), 100000)
+
+
+class StorageUsageTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(username='user', password='StrongPass123!')
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def upload(self, name, size, content_type='image/png'):
+        upload = SimpleUploadedFile(name, b'0' * size, content_type=content_type)
+        return self.client.post('/api/auth/upload/', {'file': upload}, format='multipart')
+
+    def test_stats_follow_uploads_and_deletes(self):
+        """Агрегаты меняются при загрузке и удалении и совпадают с пересчетом"""
+        self.upload('a.png', 100)
+        self.upload('b.png', 200)
+        self.upload('c.wav', 50, 'audio/wav')
+        storage = self.client.get('/api/auth/profile/').json()['storage']
+        self.assertEqual(storage['file_count'], 3)
+        self.assertEqual(storage['plaintext_bytes'], 350)
+        self.assertEqual(storage['bytes_by_type'], {'image/png': 300, 'audio/wav': 50})
+        self.assertEqual(storage['ciphertext_bytes'],
+                         sum(len(f.encrypted_data) for f in UserFile.objects.filter(user=self.user)))
+
+        UserFile.objects.get(original_name='b.png').delete()
+        expected = UserStorageUsage.summary(self.user.pk)
+        self.assertEqual(expected['plaintext_bytes'], 150)
+        call_command('recompute_storage_usage', stdout=io.StringIO())
+        self.assertEqual(UserStorageUsage.summary(self.user.pk), expected)
+
+    @override_settings(USER_STORAGE_QUOTA_BYTES=250)
+    def test_quota(self):
+        """Загрузка сверх квоты отклоняется"""
+        self.assertEqual(self.upload('a.png', 200).status_code, 201)
+        self.assertEqual(self.upload('b.png', 100).status_code, 413)
+        self.assertEqual(UserFile.objects.filter(user=self.user).count(), 1)
+
+    def test_user_delete_cascades(self):
+        """Удаление пользователя удаляет файлы и агрегаты без ошибок"""
+        self.upload('a.png', 100)
+        self.user.delete()
+        self.assertFalse(UserStorageUsage.objects.exists())
+
+
+class SQLiteProfileTest(TestCase):
+    def test_pragmas_applied(self):
+        """Прагмы профиля tuned применяются при открытии соединения"""
+        if connection.vendor != 'sqlite' or not connection.settings_dict['OPTIONS'].get('init_command'):
+            self.skipTest('Профиль tuned не используется')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+
+
+class StartupTest(TestCase):
+    def test_setup_skips_heavy_imports(self):
+        """django.setup() не импортирует cryptography/requests/bs4 и не выводит ключ шифрования"""
+        out = io.StringIO()
+        call_command('import_report', format='json', top=1000, stdout=out)
+        report = json.loads(out.getvalue())
+        modules = {module['module'].split('.')[0] for module in report['top']}
+        self.assertFalse(modules & {'cryptography', 'requests', 'bs4', 'apscheduler'})
+        self.assertNotIn('encryptor.warm_up', report['phases'])
+
+
+class QueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(username='user', password='StrongPass123!')
+        for i in range(20):
+            UserFile.objects.create(user=self.user, original_name=f'{i}.png', file_size=3,
+                                    content_type='image/png', encrypted_data=b'x' * 100000)
+            WeatherData.objects.create(temperature='+5', description='Облачно', source_url='https://example.com')
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_endpoints_within_budget(self):
+        """Основные эндпоинты укладываются в бюджеты QUERY_BUDGETS"""
+        with self.assertQueryBudget('users:files'):
+            self.assertEqual(self.client.get('/api/auth/files/').status_code, 200)
+        with self.assertQueryBudget('users:profile'):
+            self.assertEqual(self.client.get('/api/auth/profile/').status_code, 200)
+        with self.assertQueryBudget('users:weather'):
+            self.assertEqual(self.client.get('/api/auth/weather/').status_code, 200)
+        with self.assertQueryBudget('users:login'):
+            self.client.post('/api/auth/login/', {'username': 'user', 'password': 'StrongPass123!'}, format='json')
+        with self.assertQueryBudget('users:register'):
+            response = APIClient().post('/api/auth/register/', {
+                'username': 'newuser', 'email': 'new@example.com', 'password': 'StrongPass123!',
+                'password2': 'StrongPass123!',
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_blob_load_is_reported(self):
+        """Загрузка блобов превышает бюджет по байтам, отчет указывает на запрос"""
+        with record_queries() as recorder:
+            list(UserFile.objects.filter(user=self.user))
+        self.assertGreater(recorder.bytes, 20 * 100000)
+        with self.assertRaises(AssertionError) as error:
+            with self.assertQueryBudget('users:files'):
+                list(UserFile.objects.filter(user=self.user))
+        self.assertIn('"users_userfile"."encrypted_data"', str(error.exception))
+
+    @override_settings(QUERY_BUDGET_MODE='raise', QUERY_BUDGETS={'users:files': {'queries': 1}})
+    def test_middleware_raise_mode(self):
+        """В режиме raise middleware превращает превышение бюджета в ошибку"""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/api/auth/files/')
+
+
+class ORJSONRendererTest(TestCase):
+    def test_matches_stock_renderer(self):
+        """Результат совпадает со стандартным JSONRenderer (datetime в UTC с Z, Decimal, кириллица)"""
+        data = {'uploaded_at': timezone.now(), 'price': Decimal('1.50'), 'name': 'Фото.png', 'items': [1, None]}
+        fast = ORJSONRenderer().render(data)
+        self.assertEqual(json.loads(fast), json.loads(JSONRenderer().render(data)))
+        self.assertTrue(json.loads(fast)['uploaded_at'].endswith('Z'))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_indent_falls_back_to_stock(self):
+        """Запрос с indent обрабатывает стандартный рендерер"""
+        body = ORJSONRenderer().render({'a': 1}, 'application/json; indent=4')
+        self.assertEqual(body, JSONRenderer().render({'a': 1}, 'application/json; indent=4'))
+
+    def test_parser(self):
+        """Парсер читает UTF-8 и отвечает 400 на некорректный JSON"""
+        body = json.dumps({'username': 'Иван'}, ensure_ascii=False).encode()
+        self.assertEqual(ORJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+        response = APIClient().post('/api/auth/login/', b'{"username": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CompressionMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(username='user', password='StrongPass123!')
+        for i in range(20):
+            WeatherData.objects.create(temperature='+5', description='Облачно, небольшой снег',
+                                       source_url='https://www.gismeteo.ru/')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_negotiate(self):
+        """Выбор кодировки по q клиента и порядку предпочтения сервера"""
+        self.assertEqual(compression.negotiate('gzip, br;q=0.5', ['zstd', 'br', 'gzip']), 'gzip')
+        self.assertEqual(compression.negotiate('gzip, br', ['br', 'gzip']), 'br')
+        self.assertEqual(compression.negotiate('*;q=0.1, gzip;q=0', ['gzip']), None)
+        self.assertEqual(compression.negotiate('identity', ['gzip']), None)
+
+    def test_json_response_compressed_and_cached(self):
+        """JSON сжимается gzip, повторный ответ берется из кеша сжатых вариантов"""
+        plain = self.client.get('/api/auth/weather/')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get('/api/auth/weather/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), json.loads(plain.content))
+
+        with self.settings(RESPONSE_COMPRESSION_ENCODINGS=['gzip']):
+            original = compression.CODECS['gzip']
+            compression.CODECS['gzip'] = lambda data: self.fail('Ответ сжат повторно')
+            try:
+                again = self.client.get('/api/auth/weather/', HTTP_ACCEPT_ENCODING='gzip')
+            finally:
+                compression.CODECS['gzip'] = original
+        self.assertEqual(again.content, response.content)
+
+    def test_media_and_small_responses_not_compressed(self):
+        """Картинки из download_file_view и маленькие ответы отдаются как есть"""
+        user_file = UserFile(user=self.user, original_name='a.png', file_size=4100, content_type='image/png')
+        user_file._file_data = b'\x89PNG' + b'0' * 4096
+        user_file.save()
+        response = self.client.get(f'/api/auth/files/{user_file.id}/content/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+
+        response = self.client.get('/api/auth/files/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+
+    @override_settings(RESPONSE_COMPRESSION_MIN_BYTES=0)
+    def test_token_responses_not_compressed(self):
+        """Ответы с токенами не сжимаются (BREACH)"""
+        client = APIClient()
+        login = client.post('/api/auth/login/', {'username': 'user', 'password': 'StrongPass123!'},
+                            format='json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(login.status_code, 200)
+        self.assertNotIn('Content-Encoding', login)
+        refresh = client.post('/api/auth/token/refresh/', {'refresh': login.json()['tokens']['refresh']},
+                              format='json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(refresh.status_code, 200)
+        self.assertNotIn('Content-Encoding', refresh)
+        weather = self.client.get('/api/auth/weather/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(weather['Content-Encoding'], 'gzip')
+
+
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        self.calls = []
+        task_queue.task('tests.record')(lambda value: self.calls.append(value))
+
+        def flaky(value):
+            raise RuntimeError('сбой')
+        task_queue.task('tests.flaky')(flaky)
+
+    def tearDown(self):
+        task_queue.REGISTRY.pop('tests.record', None)
+        task_queue.REGISTRY.pop('tests.flaky', None)
+
+    def test_run_pending(self):
+        """Задача выполняется один раз и помечается выполненной"""
+        created = task_queue.enqueue('tests.record', value=42)
+        self.assertEqual(task_queue.run_pending('w1'), 1)
+        self.assertEqual(self.calls, [42])
+        created.refresh_from_db()
+        self.assertEqual((created.status, created.attempts), (Task.DONE, 1))
+        self.assertEqual(task_queue.run_pending('w1'), 0)
+
+    def test_claim_is_exclusive_until_visibility_timeout(self):
+        """Взятая задача не видна другим воркерам, пока не истечет таймаут видимости"""
+        created = task_queue.enqueue('tests.record', value=1)
+        self.assertEqual([t.pk for t in task_queue.claim('w1')], [created.pk])
+        self.assertEqual(task_queue.claim('w2'), [])
+        later = timezone.now() + timedelta(seconds=settings.TASK_QUEUE_VISIBILITY_TIMEOUT + 1)
+        reclaimed = task_queue.claim('w2', now=later)
+        self.assertEqual([(t.pk, t.locked_by, t.attempts) for t in reclaimed], [(created.pk, 'w2', 2)])
+
+    def test_retry_with_backoff_then_failed(self):
+        """Ошибка откладывает повтор с задержкой; после max_attempts задача помечается ошибкой"""
+        created = task_queue.enqueue('tests.flaky', max_attempts=2, value=1)
+        task_queue.run_pending('w1')
+        created.refresh_from_db()
+        self.assertEqual(created.status, Task.PENDING)
+        self.assertGreater(created.run_after, timezone.now())
+        self.assertIn('RuntimeError', created.last_error)
+        self.assertEqual(task_queue.run_pending('w1'), 0)
+
+        Task.objects.filter(pk=created.pk).update(run_after=timezone.now())
+        task_queue.run_pending('w1')
+        created.refresh_from_db()
+        self.assertEqual((created.status, created.attempts), (Task.FAILED, 2))
+
+    def test_enqueue_rolled_back_with_transaction(self):
+        """Задача, поставленная в откаченной транзакции, не выполняется"""
+        try:
+            with transaction.atomic():
+                task_queue.enqueue('tests.record', value=1)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(Task.objects.exists())
+
+
+def make_image(width=1200, height=800, image_format='PNG'):
+    from PIL import Image
+
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(output, format=image_format)
+    return output.getvalue()
+
+
+class ThumbnailTest(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(username='user', password='StrongPass123!')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def upload(self, data, name='a.png', content_type='image/png'):
+        upload = SimpleUploadedFile(name, data, content_type=content_type)
+        response = self.client.post('/api/auth/upload/', {'file': upload}, format='multipart')
+        return response.json()['file_info']['id']
+
+    def test_thumbnail_built_by_worker(self):
+        """Загрузка ставит задачу; воркер сохраняет зашифрованную миниатюру"""
+        file_id = self.upload(make_image())
+        self.assertTrue(Task.objects.filter(name='files.generate_thumbnail', payload={'file_id': file_id}).exists())
+        self.assertFalse(UserFilePreview.objects.exists())
+
+        task_queue.run_pending()
+        preview = UserFilePreview.objects.get(file_id=file_id)
+        self.assertEqual((preview.width, preview.height), (256, 171))
+        self.assertNotIn(b'WEBP', bytes(preview.encrypted_thumbnail))
+
+        with self.assertQueryBudget('users:file_thumbnail'):
+            response = self.client.get(f'/api/auth/files/{file_id}/thumbnail/')
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response.content, preview.get_decrypted_thumbnail())
+        self.assertIn('private', response['Cache-Control'])
+
+        cached = self.client.get(f'/api/auth/files/{file_id}/thumbnail/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_on_demand_and_errors(self):
+        """Пока воркер не построил миниатюру — 202 без генерации в запросе; чужие файлы и не-изображения — 404"""
+        file_id = self.upload(make_image(300, 600, 'JPEG'), 'a.jpg', 'image/jpeg')
+        Task.objects.all().delete()
+        response = self.client.get(f'/api/auth/files/{file_id}/thumbnail/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '2')
+        self.assertFalse(UserFilePreview.objects.exists())
+        # Потерянная задача ставится заново, но не дублируется
+        self.client.get(f'/api/auth/files/{file_id}/thumbnail/')
+        self.assertEqual(Task.objects.filter(name='files.generate_thumbnail').count(), 1)
+
+        task_queue.run_pending()
+        self.assertEqual(self.client.get(f'/api/auth/files/{file_id}/thumbnail/').status_code, 200)
+
+        # Задача выполнена, а миниатюры нет (нечитаемое изображение) — 404 без повторной постановки
+        broken_id = self.upload(b'\x89PNG', 'b.png', 'image/png')
+        task_queue.run_pending()
+        self.assertEqual(self.client.get(f'/api/auth/files/{broken_id}/thumbnail/').status_code, 404)
+        self.assertFalse(Task.objects.filter(status=Task.PENDING).exists())
+
+        audio_id = self.upload(b'0' * 100, 'a.wav', 'audio/wav')
+        self.assertEqual(self.client.get(f'/api/auth/files/{audio_id}/thumbnail/').status_code, 404)
+
+        other = CustomUser.objects.create_user(username='other', password='StrongPass123!')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(other).access_token}')
+        self.assertEqual(self.client.get(f'/api/auth/files/{file_id}/thumbnail/').status_code, 404)
+
+    def test_source_size_cap(self):
+        """Файлы больше THUMBNAIL_MAX_SOURCE_BYTES не расшифровываются: миниатюры нет, 404"""
+        data = make_image()
+        file_id = self.upload(data)
+        with self.settings(THUMBNAIL_MAX_SOURCE_BYTES=len(data) - 1):
+            task_queue.run_pending()
+            self.assertFalse(UserFilePreview.objects.exists())
+            self.assertEqual(self.client.get(f'/api/auth/files/{file_id}/thumbnail/').status_code, 404)
+
+    def test_backfill_command(self):
+        """Команда создает миниатюры для старых файлов и пропускает нечитаемые"""
+        broken = UserFile(user=self.user, original_name='a.png', file_size=4, content_type='image/png')
+        broken._file_data = b'\x89PNG'
+        broken.save()
+        good = UserFile(user=self.user, original_name='b.png', file_size=1, content_type='image/png')
+        good._file_data = make_image(64, 64)
+        good.save()
+        out, err = io.StringIO(), io.StringIO()
+        call_command('backfill_thumbnails', stdout=out, stderr=err)
+        self.assertIn('Создано миниатюр: 1, пропущено: 1', out.getvalue())
+        self.assertEqual(list(UserFilePreview.objects.values_list('file_id', flat=True)), [good.pk])
+
+
+def make_wav(seconds=1.5, rate=8000, channels=2, width=2, amplitude=0.5):
+    import wave
+
+    import numpy
+
+    t = numpy.arange(int(seconds * rate)) / rate
+    # Громкость нарастает линейно: пики волны должны расти к концу файла
+    signal = numpy.sin(2 * numpy.pi * 440 * t) * numpy.linspace(0, amplitude, len(t))
+    values = (signal * (2 ** (8 * width - 1) - 1)).astype('<i4')
+    if width == 1:
+        values = (values + 128).astype(numpy.uint8)  # 8-битный WAV беззнаковый
+    elif width == 3:
+        values = values.view(numpy.uint8).reshape(-1, 4)[:, :3]
+    else:
+        values = values.astype(f'<i{width}')
+    frames = numpy.repeat(values[:, None], channels, axis=1)
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(width)
+        writer.setframerate(rate)
+        writer.writeframes(frames.tobytes())
+    return output.getvalue()
+
+
+class AudioMetadataTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(username='user', password='StrongPass123!')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_peaks_and_duration_in_file_list(self):
+        """Воркер считает длительность и пики; список файлов отдает их без загрузки блоба"""
+        upload = SimpleUploadedFile('a.wav', make_wav(), content_type='audio/wav')
+        self.client.post('/api/auth/upload/', {'file': upload}, format='multipart')
+        self.assertEqual(self.client.get('/api/auth/files/').json()[0]['metadata'], {})
+
+        etag = self.client.get('/api/auth/files/')['ETag']
+        task_queue.run_pending()
+        response = self.client.get('/api/auth/files/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        result = response.json()[0]['metadata']['audio']
+        self.assertEqual(result['duration'], 1.5)
+        self.assertEqual(result['sample_rate'], 8000)
+        self.assertEqual(len(result['peaks']), settings.AUDIO_PEAKS_POINTS)
+        self.assertLess(result['peaks'][0], 5)
+        self.assertAlmostEqual(result['peaks'][-1], 127, delta=3)
+        self.assertLess(result['peaks'][50], result['peaks'][150])
+
+    def test_sample_widths_and_unreadable_audio(self):
+        """8/16/24/32-битный PCM дает одинаковые пики; нераспознанный файл — None"""
+        expected = audio.analyze_audio(make_wav(width=2), 'audio/wav', points=20)
+        for width in (1, 3, 4):
+            result = audio.analyze_audio(make_wav(width=width), 'audio/wav', points=20)
+            self.assertEqual(result['duration'], expected['duration'])
+            for a, b in zip(result['peaks'], expected['peaks']):
+                self.assertAlmostEqual(a, b, delta=2)
+        self.assertIsNone(audio.analyze_audio(b'0' * 1000, 'audio/mpeg'))
+        self.assertEqual(audio.compute_peaks(audio.numpy.zeros((3, 1)), 10), [0, 0, 0])
+
+    def test_missing_mp3_decoder_is_logged(self):
+        """Без miniaudio MP3 не анализируется, и это видно в логе"""
+        with mock.patch.object(audio, 'miniaudio', None), self.assertLogs('api', level='WARNING') as logs:
+            self.assertIsNone(audio.analyze_audio(b'ID3' + b'0' * 100, 'audio/mpeg'))
+        self.assertIn('miniaudio', logs.output[0])
+
+    def test_analysis_skipped_above_size_cap(self):
+        """Файлы больше AUDIO_ANALYSIS_MAX_BYTES не расшифровываются и не декодируются"""
+        data = make_wav()
+        upload = SimpleUploadedFile('a.wav', data, content_type='audio/wav')
+        self.client.post('/api/auth/upload/', {'file': upload}, format='multipart')
+        with self.settings(AUDIO_ANALYSIS_MAX_BYTES=len(data) - 1):
+            task_queue.run_pending()
+        self.assertEqual(UserFile.objects.get().metadata, {})
+        self.assertTrue(Task.objects.filter(name='files.analyze_audio', status=Task.DONE).exists())
+
+
+@override_settings(CHUNKED_UPLOAD_CHUNK_SIZE=1000)
+class ChunkedUploadTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(username='user', password='StrongPass123!')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.data = os.urandom(3500)
+
+    def create_session(self, size=None):
+        response = self.client.post('/api/auth/uploads/', {
+            'name': 'long.wav', 'size': size or len(self.data), 'content_type': 'audio/wav',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def put_chunk(self, session, offset, data):
+        return self.client.put(f"/api/auth/uploads/{session['id']}/chunks/{offset}/", data,
+                               content_type='application/octet-stream')
+
+    def test_out_of_order_resume_and_finalize(self):
+        """Части в любом порядке, повтор после обрыва, состояние и сборка файла"""
+        session = self.create_session()
+        self.assertEqual((session['chunk_size'], session['chunk_count']), (1000, 4))
+        for offset in (3000, 0, 2000):
+            self.assertEqual(self.put_chunk(session, offset, self.data[offset:offset + 1000]).status_code, 200)
+        self.assertEqual(self.put_chunk(session, 2000, self.data[2000:3000]).status_code, 200)
+
+        status = self.client.get(f"/api/auth/uploads/{session['id']}/").json()
+        self.assertEqual((status['received'], status['missing']), ([0, 2, 3], [1]))
+        response = self.client.post(f"/api/auth/uploads/{session['id']}/complete/")
+        self.assertEqual((response.status_code, response.json()['missing']), (409, [1]))
+
+        self.put_chunk(session, 1000, self.data[1000:2000])
+        response = self.client.post(f"/api/auth/uploads/{session['id']}/complete/")
+        self.assertEqual(response.status_code, 201)
+        user_file = UserFile.objects.get(pk=response.json()['file_info']['id'])
+        self.assertEqual((user_file.segment_count, user_file.file_size), (4, 3500))
+        self.assertEqual(user_file.get_decrypted_data(), self.data)
+        self.assertNotIn(self.data[:100], b''.join(bytes(s) for s in user_file.segments.values_list(
+            'encrypted_data', flat=True)))
+        self.assertFalse(UploadSession.objects.exists())
+        response = self.client.get(f'/api/auth/files/{user_file.pk}/content/')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Length'], '3500')
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+
+        storage = UserStorageUsage.summary(self.user.pk)
+        self.assertEqual(storage['plaintext_bytes'], 3500)
+        self.assertEqual(storage['ciphertext_bytes'], user_file.encrypted_size)
+        self.assertGreater(user_file.encrypted_size, 3500)
+
+    def test_invalid_chunks_and_limits(self):
+        """Смещение не по границе части, неверный размер, чужая сессия, квота"""
+        session = self.create_session()
+        self.assertEqual(self.put_chunk(session, 500, b'x' * 1000).status_code, 400)
+        self.assertEqual(self.put_chunk(session, 0, b'x' * 999).status_code, 400)
+        self.assertEqual(self.put_chunk(session, 3000, b'x' * 1000).status_code, 400)
+        self.assertEqual(self.put_chunk(session, 4000, b'x' * 500).status_code, 400)
+
+        other = APIClient()
+        other_user = CustomUser.objects.create_user(username='other', password='StrongPass123!')
+        other.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(other_user).access_token}')
+        self.assertEqual(other.get(f"/api/auth/uploads/{session['id']}/").status_code, 404)
+
+        with self.settings(USER_STORAGE_QUOTA_BYTES=1000):
+            response = self.client.post('/api/auth/uploads/', {
+                'name': 'a.wav', 'size': 2000, 'content_type': 'audio/wav'}, format='json')
+        self.assertEqual(response.status_code, 413)
+
+    def test_open_sessions_reserve_quota(self):
+        """Сессия резервирует место до завершения или удаления; резерв — условный UPDATE"""
+        first = self.create_session()
+        with self.settings(USER_STORAGE_QUOTA_BYTES=6000):
+            response = self.client.post('/api/auth/uploads/', {
+                'name': 'b.wav', 'size': 3000, 'content_type': 'audio/wav'}, format='json')
+            self.assertEqual(response.status_code, 413)
+            upload = SimpleUploadedFile('c.wav', b'x' * 3000, content_type='audio/wav')
+            self.assertEqual(self.client.post('/api/auth/upload/', {'file': upload}).status_code, 413)
+
+            for offset in range(0, 3500, 1000):
+                self.put_chunk(first, offset, self.data[offset:offset + 1000])
+            self.assertEqual(self.client.post(f"/api/auth/uploads/{first['id']}/complete/").status_code, 201)
+
+            quota = UserStorageQuota.objects.get(user=self.user)
+            self.assertEqual((quota.used_bytes, quota.pending_bytes), (3500, 0))
+
+            self.create_session(size=2000)
+            self.assertFalse(UserStorageQuota.reserve(self.user.pk, 501, 6000))
+            UploadSession.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+            # Брошенная сессия держит резерв, пока ее не удалит очистка
+            response = self.client.post('/api/auth/uploads/', {
+                'name': 'd.wav', 'size': 2500, 'content_type': 'audio/wav'}, format='json')
+            self.assertEqual(response.status_code, 413)
+            UploadSession.prune_expired()
+            self.create_session(size=2500)
+
+    def test_expired_sessions_pruned(self):
+        """Брошенные сессии удаляются вместе с сегментами"""
+        session = self.create_session()
+        self.put_chunk(session, 0, self.data[:1000])
+        UploadSession.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.client.get(f"/api/auth/uploads/{session['id']}/").status_code, 404)
+        task_queue.enqueue('uploads.prune_expired')
+        task_queue.run_pending()
+        self.assertFalse(FileSegment.objects.exists())
+
+
+class FilesArchiveTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(username='user', password='StrongPass123!')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.contents = {}
+        for name, data in (('a.png', os.urandom(2000)), ('dir/a.png', os.urandom(10))):
+            user_file = UserFile(user=self.user, original_name=name, file_size=len(data), content_type='image/png')
+            user_file._file_data = data
+            user_file.save()
+            self.contents[user_file.pk] = data
+        with self.settings(CHUNKED_UPLOAD_CHUNK_SIZE=1000):
+            session = UploadSession.objects.create(user=self.user, original_name='long.wav', content_type='audio/wav',
+                                                   total_size=3500, chunk_size=1000)
+            data = os.urandom(3500)
+            for offset in range(0, 3500, 1000):
+                session.store_chunk(offset, data[offset:offset + 1000])
+            self.segmented = session.finalize()
+            self.contents[self.segmented.pk] = data
+
+    def read_archive(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        parts = list(response.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(b''.join(parts))) as result:
+            return parts, {info.filename: result.read(info) for info in result.infolist()}
+
+    def test_archive_all_files(self):
+        """Все файлы пользователя в архиве, повторяющиеся имена различаются, поток идет частями"""
+        parts, members = self.read_archive(self.client.get('/api/auth/files/archive/?ids=all'))
+        self.assertEqual(members, {
+            'a.png': self.contents[min(self.contents)],
+            'a (2).png': self.contents[sorted(self.contents)[1]],
+            'long.wav': self.contents[self.segmented.pk],
+        })
+        # Сегменты файла, загруженного по частям, уходят в поток по одному
+        self.assertGreaterEqual(len([part for part in parts if part]), 4 + 2)
+
+    def test_selected_ids_and_errors(self):
+        """Выбранные файлы; чужие или несуществующие id — 404, некорректный список — 400"""
+        _, members = self.read_archive(self.client.get(f'/api/auth/files/archive/?ids={self.segmented.pk}'))
+        self.assertEqual(list(members), ['long.wav'])
+        self.assertEqual(self.client.get('/api/auth/files/archive/?ids=1,x').status_code, 400)
+        self.assertEqual(self.client.get('/api/auth/files/archive/').status_code, 400)
+        self.assertEqual(self.client.get('/api/auth/files/archive/?ids=999').status_code, 404)
+
+    async def test_asgi_streams_async_iterator(self):
+        """Под ASGI архив отдается асинхронным итератором, а не собирается в память целиком"""
+        token = str(RefreshToken.for_user(self.user).access_token)
+        response = await self.async_client.get('/api/auth/files/archive/?ids=all',
+                                               headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        body = b''.join([part async for part in response.streaming_content])
+        with zipfile.ZipFile(io.BytesIO(body)) as result:
+            self.assertEqual(len(result.namelist()), 3)
+
+    def test_zip64_for_large_members(self):
+        """Член архива больше 4GB записывается с ZIP64 (проверка по заголовку, без данных)"""
+        class LargeFile:
+            original_name = 'big.wav'
+            file_size = 5 * 1024 ** 3
+            uploaded_at = timezone.now()
+
+            def iter_decrypted_chunks(self):
+                return iter(())
+
+        header = next(archive.iter_zip([LargeFile()]))
+        signature, *_, size, name_length, extra_length = struct.unpack('<4s5H3L2H', header[:30])
+        self.assertEqual((signature, size), (b'PK\x03\x04', 0xFFFFFFFF))
+        extra = header[30 + name_length:30 + name_length + extra_length]
+        self.assertEqual(struct.unpack('<H', extra[:2])[0], 0x0001)  # ZIP64 extended information
@@ -0,0 +1,30 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .utils.token_blacklist import is_revoked, revoke
+
+
+class RefreshToken(BaseRefreshToken):
+    """
+    Refresh-токен с отзывом через RevokedToken (вместо приложения token_blacklist
+    simplejwt, которое хранит каждый выданный токен и растет без ограничений)
+    """
+
+    def verify(self, *args, **kwargs):
+        super().verify(*args, **kwargs)
+        if is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        """Отзыв токена; повторный отзыв (reuse при ротации) — ошибка токена"""
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if not revoke(jti, datetime_from_epoch(self.payload['exp'])):
+            raise TokenError(_("Token is blacklisted"))
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    token_class = RefreshToken
@@ -10,8 +10,18 @@ urlpatterns = [
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('profile/', views.user_profile_view, name='profile'),
     path('upload/', views.file_upload_view, name='file_upload'),
+    # Загрузка по частям: сессия, части по смещению, состояние, завершение
+    path('uploads/', views.upload_session_create_view, name='upload_session_create'),
+    path('uploads/<uuid:session_id>/', views.upload_session_view, name='upload_session'),
+    path('uploads/<uuid:session_id>/chunks/<int:offset>/', views.upload_chunk_view, name='upload_chunk'),
+    path('uploads/<uuid:session_id>/complete/', views.upload_complete_view, name='upload_complete'),
     path('files/', views.user_files_view, name='files'),
+    path('files/archive/', views.files_archive_view, name='files_archive'),
     # Маршрут для получения контента файла
     path('files/<int:file_id>/content/', views.download_file_view, name='file_content'),
+    path('files/<int:file_id>/thumbnail/', views.file_thumbnail_view, name='file_thumbnail'),
     path('weather/', views.weather_view, name='weather'),
+    # Профили запросов (только для staff)
+    path('profiles/<str:profile_id>/', views.profile_summary_view, name='profile_summary'),
+    path('profiles/<str:profile_id>/download/', views.profile_download_view, name='profile_download'),
 ]
\ No newline at end of file
@@ -0,0 +1,83 @@
+import os
+import zipfile
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.utils import timezone
+
+
+class StreamBuffer:
+    """
+    Несмещаемый приемник для zipfile: копит записанные байты до очередного pop().
+    zipfile без seek пишет размеры и CRC в дескриптор после данных члена архива.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def unique_name(name, used):
+    """Имя члена архива без каталогов; повторы получают суффикс ' (2)', ' (3)'..."""
+    name = os.path.basename(name.replace('\\', '/')) or 'file'
+    base, ext = os.path.splitext(name)
+    candidate, number = name, 1
+    while candidate in used:
+        number += 1
+        candidate = f'{base} ({number}){ext}'
+    used.add(candidate)
+    return candidate
+
+
+def iter_zip(files):
+    """
+    ZIP-архив по частям: каждый файл расшифровывается посегментно и сразу уходит
+    в поток (ZIP_STORED — изображения и аудио уже сжаты). Память не зависит
+    от размера архива: не больше одного сегмента (или одного файла, загруженного
+    одним запросом). Для больших членов zipfile сам включает ZIP64.
+    """
+    buffer = StreamBuffer()
+    used = set()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for user_file in files:
+            info = zipfile.ZipInfo(unique_name(user_file.original_name, used),
+                                   date_time=timezone.localtime(user_file.uploaded_at).timetuple()[:6])
+            info.file_size = user_file.file_size
+            with archive.open(info, 'w') as member:
+                for chunk in user_file.iter_decrypted_chunks():
+                    member.write(chunk)
+                    yield buffer.pop()
+            yield buffer.pop()
+    # Центральный каталог архива
+    yield buffer.pop()
+
+
+async def _aiter(iterator):
+    # Следующая часть — в sync-потоке, где идут запросы к БД; по одной части за раз
+    next_part = sync_to_async(next, thread_sensitive=True)
+    while True:
+        part = await next_part(iterator, None)
+        if part is None:
+            return
+        yield part
+
+
+def streaming_content(request, iterator):
+    """
+    Содержимое для StreamingHttpResponse: под ASGI Django собрал бы синхронный
+    итератор в список целиком, поэтому там отдается асинхронная обертка
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        return _aiter(iter(iterator))
+    return iterator
@@ -0,0 +1,95 @@
+import io
+import logging
+import wave
+
+from django.conf import settings
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import miniaudio
+except ImportError:  # без miniaudio анализируются только PCM WAV
+    miniaudio = None
+
+logger = logging.getLogger('api')
+
+# Пики хранятся целыми 0..PEAK_SCALE: компактнее чисел с плавающей точкой в JSON
+PEAK_SCALE = 255
+
+
+def _decode_wav(data):
+    """PCM WAV стандартным модулем wave: (массив отсчетов [кадры, каналы] в -1..1, частота)"""
+    with wave.open(io.BytesIO(data)) as reader:
+        channels, width, rate = reader.getnchannels(), reader.getsampwidth(), reader.getframerate()
+        raw = reader.readframes(reader.getnframes())
+    if width == 1:
+        samples = (numpy.frombuffer(raw, dtype=numpy.uint8).astype(numpy.float32) - 128) / 128
+    elif width == 3:
+        # 24 бита: дополняем младшим нулевым байтом до int32 (знак сохраняется)
+        triples = numpy.frombuffer(raw, dtype=numpy.uint8).reshape(-1, 3)
+        padded = numpy.zeros((len(triples), 4), dtype=numpy.uint8)
+        padded[:, 1:] = triples
+        samples = padded.view('<i4').ravel().astype(numpy.float32) / 2 ** 31
+    elif width in (2, 4):
+        dtype = numpy.dtype(f'<i{width}')
+        samples = numpy.frombuffer(raw, dtype=dtype).astype(numpy.float32) / 2 ** (8 * width - 1)
+    else:
+        raise wave.Error(f'Неподдерживаемая разрядность: {width}')
+    return samples.reshape(-1, channels), rate
+
+
+def _decode_miniaudio(data):
+    """MP3 (и прочие форматы miniaudio) в моно 16 бит"""
+    decoded = miniaudio.decode(data, output_format=miniaudio.SampleFormat.SIGNED16, nchannels=1)
+    samples = numpy.frombuffer(decoded.samples, dtype=numpy.int16).astype(numpy.float32) / 2 ** 15
+    return samples.reshape(-1, 1), decoded.sample_rate
+
+
+def compute_peaks(samples, points):
+    """
+    Огибающая для отрисовки волны: максимум модуля по каналам и внутри каждого
+    из points равных окон (одна векторная операция без цикла по отсчетам)
+    """
+    if len(samples) == 0:
+        return []
+    amplitude = numpy.abs(samples).max(axis=1)
+    points = min(points, len(amplitude))
+    # Окна равной длины; хвост короче окна добавляется к последнему
+    window = len(amplitude) // points
+    peaks = amplitude[:window * points].reshape(points, window).max(axis=1)
+    if len(amplitude) > window * points:
+        peaks[-1] = max(peaks[-1], amplitude[window * points:].max())
+    return numpy.rint(numpy.clip(peaks, 0, 1) * PEAK_SCALE).astype(int).tolist()
+
+
+def analyze_audio(data, content_type, points=None):
+    """
+    Длительность и пики аудиофайла: {'duration', 'sample_rate', 'peaks'}.
+    None, если формат не распознан или нет нужных библиотек (numpy, miniaudio для MP3).
+    """
+    if numpy is None:
+        logger.warning('numpy не установлен: анализ аудио пропущен')
+        return None
+    points = points or getattr(settings, 'AUDIO_PEAKS_POINTS', 200)
+    samples = None
+    if content_type in ('audio/wav', 'audio/x-wav', 'audio/wave'):
+        try:
+            samples, rate = _decode_wav(data)
+        except (wave.Error, EOFError, ValueError):
+            samples = None  # например, WAV с float-отсчетами: пробуем miniaudio
+    if samples is None:
+        if miniaudio is None:
+            logger.warning(f'miniaudio не установлен: анализ {content_type} пропущен')
+            return None
+        try:
+            samples, rate = _decode_miniaudio(data)
+        except miniaudio.MiniaudioError:
+            return None
+    return {
+        'duration': round(len(samples) / rate, 3) if rate else 0,
+        'sample_rate': rate,
+        'peaks': compute_peaks(samples, points),
+    }
@@ -0,0 +1,41 @@
+import hashlib
+import hmac
+from functools import lru_cache
+
+from django.conf import settings
+
+# Поля профиля, для которых хранится слепой индекс
+INDEXED_FIELDS = ('email', 'first_name', 'last_name')
+
+
+@lru_cache(maxsize=1)
+def get_blind_index_key():
+    """
+    Ключ HMAC для слепых индексов. Если BLIND_INDEX_KEY не задан, ключ выводится
+    из SECRET_KEY (отдельно от ключа шифрования, чтобы индексы не раскрывали его).
+    """
+    key = getattr(settings, 'BLIND_INDEX_KEY', None)
+    if key:
+        return key.encode() if isinstance(key, str) else key
+    return hmac.new(settings.SECRET_KEY.encode(), b'blind-index', hashlib.sha256).digest()
+
+
+def normalize(field, value):
+    """Нормализация значения: поиск не должен зависеть от регистра и пробелов"""
+    value = str(value).strip()
+    if field == 'email':
+        return value.lower()
+    return value.casefold()
+
+
+def blind_index(field, value):
+    """HMAC-SHA256 нормализованного значения поля (hex), None для пустых значений"""
+    if value is None or not str(value).strip():
+        return None
+    message = f'{field}:{normalize(field, value)}'.encode('utf-8')
+    return hmac.new(get_blind_index_key(), message, hashlib.sha256).hexdigest()
+
+
+def blind_indexes(data):
+    """Слепые индексы всех индексируемых полей из словаря профиля"""
+    return {f'{field}_bidx': blind_index(field, data.get(field)) for field in INDEXED_FIELDS}
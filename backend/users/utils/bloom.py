@@ -0,0 +1,111 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+
+# Заголовок файла фильтра: сигнатура, число бит m, число хешей k, число элементов n
+HEADER = struct.Struct('<8sQIQ')
+MAGIC = b'CMBLOOM1'
+
+
+def optimal_parameters(capacity, fp_rate):
+    """Число бит m и хеш-функций k для capacity элементов при заданной доле ложных срабатываний"""
+    if capacity < 1:
+        capacity = 1
+    if not 0 < fp_rate < 1:
+        raise ValueError('fp_rate должен быть в интервале (0, 1)')
+    bits = math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))
+    bits = max(8, (bits + 7) // 8 * 8)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+def _to_bytes(item):
+    return item.encode('utf-8') if isinstance(item, str) else bytes(item)
+
+
+class BloomFilter:
+    """
+    Фильтр Блума: проверка принадлежности без ложноотрицательных ответов.
+    Позиции бит считаются двойным хешированием одного blake2b-дайджеста.
+
+    Фильтр либо создается в памяти (create) и пополняется через add,
+    либо открывается из файла (open) через mmap только для чтения: страницы
+    лежат в page cache ОС и разделяются всеми процессами-воркерами.
+    """
+
+    def __init__(self, bits, num_bits, num_hashes, count=0, offset=0):
+        self.bits = bits
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.count = count
+        self.offset = offset
+
+    @classmethod
+    def create(cls, capacity, fp_rate=0.001):
+        num_bits, num_hashes = optimal_parameters(capacity, fp_rate)
+        return cls(bytearray(num_bits // 8), num_bits, num_hashes)
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            bits = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, num_bits, num_hashes, count = HEADER.unpack_from(bits, 0)
+        if magic != MAGIC or len(bits) < HEADER.size + num_bits // 8:
+            bits.close()
+            raise ValueError(f'{path}: не файл фильтра Блума')
+        return cls(bits, num_bits, num_hashes, count, offset=HEADER.size)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(_to_bytes(item), digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        h2 |= 1  # нечетный шаг: позиции не зацикливаются на малом подмножестве
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item):
+        if self.offset:
+            raise TypeError('Фильтр открыт только для чтения')
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        # Горячий путь валидации: позиции считаются inline, без генератора
+        h1, h2 = struct.unpack('<QQ', hashlib.blake2b(_to_bytes(item), digest_size=16).digest())
+        h2 |= 1
+        bits = self.bits
+        offset = self.offset
+        num_bits = self.num_bits
+        for i in range(self.num_hashes):
+            position = (h1 + i * h2) % num_bits
+            if not bits[offset + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def size_bytes(self):
+        return self.num_bits // 8
+
+    def estimated_fp_rate(self):
+        """Ожидаемая доля ложных срабатываний при текущем числе элементов"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def save(self, path):
+        """
+        Атомарная запись в файл: воркеры, уже отобразившие старый файл,
+        продолжают работать с ним до переоткрытия
+        """
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, self.num_bits, self.num_hashes, self.count))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    def close(self):
+        if isinstance(self.bits, mmap.mmap):
+            self.bits.close()
@@ -0,0 +1,110 @@
+import gzip
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _gzip(data):
+    # mtime=0: одинаковый результат для одинаковых данных
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _brotli(data):
+    # Уровень 11 слишком медленный для сжатия на лету
+    return brotli.compress(data, quality=5)
+
+
+def _zstd(data):
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+# Доступные кодеки: без необязательных пакетов остается только gzip
+CODECS = {'gzip': _gzip}
+if brotli is not None:
+    CODECS['br'] = _brotli
+if zstandard is not None:
+    CODECS['zstd'] = _zstd
+
+
+def parse_accept_encoding(header):
+    """Accept-Encoding -> {кодировка: q}, например 'gzip, br;q=0.5' -> {'gzip': 1.0, 'br': 0.5}"""
+    accepted = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def negotiate(header, encodings=None):
+    """
+    Кодировка для ответа: наибольший q клиента среди доступных кодеков,
+    при равенстве — порядок RESPONSE_COMPRESSION_ENCODINGS. None — без сжатия.
+    """
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    if encodings is None:
+        encodings = getattr(settings, 'RESPONSE_COMPRESSION_ENCODINGS', ['gzip'])
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        if encoding not in CODECS:
+            continue
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(response):
+    """Сжимаются только готовые (не потоковые) ответы достаточного размера с несжатым типом"""
+    if response.streaming or response.has_header('Content-Encoding') or response.status_code != 200:
+        return False
+    if len(response.content) < getattr(settings, 'RESPONSE_COMPRESSION_MIN_BYTES', 1024):
+        return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    skip_types = getattr(settings, 'RESPONSE_COMPRESSION_SKIP_TYPES', ())
+    return not any(content_type.startswith(prefix) for prefix in skip_types)
+
+
+def is_excluded(request):
+    """Маршрут из RESPONSE_COMPRESSION_EXCLUDE_VIEWS (ответы с секретами: токены авторизации)"""
+    match = getattr(request, 'resolver_match', None)
+    return match is not None and match.view_name in getattr(settings, 'RESPONSE_COMPRESSION_EXCLUDE_VIEWS', ())
+
+
+def compress(data, encoding, use_cache=True):
+    """
+    Сжатие тела ответа. Сжатые варианты кешируются по хешу содержимого:
+    blake2b на порядок быстрее сжатия, а одинаковые ответы (история погоды,
+    неизменившийся список файлов) не сжимаются повторно.
+    """
+    if not use_cache or len(data) > getattr(settings, 'RESPONSE_COMPRESSION_CACHE_MAX_BYTES', 1024 * 1024):
+        return CODECS[encoding](data)
+    key = f'compressed:{encoding}:{hashlib.blake2b(data, digest_size=20).hexdigest()}'
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = CODECS[encoding](data)
+        cache.set(key, compressed, getattr(settings, 'RESPONSE_COMPRESSION_CACHE_TIMEOUT', 300))
+    return compressed
@@ -0,0 +1,48 @@
+import functools
+import uuid
+
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+
+def new_data_version():
+    """
+    Новая версия данных пользователя. Используется случайное значение, а не счетчик +1:
+    запись устаревшего экземпляра пользователя не может вернуть уже выданную версию.
+    """
+    return uuid.uuid4().hex
+
+
+def user_data_etag(prefix):
+    """ETag по версии данных пользователя: один индексный запрос, без дешифрования и блобов"""
+    def etag_func(request, *args, **kwargs):
+        from ..models import CustomUser
+
+        user = request.user
+        if not user.is_authenticated:
+            return None
+        version = CustomUser.objects.filter(pk=user.pk).values_list('data_version', flat=True).first()
+        if version is None:
+            return None
+        return f'"{prefix}-{user.pk}-{version}"'
+    return etag_func
+
+
+def conditional_on_user_data(prefix):
+    """
+    Декоратор для GET-эндпоинтов с данными текущего пользователя: отдает ETag и
+    возвращает 304 при совпадении If-None-Match до вызова view.
+    Применяется под @api_view, чтобы request.user уже был определен аутентификацией DRF.
+    """
+    def decorator(view_func):
+        conditional_view = condition(etag_func=user_data_etag(prefix))(view_func)
+
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # Ответ зависит от пользователя: только приватные кеши с обязательной ревалидацией
+            patch_vary_headers(response, ('Authorization',))
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -1,13 +1,20 @@
-import os
 import base64
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+import threading
+
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .request_context import timed
+from .tracing import span
 
 
 class DataEncryptor:
     def __init__(self):
+        # cryptography импортируется только при первом создании шифратора
+        from cryptography.fernet import Fernet
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
         # Генерируем ключ на основе секретного ключа Django
         password = settings.SECRET_KEY.encode()
         salt = b'salt_' + password[:16]  # Используем часть SECRET_KEY как salt
@@ -24,21 +31,24 @@ class DataEncryptor:
         """Шифрование данных (принимает str или bytes)"""
         if isinstance(data, str):
             data = data.encode('utf-8')
-        encrypted_data = self.fernet.encrypt(data)
+        with span('crypto.encrypt', bytes=len(data)), timed('crypto.encrypt'):
+            encrypted_data = self.fernet.encrypt(data)
         return encrypted_data
 
     def decrypt_data(self, encrypted_data):
         """Дешифрование текстовых данных (возвращает строку)"""
         if encrypted_data is None:
             return None
-        decrypted_data = self.fernet.decrypt(encrypted_data)
+        with span('crypto.decrypt', bytes=len(encrypted_data)), timed('crypto.decrypt'):
+            decrypted_data = self.fernet.decrypt(encrypted_data)
         return decrypted_data.decode('utf-8')
 
     def decrypt_binary(self, encrypted_data):
         """Дешифрование бинарных данных (возвращает bytes)"""
         if encrypted_data is None:
             return None
-        return self.fernet.decrypt(encrypted_data)
+        with span('crypto.decrypt', bytes=len(encrypted_data)), timed('crypto.decrypt'):
+            return self.fernet.decrypt(encrypted_data)
 
     def encrypt_file(self, file_path):
         """Шифрование файла по пути (не используется в текущей логике API, но полезно)"""
@@ -55,5 +65,30 @@ class DataEncryptor:
         return output_path
 
 
-# Создаем глобальный экземпляр шифратора
-encryptor = DataEncryptor()
\ No newline at end of file
+_encryptor = None
+_encryptor_lock = threading.Lock()
+
+
+def get_encryptor():
+    """
+    Общий экземпляр шифратора. Ключ (100 000 итераций PBKDF2) выводится при первом
+    обращении, а не при импорте: manage.py-команды и тесты без шифрования его не ждут
+    """
+    global _encryptor
+    if _encryptor is None:
+        with _encryptor_lock:
+            if _encryptor is None:
+                _encryptor = DataEncryptor()
+    return _encryptor
+
+
+def warm_up():
+    """
+    Вывод ключа заранее. Вызывается в wsgi/asgi: при preload в gunicorn/uvicorn ключ
+    выводится один раз в мастер-процессе и наследуется воркерами после fork
+    """
+    get_encryptor()
+
+
+# Глобальный шифратор (ленивый): интерфейс прежний, инициализация — при первом вызове
+encryptor = SimpleLazyObject(get_encryptor)
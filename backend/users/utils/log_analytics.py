@@ -0,0 +1,223 @@
+import gzip
+import heapq
+import json
+import re
+from collections import Counter
+from datetime import datetime
+
+from django.utils import timezone
+
+# Строка request_format: "{asctime} | {levelname} | {message}"
+LINE_RE = re.compile(r'^(?P<asctime>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(?P<msecs>\d{3}) \| (?P<level>\w+) \| RESPONSE: (?P<payload>\{.*\})\s*$')
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Нормализация путей: числовые и UUID-сегменты схлопываются, чтобы не плодить ключи
+UUID_SEGMENT_RE = re.compile(r'/[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}(?=/|$)')
+NUMERIC_SEGMENT_RE = re.compile(r'/\d+(?=/|$)')
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def normalize_path(path):
+    path = UUID_SEGMENT_RE.sub('/<uuid>', path)
+    return NUMERIC_SEGMENT_RE.sub('/<id>', path)
+
+
+def open_log(path):
+    """Открытие лога, в т.ч. сжатого при ротации (.gz)"""
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+
+class PathStats:
+    """
+    Агрегаты по одному пути. Память не зависит от числа запросов:
+    длительности хранятся гистограммой с шагом 1 мс (точность самого лога).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.client_errors = 0
+        self.server_errors = 0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+        self.histogram = Counter()
+
+    def add(self, status_code, duration):
+        self.count += 1
+        if 400 <= status_code < 500:
+            self.client_errors += 1
+        elif status_code >= 500:
+            self.server_errors += 1
+        self.total_duration += duration
+        self.max_duration = max(self.max_duration, duration)
+        self.histogram[round(duration * 1000)] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.client_errors += other.client_errors
+        self.server_errors += other.server_errors
+        self.total_duration += other.total_duration
+        self.max_duration = max(self.max_duration, other.max_duration)
+        self.histogram.update(other.histogram)
+
+    def percentiles(self):
+        """Перцентили (в секундах) по гистограмме"""
+        result = {}
+        targets = [(p, p / 100 * self.count) for p in PERCENTILES]
+        seen = 0
+        index = 0
+        for ms in sorted(self.histogram):
+            seen += self.histogram[ms]
+            while index < len(targets) and seen >= targets[index][1]:
+                result[f'p{targets[index][0]}'] = ms / 1000
+                index += 1
+            if index == len(targets):
+                break
+        return result
+
+
+class LogReport:
+    """Отчет по одному или нескольким лог-файлам"""
+
+    def __init__(self, since=None, until=None, top_slowest=20, normalize=True):
+        self.since = since
+        self.until = until
+        self.top_slowest = top_slowest
+        self.normalize = normalize
+        self.paths = {}
+        self.slowest = []  # min-heap из (duration, timestamp, method, path, status)
+        self.first_seen = None
+        self.last_seen = None
+        self.lines = 0
+        self.skipped = 0
+
+    def add_line(self, line):
+        self.lines += 1
+        if 'RESPONSE: ' not in line:
+            return
+        match = LINE_RE.match(line)
+        if not match:
+            self.skipped += 1
+            return
+        # asctime пишется в локальном времени процесса (TIME_ZONE), окно --since/--until - aware
+        timestamp = timezone.make_aware(datetime.strptime(match['asctime'], TIME_FORMAT))
+        if (self.since and timestamp < self.since) or (self.until and timestamp > self.until):
+            return
+        try:
+            payload = json.loads(match['payload'])
+            status_code = int(payload['status_code'])
+            duration = float(payload['duration_seconds'])
+            method = payload.get('method', '')
+            path = payload['path']
+        except (ValueError, KeyError, TypeError):
+            self.skipped += 1
+            return
+
+        if self.normalize:
+            path = normalize_path(path)
+        key = f'{method} {path}'
+        stats = self.paths.get(key)
+        if stats is None:
+            stats = self.paths[key] = PathStats()
+        stats.add(status_code, duration)
+
+        if self.first_seen is None or timestamp < self.first_seen:
+            self.first_seen = timestamp
+        if self.last_seen is None or timestamp > self.last_seen:
+            self.last_seen = timestamp
+
+        self.keep_slowest((duration, timestamp.strftime(TIME_FORMAT), method, payload['path'], status_code))
+
+    def keep_slowest(self, entry):
+        """Учет записи в top_slowest самых медленных; при top_slowest <= 0 список не ведется"""
+        if self.top_slowest <= 0:
+            return
+        if len(self.slowest) < self.top_slowest:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def add_file(self, path):
+        with open_log(path) as f:
+            for line in f:
+                self.add_line(line)
+        return self
+
+    def merge(self, other):
+        for key, stats in other.paths.items():
+            if key in self.paths:
+                self.paths[key].merge(stats)
+            else:
+                self.paths[key] = stats
+        for entry in other.slowest:
+            self.keep_slowest(entry)
+        for seen in (other.first_seen, other.last_seen):
+            if seen is None:
+                continue
+            if self.first_seen is None or seen < self.first_seen:
+                self.first_seen = seen
+            if self.last_seen is None or seen > self.last_seen:
+                self.last_seen = seen
+        self.lines += other.lines
+        self.skipped += other.skipped
+        return self
+
+    def window_seconds(self):
+        start = self.since or self.first_seen
+        end = self.until or self.last_seen
+        if start is None or end is None:
+            return 0.0
+        # Минимум 1 секунда, чтобы пропускная способность не уходила в бесконечность
+        return max((end - start).total_seconds(), 1.0)
+
+    def rows(self):
+        """Строки отчета по путям, отсортированные по числу запросов"""
+        window = self.window_seconds()
+        rows = []
+        for key, stats in self.paths.items():
+            method, _, path = key.partition(' ')
+            row = {
+                'method': method,
+                'path': path,
+                'requests': stats.count,
+                'rps': round(stats.count / window, 3) if window else 0.0,
+                'error_rate': round((stats.client_errors + stats.server_errors) / stats.count, 4),
+                'client_errors': stats.client_errors,
+                'server_errors': stats.server_errors,
+                'avg': round(stats.total_duration / stats.count, 4),
+                'max': round(stats.max_duration, 3),
+            }
+            row.update(stats.percentiles())
+            rows.append(row)
+        rows.sort(key=lambda row: row['requests'], reverse=True)
+        return rows
+
+    def slowest_requests(self):
+        return [{
+            'duration_seconds': duration,
+            'timestamp': timestamp,
+            'method': method,
+            'path': path,
+            'status_code': status_code,
+        } for duration, timestamp, method, path, status_code in sorted(self.slowest, reverse=True)]
+
+    def to_dict(self):
+        return {
+            'window': {
+                'start': (self.since or self.first_seen).isoformat(sep=' ') if (self.since or self.first_seen) else None,
+                'end': (self.until or self.last_seen).isoformat(sep=' ') if (self.until or self.last_seen) else None,
+                'seconds': self.window_seconds(),
+            },
+            'lines': self.lines,
+            'skipped': self.skipped,
+            'paths': self.rows(),
+            'slowest': self.slowest_requests(),
+        }
+
+
+def analyze_file(path, since=None, until=None, top_slowest=20, normalize=True):
+    """Отчет по одному файлу (верхнеуровневая функция для пула процессов)"""
+    report = LogReport(since=since, until=until, top_slowest=top_slowest, normalize=normalize)
+    return report.add_file(path)
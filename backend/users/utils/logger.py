@@ -1,13 +1,22 @@
 import logging
 
+from .request_context import get_client_ip, get_current_context, get_user_label
+
 # Создаем логгер для бизнес-логики
 business_logger = logging.getLogger('api')
 
 
 def log_user_action(user, action, details=None):
     """
-    Логирование действий пользователя
+    Логирование действий пользователя.
+    Внутри запроса событие добавляется в контекст запроса, иначе пишется отдельной строкой.
     """
+    context = get_current_context()
+    if context is not None:
+        context.add_event('user_action', action=action, user_id=user.id if user else None,
+                          **({'details': details} if details else {}))
+        return
+
     log_data = {
         'action': action,
         'user': str(user) if user else 'Anonymous',
@@ -24,12 +33,19 @@ def log_api_call(request, view_name, extra_info=None):
     """
     Логирование вызовов API
     """
+    context = get_current_context()
+    if context is not None:
+        context.view = view_name
+        if extra_info:
+            context.add_event('api_call', **extra_info)
+        return
+
     # ИСПРАВЛЕНО: теперь request идет первым аргументом
     log_data = {
         'view': view_name,
         'method': request.method,
         'path': request.path,
-        'user': str(request.user) if request.user.is_authenticated else 'Anonymous',
+        'user': get_user_label(request.user),
         'user_id': request.user.id if request.user.is_authenticated else None,
     }
 
@@ -43,27 +59,20 @@ def log_security_event(event_type, request, details=None):
     """
     Логирование security событий
     """
+    context = get_current_context()
+    if context is not None:
+        context.add_event('security', security_event=event_type, **({'details': details} if details else {}))
+        return
+
     log_data = {
         'security_event': event_type,
         'method': request.method,
         'path': request.path,
         'client_ip': get_client_ip(request),
-        'user': str(request.user) if request.user.is_authenticated else 'Anonymous',
+        'user': get_user_label(request.user),
     }
 
     if details:
         log_data['details'] = details
 
     business_logger.warning(f"SECURITY: {log_data}")
-
-
-def get_client_ip(request):
-    """
-    Получение IP адреса клиента
-    """
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
\ No newline at end of file
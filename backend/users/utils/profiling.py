@@ -0,0 +1,156 @@
+import cProfile
+import json
+import os
+import pstats
+import re
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+# Допустимый формат идентификатора профиля (защита от обхода путей при скачивании)
+PROFILE_ID_RE = re.compile(r'^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$')
+
+# Файл, функции которого считаются временем шифрования (DataEncryptor)
+ENCRYPTION_MODULE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'encryption.py')
+
+
+def get_profiles_dir():
+    """Каталог для сохранения профилей"""
+    return Path(getattr(settings, 'REQUEST_PROFILING_DIR', settings.BASE_DIR / 'logs' / 'profiles'))
+
+
+def get_profile_paths(profile_id):
+    """
+    Пути к файлам профиля: (pstats-дамп, JSON-сводка).
+    Возвращает None для некорректного идентификатора.
+    """
+    if not PROFILE_ID_RE.match(profile_id or ''):
+        return None
+    profiles_dir = get_profiles_dir()
+    return profiles_dir / f'{profile_id}.prof', profiles_dir / f'{profile_id}.json'
+
+
+def prune_profiles(keep=None):
+    """
+    Удаляет самые старые профили сверх REQUEST_PROFILING_MAX_PROFILES.
+    Идентификатор начинается со времени создания, поэтому порядок имен хронологический.
+    Возвращает число удаленных профилей.
+    """
+    keep = keep if keep is not None else getattr(settings, 'REQUEST_PROFILING_MAX_PROFILES', 200)
+    profiles_dir = get_profiles_dir()
+    if not keep or not profiles_dir.is_dir():
+        return 0
+    profile_ids = sorted({path.stem for path in profiles_dir.iterdir()
+                          if path.suffix in ('.prof', '.json') and PROFILE_ID_RE.match(path.stem)})
+    stale = profile_ids[:-keep]
+    for profile_id in stale:
+        for path in get_profile_paths(profile_id):
+            path.unlink(missing_ok=True)
+    return len(stale)
+
+
+class RequestProfiler:
+    """
+    Профилирование одного запроса: cProfile + учет SQL-запросов
+    """
+
+    def __init__(self, request, top_n=None):
+        self.request = request
+        self.top_n = top_n or getattr(settings, 'REQUEST_PROFILING_TOP_N', 25)
+        self.profile_id = f"{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.duration = 0.0
+        self._stack = None
+        self._start = None
+
+    def _record_query(self, execute, sql, params, many, context):
+        """execute_wrapper: замеряем время каждого SQL-запроса"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'duration_seconds': time.perf_counter() - start,
+                'many': many,
+            })
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        self._stack.enter_context(connection.execute_wrapper(self._record_query))
+        self._start = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self._start
+        self._stack.close()
+        return False
+
+    def encryption_time(self, stats):
+        """
+        Суммарное время в DataEncryptor: учитываем только "входы" в модуль шифрования,
+        чтобы вложенные вызовы не считались дважды
+        """
+        def in_module(filename):
+            return os.path.abspath(filename) == ENCRYPTION_MODULE
+
+        total = 0.0
+        for (filename, _, _), (_, _, _, cumtime, callers) in stats.stats.items():
+            if not in_module(filename):
+                continue
+            if any(in_module(caller[0]) for caller in callers):
+                continue
+            total += cumtime
+        return total
+
+    def top_functions(self, stats):
+        """Функции с наибольшим накопленным временем"""
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        return [{
+            'function': f"{filename}:{line}({name})",
+            'calls': ncalls,
+            'tottime': round(tottime, 6),
+            'cumtime': round(cumtime, 6),
+        } for (filename, line, name), (_, ncalls, tottime, cumtime, _) in rows[:self.top_n]]
+
+    def summary(self, response, stats):
+        """Краткая сводка по запросу"""
+        sql_time = sum(q['duration_seconds'] for q in self.queries)
+        slowest = sorted(self.queries, key=lambda q: q['duration_seconds'], reverse=True)
+        return {
+            'profile_id': self.profile_id,
+            'method': self.request.method,
+            'path': self.request.path,
+            'user': str(self.request.user),
+            'status_code': response.status_code,
+            'duration_seconds': round(self.duration, 6),
+            'sql': {
+                'count': len(self.queries),
+                'duration_seconds': round(sql_time, 6),
+                'slowest': [dict(q, duration_seconds=round(q['duration_seconds'], 6))
+                            for q in slowest[:self.top_n]],
+            },
+            'encryption_seconds': round(self.encryption_time(stats), 6),
+            'top_functions': self.top_functions(stats),
+        }
+
+    def save(self, response):
+        """Сохраняет pstats-дамп и JSON-сводку на диск, возвращает сводку"""
+        prof_path, summary_path = get_profile_paths(self.profile_id)
+        prof_path.parent.mkdir(parents=True, exist_ok=True)
+
+        stats = pstats.Stats(self.profiler)
+        stats.dump_stats(prof_path)
+        summary = self.summary(response, stats)
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        prune_profiles()
+        return summary
@@ -0,0 +1,190 @@
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection as default_connection
+
+# Оценка размера значений, которые не являются строками/байтами (числа, даты, bool)
+SCALAR_BYTES = 8
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Запросы view превысили бюджет (число запросов, время SQL или объем выборки)"""
+
+
+def value_size(value):
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview, str)):
+        return len(value)
+    return SCALAR_BYTES
+
+
+class MeteredCursor:
+    """
+    Обертка курсора: замеряет время execute и считает строки и байты,
+    которые реально выбраны через fetch* (а не только текст запроса)
+    """
+
+    def __init__(self, cursor, recorder):
+        self.cursor = cursor
+        self.recorder = recorder
+        self.query = None
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self.cursor.__exit__(exc_type, exc, tb)
+
+    def __iter__(self):
+        for row in self.cursor:
+            self._count([row])
+            yield row
+
+    def _run(self, method, sql, params):
+        start = time.perf_counter()
+        try:
+            return method(sql, params)
+        finally:
+            self.query = self.recorder.add(sql, params, time.perf_counter() - start)
+
+    def execute(self, sql, params=None):
+        return self._run(self.cursor.execute, sql, params)
+
+    def executemany(self, sql, param_list):
+        return self._run(self.cursor.executemany, sql, param_list)
+
+    def _count(self, rows):
+        if self.query is None or not rows:
+            return
+        self.query['rows'] += len(rows)
+        self.query['bytes'] += sum(value_size(value) for row in rows for value in row)
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            self._count([row])
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self.cursor.fetchmany(*args, **kwargs)
+        self._count(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self._count(rows)
+        return rows
+
+
+class QueryRecorder:
+    """Запросы одного участка кода: SQL, время, строки и байты выборки"""
+
+    def __init__(self):
+        self.queries = []
+
+    def add(self, sql, params, duration):
+        query = {'sql': sql, 'params': params, 'time': duration, 'rows': 0, 'bytes': 0}
+        self.queries.append(query)
+        return query
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def time(self):
+        return sum(query['time'] for query in self.queries)
+
+    @property
+    def bytes(self):
+        return sum(query['bytes'] for query in self.queries)
+
+    def summary(self):
+        return {'queries': self.count, 'time': round(self.time, 6), 'bytes': self.bytes}
+
+
+@contextmanager
+def record_queries(connection=None):
+    """
+    Запись запросов через подмену make_cursor/make_debug_cursor соединения
+    (оборачиваются курсоры обоих режимов, в т.ч. CaptureQueriesContext)
+    """
+    connection = connection or default_connection
+    recorder = QueryRecorder()
+    saved = {name: connection.__dict__.get(name) for name in ('make_cursor', 'make_debug_cursor')}
+
+    def metered(factory):
+        return lambda cursor: MeteredCursor(factory(cursor), recorder)
+
+    connection.make_cursor = metered(connection.make_cursor)
+    connection.make_debug_cursor = metered(connection.make_debug_cursor)
+    try:
+        yield recorder
+    finally:
+        for name, previous in saved.items():
+            if previous is None:
+                delattr(connection, name)
+            else:
+                setattr(connection, name, previous)
+
+
+def get_budget(view_name):
+    """Бюджет из QUERY_BUDGETS по имени маршрута (например, 'users:files'); None — без бюджета"""
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(view_name)
+
+
+def check_budget(recorder, budget):
+    """Список нарушений бюджета ({'queries': N, 'time': секунды, 'bytes': N})"""
+    violations = []
+    if not budget:
+        return violations
+    if budget.get('queries') is not None and recorder.count > budget['queries']:
+        violations.append(f"запросов {recorder.count} > {budget['queries']}")
+    if budget.get('time') is not None and recorder.time > budget['time']:
+        violations.append(f"время SQL {recorder.time * 1000:.1f} мс > {budget['time'] * 1000:.1f} мс")
+    if budget.get('bytes') is not None and recorder.bytes > budget['bytes']:
+        violations.append(f"выбрано {recorder.bytes} байт > {budget['bytes']}")
+    return violations
+
+
+def format_report(view_name, recorder, violations, top=5):
+    """Отчет о нарушении: итоги и самые тяжелые запросы (по байтам и времени)"""
+    lines = [f"Бюджет запросов {view_name} превышен: {'; '.join(violations)}"]
+    heaviest = sorted(recorder.queries, key=lambda query: (query['bytes'], query['time']), reverse=True)
+    for query in heaviest[:top]:
+        sql = query['sql'] if len(query['sql']) <= 500 else query['sql'][:500] + '...'
+        lines.append(f"  {query['bytes']:>9} байт  {query['rows']:>5} строк  "
+                     f"{query['time'] * 1000:7.2f} мс  {sql}")
+    if recorder.count > top:
+        lines.append(f'  ... и еще {recorder.count - top} запросов')
+    return '\n'.join(lines)
+
+
+def enforce_budget(view_name, recorder, budget=None):
+    """Проверка бюджета маршрута; QueryBudgetExceeded с отчетом при нарушении"""
+    violations = check_budget(recorder, budget if budget is not None else get_budget(view_name))
+    if violations:
+        raise QueryBudgetExceeded(format_report(view_name, recorder, violations))
+
+
+class QueryBudgetTestMixin:
+    """
+    Для TestCase: with self.assertQueryBudget('users:files'): self.client.get(...)
+    Бюджет берется из QUERY_BUDGETS, отдельные пределы можно переопределить аргументами.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, view_name, **overrides):
+        budget = dict(get_budget(view_name) or {}, **overrides)
+        if not budget:
+            self.fail(f'Для {view_name} не задан бюджет запросов (QUERY_BUDGETS)')
+        with record_queries() as recorder:
+            yield recorder
+        violations = check_budget(recorder, budget)
+        if violations:
+            self.fail(format_report(view_name, recorder, violations))
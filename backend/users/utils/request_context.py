@@ -0,0 +1,122 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current_context = ContextVar('request_context', default=None)
+
+
+def get_client_ip(request):
+    """
+    Получение IP адреса клиента
+    """
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        ip = x_forwarded_for.split(',')[0]
+    else:
+        ip = request.META.get('REMOTE_ADDR')
+    return ip
+
+
+def get_user_label(user):
+    """Строковое представление пользователя для логов"""
+    return str(user) if user is not None and user.is_authenticated else 'Anonymous'
+
+
+class RequestContext:
+    """
+    Контекст одного запроса: создается middleware один раз, накапливает
+    бизнес-события из log_* хелперов и выводится одной записью в конце ответа.
+    """
+
+    def __init__(self, request):
+        self.method = request.method
+        self.path = request.path
+        self.client_ip = get_client_ip(request)
+        self.user_agent = request.META.get('HTTP_USER_AGENT', '')
+        self.query_params = dict(request.GET)
+        self.request_body = None
+        self.user = 'Anonymous'
+        self.user_id = None
+        self.view = None
+        self.events = []
+        self.timings = {}
+        self.exception = None
+        self.started = time.perf_counter()
+
+    def set_user(self, user):
+        """Фиксируем пользователя (один раз вычисляем строковое представление)"""
+        if user is not None and user.is_authenticated:
+            self.user = str(user)
+            self.user_id = user.pk
+        else:
+            self.user = 'Anonymous'
+            self.user_id = None
+
+    def add_event(self, event_type, **data):
+        self.events.append({'type': event_type, **data})
+
+    def add_timing(self, name, seconds):
+        self.timings[name] = round(self.timings.get(name, 0.0) + seconds, 6)
+
+    def set_exception(self, exception):
+        self.exception = f"{type(exception).__name__}: {exception}"
+
+    @property
+    def has_security_events(self):
+        return any(event['type'] == 'security' for event in self.events)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def to_record(self, status_code, duration):
+        """Итоговая запись о запросе"""
+        record = {
+            'method': self.method,
+            'path': self.path,
+            'status_code': status_code,
+            'duration_seconds': round(duration, 3),
+            'client_ip': self.client_ip,
+            'user': self.user,
+            'user_id': self.user_id,
+            'user_agent': self.user_agent,
+        }
+        if self.query_params:
+            record['query_params'] = self.query_params
+        if self.request_body:
+            record['request_body'] = self.request_body
+        if self.view:
+            record['view'] = self.view
+        if self.timings:
+            record['timings'] = self.timings
+        if self.events:
+            record['events'] = self.events
+        if self.exception:
+            record['exception'] = self.exception
+        return record
+
+
+def get_current_context():
+    """Контекст текущего запроса (None вне запроса, например в планировщике)"""
+    return _current_context.get()
+
+
+def activate(context):
+    return _current_context.set(context)
+
+
+def deactivate(token):
+    _current_context.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Замер участка кода в таймингах текущего запроса (вне запроса ничего не делает)"""
+    context = _current_context.get()
+    if context is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        context.add_timing(name, time.perf_counter() - start)
@@ -1,5 +1,6 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from .scraper import parse_gismeteo
+from .task_queue import enqueue
 
 
 def start_scheduler():
@@ -9,4 +10,8 @@ def start_scheduler():
     # (Для тестов можно поставить seconds=60, чтобы быстрее проверить)
     scheduler.add_job(parse_gismeteo, 'interval', minutes=1, id='weather_parser', replace_existing=True)
 
+    # Очистка брошенных загрузок по частям выполняется воркером очереди
+    scheduler.add_job(enqueue, 'interval', hours=1, args=['uploads.prune_expired'],
+                      id='prune_uploads', replace_existing=True)
+
     scheduler.start()
\ No newline at end of file
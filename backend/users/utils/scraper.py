@@ -1,6 +1,5 @@
-import requests
-from bs4 import BeautifulSoup
 from ..models import WeatherData
+from .tracing import span
 import logging
 
 logger = logging.getLogger('api')
@@ -14,11 +13,23 @@ def parse_gismeteo():
         'Accept-Language': 'ru-RU,ru;q=0.9',
     }
 
+    with span('scraper.gismeteo', url=url):
+        _parse_gismeteo(url, headers)
+
+
+def _parse_gismeteo(url, headers):
+    # requests и bs4 нужны только задаче планировщика: не импортируем их при старте процесса
+    import requests
+    from bs4 import BeautifulSoup
+
     try:
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
+        with span('scraper.fetch') as fetch_span:
+            response = requests.get(url, headers=headers, timeout=15)
+            response.raise_for_status()
+            fetch_span.set_attribute('bytes', len(response.content))
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+        with span('scraper.parse'):
+            soup = BeautifulSoup(response.text, 'html.parser')
 
         print(f"--- Страница загружена: {soup.title.string if soup.title else 'No Title'} ---")
 
@@ -56,11 +67,12 @@ def parse_gismeteo():
             description = "Нет данных"
 
         # 3. Сохраняем результат
-        WeatherData.objects.create(
-            temperature=temperature,
-            description=description,
-            source_url=url
-        )
+        with span('db.insert', table=WeatherData._meta.db_table):
+            WeatherData.objects.create(
+                temperature=temperature,
+                description=description,
+                source_url=url
+            )
 
         result_msg = f"Температура: {temperature}, Описание: {description}"
         logger.info(f"Weather parsed: {result_msg}")
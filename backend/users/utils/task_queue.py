@@ -0,0 +1,179 @@
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .tracing import span
+
+logger = logging.getLogger('api')
+
+# Зарегистрированные задачи: имя -> функция (заполняется импортом users.tasks)
+REGISTRY = {}
+
+
+def task(name):
+    """
+    Регистрация функции как фоновой задачи: @task('files.thumbnail').
+    Задача может выполниться повторно (истек таймаут видимости, упал воркер),
+    поэтому должна быть идемпотентной. Аргументы — только JSON-совместимые значения.
+    """
+    def decorator(func):
+        REGISTRY[name] = func
+        func.task_name = name
+        return func
+    return decorator
+
+
+def enqueue(name, delay=None, max_attempts=None, **payload):
+    """
+    Постановка задачи в очередь. Строка создается в текущей транзакции: воркеры
+    увидят задачу только после фиксации, а при откате она исчезнет вместе с данными.
+    """
+    from ..models import Task
+
+    return Task.objects.create(
+        name=name,
+        payload=payload,
+        run_after=timezone.now() + timedelta(seconds=delay or 0),
+        max_attempts=max_attempts or getattr(settings, 'TASK_QUEUE_MAX_ATTEMPTS', 5),
+    )
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _ready(now):
+    """Готовые задачи: ожидающие со сроком run_after и взятые, у которых истек таймаут видимости"""
+    from ..models import Task
+
+    return (Q(status=Task.PENDING, run_after__lte=now)
+            | Q(status=Task.RUNNING, locked_until__lt=now))
+
+
+def claim(worker_id, limit=1, now=None):
+    """
+    Взять до limit задач. На БД с SKIP LOCKED (PostgreSQL) — select_for_update;
+    на SQLite — оптимистичный UPDATE с повтором условия готовности: если задачу
+    уже взял другой воркер, обновится 0 строк, и она пропускается.
+    """
+    from ..models import Task
+
+    now = now or timezone.now()
+    lock = {
+        'status': Task.RUNNING,
+        'locked_by': worker_id,
+        'locked_until': now + timedelta(seconds=getattr(settings, 'TASK_QUEUE_VISIBILITY_TIMEOUT', 300)),
+        'attempts': F('attempts') + 1,
+    }
+    ready = Task.objects.filter(_ready(now)).order_by('run_after', 'pk')
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(ready.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            Task.objects.filter(pk__in=ids).update(**lock)
+    else:
+        ids = []
+        for pk in ready.values_list('pk', flat=True)[:limit * 4]:
+            if Task.objects.filter(_ready(now), pk=pk).update(**lock):
+                ids.append(pk)
+                if len(ids) == limit:
+                    break
+    return list(Task.objects.filter(pk__in=ids).order_by('run_after', 'pk'))
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка повтора со случайным разбросом (секунды)"""
+    base = getattr(settings, 'TASK_QUEUE_RETRY_BACKOFF', 10)
+    cap = getattr(settings, 'TASK_QUEUE_RETRY_BACKOFF_MAX', 3600)
+    return min(cap, base * 2 ** max(0, attempts - 1)) * random.uniform(0.5, 1.0)
+
+
+def _fail(task, worker_id, error):
+    from ..models import Task
+
+    now = timezone.now()
+    owned = Task.objects.filter(pk=task.pk, locked_by=worker_id)
+    if task.attempts >= task.max_attempts:
+        owned.update(status=Task.FAILED, finished_at=now, locked_until=None, last_error=error[-4000:])
+        logger.error(f'Task {task.name} #{task.pk} failed after {task.attempts} attempts: {error[-500:]}')
+    else:
+        owned.update(status=Task.PENDING, run_after=now + timedelta(seconds=retry_delay(task.attempts)),
+                     locked_until=None, last_error=error[-4000:])
+        logger.warning(f'Task {task.name} #{task.pk} attempt {task.attempts} failed, will retry')
+
+
+def execute(task, worker_id):
+    """Выполнение взятой задачи; True при успехе"""
+    from ..models import Task
+
+    if task.attempts > task.max_attempts:
+        # Воркер падал на этой задаче, пока таймаут видимости не вернул ее в очередь
+        _fail(task, worker_id, 'Превышено число попыток (таймаут видимости)')
+        return False
+    func = REGISTRY.get(task.name)
+    if func is None:
+        _fail(task, worker_id, f'Неизвестная задача: {task.name}')
+        return False
+    try:
+        with span('task.run', task=task.name, task_id=task.pk, attempt=task.attempts):
+            func(**task.payload)
+    except Exception:
+        _fail(task, worker_id, traceback.format_exc())
+        return False
+    Task.objects.filter(pk=task.pk, locked_by=worker_id).update(
+        status=Task.DONE, finished_at=timezone.now(), locked_until=None, last_error='')
+    return True
+
+
+def run_pending(worker_id=None, limit=None):
+    """Выполнить готовые задачи (без ожидания новых); возвращает число обработанных"""
+    worker_id = worker_id or default_worker_id()
+    processed = 0
+    while limit is None or processed < limit:
+        tasks = claim(worker_id)
+        if not tasks:
+            break
+        execute(tasks[0], worker_id)
+        processed += 1
+    return processed
+
+
+def work(stop_event, worker_id=None, poll_interval=None, burst=False):
+    """
+    Цикл воркера: берет задачи по одной, при пустой очереди ждет poll_interval.
+    burst — выйти, когда очередь опустела. Останавливается по stop_event
+    после завершения текущей задачи.
+    """
+    worker_id = worker_id or default_worker_id()
+    if poll_interval is None:
+        poll_interval = getattr(settings, 'TASK_QUEUE_POLL_INTERVAL', 1.0)
+    processed = 0
+    while not stop_event.is_set():
+        close_old_connections()
+        tasks = claim(worker_id)
+        if tasks:
+            execute(tasks[0], worker_id)
+            processed += 1
+            continue
+        if burst:
+            break
+        stop_event.wait(poll_interval)
+    close_old_connections()
+    return processed
+
+
+def prune_finished(older_than_days, now=None):
+    """Удалить выполненные задачи старше указанного срока; ошибки остаются для разбора"""
+    from ..models import Task
+
+    before = (now or timezone.now()) - timedelta(days=older_than_days)
+    return Task.objects.filter(status=Task.DONE, finished_at__lt=before).delete()[0]
+
@@ -0,0 +1,31 @@
+import io
+
+from django.conf import settings
+
+THUMBNAIL_CONTENT_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+
+
+def make_thumbnail(data, size=None, image_format=None, quality=None):
+    """
+    Уменьшенная копия изображения: (байты, ширина, высота, content_type).
+    Для JPEG используется draft — декодирование сразу в уменьшенном масштабе,
+    без распаковки полноразмерного изображения. Анимированный GIF — первый кадр.
+    """
+    from PIL import Image, ImageOps
+
+    size = size or getattr(settings, 'THUMBNAIL_SIZE', 256)
+    image_format = image_format or getattr(settings, 'THUMBNAIL_FORMAT', 'WEBP')
+    quality = quality or getattr(settings, 'THUMBNAIL_QUALITY', 80)
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        if image_format == 'JPEG' or not has_alpha:
+            image = image.convert('RGB')
+        else:
+            image = image.convert('RGBA')
+        output = io.BytesIO()
+        image.save(output, format=image_format, quality=quality)
+        return output.getvalue(), image.width, image.height, THUMBNAIL_CONTENT_TYPES[image_format]
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import IntegrityError, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .bloom import BloomFilter
+
+
+class RevocationFilter:
+    """
+    Фильтр Блума по jti отозванных токенов в памяти процесса.
+    Отрицательный ответ точен, поэтому неотозванные токены (почти все)
+    проверяются без запроса к БД; положительный перепроверяется по индексу jti.
+
+    Фильтр дочитывает новые записи по возрастанию id не чаще раза в
+    TOKEN_BLACKLIST_SYNC_SECONDS. Повторное использование токена при ротации
+    ловит уникальный индекс при вставке, поэтому окно синхронизации его не пропускает.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.bloom = None
+        self.capacity = 0
+        self.last_id = 0
+        self.synced_at = None
+
+    def _add_rows(self, rows):
+        for pk, jti in rows.order_by('pk').values_list('pk', 'jti').iterator(chunk_size=2000):
+            self.bloom.add(jti)
+            self.last_id = pk
+
+    def _rebuild(self, revoked_tokens):
+        """Новый фильтр по неистекшим записям, с запасом емкости вдвое"""
+        active = revoked_tokens.filter(expires_at__gt=timezone.now())
+        self.capacity = max(getattr(settings, 'TOKEN_BLACKLIST_FILTER_CAPACITY', 100000), active.count() * 2)
+        self.bloom = BloomFilter.create(self.capacity, getattr(settings, 'TOKEN_BLACKLIST_FP_RATE', 0.01))
+        self.last_id = 0
+        self._add_rows(active)
+
+    def sync(self, force=False):
+        from ..models import RevokedToken
+
+        interval = getattr(settings, 'TOKEN_BLACKLIST_SYNC_SECONDS', 5)
+        now = time.monotonic()
+        if not force and self.synced_at is not None and now - self.synced_at < interval:
+            return
+        with self.lock:
+            if self.bloom is None:
+                self._rebuild(RevokedToken.objects)
+            else:
+                self._add_rows(RevokedToken.objects.filter(pk__gt=self.last_id))
+                if len(self.bloom) > self.capacity:
+                    # Переполненный фильтр дает больше ложных срабатываний: пересобираем
+                    self._rebuild(RevokedToken.objects)
+            self.synced_at = now
+
+    def add(self, jti):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def __contains__(self, jti):
+        self.sync()
+        return jti in self.bloom
+
+
+revocation_filter = RevocationFilter()
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting.startswith('TOKEN_BLACKLIST_'):
+        revocation_filter.reset()
+
+
+def is_revoked(jti):
+    """Отозван ли токен: фильтр в памяти, а при попадании — запрос по индексу jti"""
+    from ..models import RevokedToken
+
+    if jti not in revocation_filter:
+        return False
+    return RevokedToken.objects.filter(jti=jti).exists()
+
+
+def revoke(jti, expires_at):
+    """
+    Отзыв токена. Возвращает False, если токен уже был отозван
+    (повторная ротация того же refresh-токена).
+    """
+    from ..models import RevokedToken
+
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+    except IntegrityError:
+        return False
+    revocation_filter.add(jti)
+    return True
+
+
+def prune_expired(batch_size=1000, now=None):
+    """Пакетное удаление истекших записей; возвращает число удаленных"""
+    from ..models import RevokedToken
+
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        batch = list(RevokedToken.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += RevokedToken.objects.filter(pk__in=batch).delete()[0]
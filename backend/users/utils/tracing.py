@@ -0,0 +1,195 @@
+import functools
+import json
+import logging
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('api')
+
+# Текущий (самый вложенный) открытый span в контексте запроса/потока
+_current_span = ContextVar('current_span', default=None)
+
+# Кешированная конфигурация: (включено, экспортер). Сбрасывается при override_settings
+_config = None
+_config_lock = threading.Lock()
+
+
+class JsonLinesExporter:
+    """Экспорт завершенных span'ов в локальный JSON-lines файл (одна строка на span)"""
+
+    def __init__(self, path=None):
+        self.path = path or settings.BASE_DIR / 'logs' / 'traces.jsonl'
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, span_data):
+        line = json.dumps(span_data, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8', buffering=1)
+            self._file.write(line + '\n')
+
+
+class MemoryExporter:
+    """Экспорт в память (для тестов и отладки)"""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span_data):
+        self.spans.append(span_data)
+
+
+class LoggingExporter:
+    """Экспорт в логгер api"""
+
+    def export(self, span_data):
+        logger.info(f"SPAN: {json.dumps(span_data, ensure_ascii=False, default=str)}")
+
+
+def _get_config():
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                enabled = getattr(settings, 'TRACING_ENABLED', False)
+                exporter = None
+                if enabled:
+                    exporter_class = import_string(
+                        getattr(settings, 'TRACING_EXPORTER', 'users.utils.tracing.JsonLinesExporter')
+                    )
+                    exporter = exporter_class(**getattr(settings, 'TRACING_EXPORTER_OPTIONS', {}))
+                _config = (enabled, exporter)
+    return _config
+
+
+def _reset_config(*, setting, **kwargs):
+    global _config
+    if setting.startswith('TRACING_'):
+        _config = None
+
+
+setting_changed.connect(_reset_config)
+
+
+def is_enabled():
+    return _get_config()[0]
+
+
+def get_exporter():
+    return _get_config()[1]
+
+
+def new_id():
+    return uuid.uuid4().hex
+
+
+class Span:
+    """
+    Участок выполнения с замером времени. Используется как контекстный менеджер;
+    вложенные span'ы получают parent_id и trace_id родителя.
+    """
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'attributes',
+                 'start_time', 'duration', 'error', '_start', '_token')
+
+    def __init__(self, name, trace_id=None, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id or new_id()
+        self.span_id = new_id()[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.start_time = None
+        self.duration = None
+        self.error = None
+        self._start = None
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._start
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        try:
+            get_exporter().export(self.to_dict())
+        except Exception as e:
+            logger.error(f"Error exporting span: {str(e)}")
+        return False
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_time': self.start_time,
+            'duration_ms': round(self.duration * 1000, 3),
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+
+class _NoopSpan:
+    """Заглушка при выключенной трассировке: ничего не замеряет и не экспортирует"""
+
+    __slots__ = ()
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name, trace_id=None, **attributes):
+    """
+    Открывает span. Без активного родителя начинается новая трасса
+    (или используется переданный trace_id).
+    """
+    if not _get_config()[0]:
+        return NOOP_SPAN
+    parent = _current_span.get()
+    if parent is not None:
+        return Span(name, trace_id=parent.trace_id, parent_id=parent.span_id, attributes=attributes)
+    return Span(name, trace_id=trace_id, attributes=attributes)
+
+
+def current_span():
+    """Текущий открытый span (или None)"""
+    return _current_span.get()
+
+
+def traced(name):
+    """Декоратор: выполнение функции оборачивается в span с указанным именем"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _get_config()[0]:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
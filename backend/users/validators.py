@@ -1,7 +1,42 @@
+import hashlib
+import os
 import re
+from functools import lru_cache
+
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext as _
 
+from .utils.bloom import BloomFilter
+
+
+def password_fingerprint(password):
+    """
+    Элемент фильтра утекших паролей: SHA-1 (hex, верхний регистр), как в выгрузках
+    Have I Been Pwned, поэтому их можно загружать в фильтр без исходных паролей
+    """
+    return hashlib.sha1(password.encode('utf-8')).hexdigest().upper()
+
+
+@lru_cache(maxsize=2)
+def _open_filter(path, mtime):
+    return BloomFilter.open(path)
+
+
+def get_breached_password_filter(path=None):
+    """
+    Фильтр утекших паролей, отображенный в память (один раз на процесс и версию файла).
+    None, если фильтр еще не собран командой build_password_filter.
+    """
+    path = path or getattr(settings, 'PASSWORD_BLOOM_FILTER_PATH', None)
+    if not path:
+        return None
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _open_filter(str(path), mtime)
+
 
 class PasswordStrengthValidator:
     """
@@ -11,9 +46,11 @@ class PasswordStrengthValidator:
     - Цифры
     - Спецсимволы
     - Отсутствие простых последовательностей
+    - Отсутствие в базе утекших паролей (фильтр Блума, если собран)
     """
 
-    def __init__(self):
+    def __init__(self, breached_filter_path=None):
+        self.breached_filter_path = breached_filter_path
         self.common_sequences = [
             'qwertyuiop', 'asdfghjkl', 'zxcvbnm',
             '1234567890', 'password', 'admin', '12345678',
@@ -51,6 +88,11 @@ class PasswordStrengthValidator:
                     _("Пароль содержит простую последовательность символов: %(sequence)s") % {'sequence': sequence})
                 break
 
+        # Проверка по базе утекших паролей (ложные срабатывания возможны с долей fp_rate фильтра)
+        breached = get_breached_password_filter(self.breached_filter_path)
+        if breached is not None and password_fingerprint(password) in breached:
+            errors.append(_("Этот пароль встречается в утечках данных. Выберите другой пароль."))
+
         if errors:
             raise ValidationError(errors)
 
@@ -61,5 +103,6 @@ class PasswordStrengthValidator:
             "- Заглавные и строчные буквы\n"
             "- Цифры\n"
             "- Специальные символы (!@#$%^&* и т.д.)\n"
-            "- Не должен содержать простых последовательностей (qwerty, 123456 и т.п.)"
+            "- Не должен содержать простых последовательностей (qwerty, 123456 и т.п.)\n"
+            "- Не должен встречаться в известных утечках паролей"
         )
\ No newline at end of file
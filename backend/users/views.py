@@ -2,29 +2,42 @@
 
 from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.db import transaction
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
+from django.http import HttpResponse, FileResponse, Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
 from .models import WeatherData
 from .serializers import WeatherSerializer
 
 # Импортируем модели и сериализаторы
-from .models import CustomUser, UserFile
+from .models import CustomUser, Task, UploadSession, UserFile, UserFilePreview, UserStorageQuota
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
     UserProfileSerializer,
-    FileUploadSerializer
+    FileUploadSerializer,
+    UploadSessionSerializer
 )
 # Импортируем утилиты логирования
+from .tokens import RefreshToken
+from .utils.archive import iter_zip, streaming_content
+from .utils.conditional import conditional_on_user_data
 from .utils.logger import log_user_action, log_api_call, log_security_event
+from .utils.profiling import get_profile_paths
+from .utils.task_queue import enqueue
+from .utils.tracing import span, traced
 
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@traced('view.register')
 def register_view(request):
     """
     Эндпоинт для регистрации нового пользователя (только текстовые данные)
@@ -35,7 +48,12 @@ def register_view(request):
         serializer = UserRegistrationSerializer(data=request.data)
 
         if serializer.is_valid():
-            user = serializer.save()
+            try:
+                user = serializer.save()
+            except ValidationError as e:
+                # Email или имя заняты параллельной регистрацией после проверки
+                log_security_event('registration_failed', request, {'errors': e.detail})
+                return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
 
             log_user_action(user, 'registration_success', {
                 'username': user.username,
@@ -63,6 +81,7 @@ def register_view(request):
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@traced('view.login')
 def login_view(request):
     """
     Эндпоинт для входа пользователя
@@ -79,7 +98,8 @@ def login_view(request):
         if user is not None:
             refresh = RefreshToken.for_user(user)
 
-            log_user_action(user, 'login_success', {'ip': request.META.get('REMOTE_ADDR')})
+            # IP клиента уже есть в контексте запроса
+            log_user_action(user, 'login_success')
 
             return Response({
                 'tokens': {
@@ -101,6 +121,8 @@ def login_view(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@conditional_on_user_data('profile')
+@traced('view.user_profile')
 def user_profile_view(request):
     """
     Получение профиля текущего пользователя
@@ -109,18 +131,49 @@ def user_profile_view(request):
     return Response(serializer.data)
 
 
+def _file_info(user_file):
+    return {
+        'id': user_file.id,
+        'name': user_file.original_name,
+        'size': user_file.file_size,
+        'type': user_file.content_type,
+        'description': user_file.description
+    }
+
+
+def _reserve_quota(request, size):
+    """
+    Резервирование места в квоте (один условный UPDATE, без гонки между проверкой
+    и записью). None при успехе, иначе ответ 413 и событие безопасности.
+    """
+    quota = getattr(settings, 'USER_STORAGE_QUOTA_BYTES', None)
+    if UserStorageQuota.reserve(request.user.pk, size, quota):
+        return None
+    log_security_event('storage_quota_exceeded', request, {'size': size, 'quota': quota})
+    return Response({'error': 'Превышена квота хранилища'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 @parser_classes([MultiPartParser, FormParser])
+@traced('view.file_upload')
 def file_upload_view(request):
     """
     Загрузка файла пользователем (с шифрованием)
     """
-    serializer = FileUploadSerializer(data=request.data)
+    # Разбор multipart-тела происходит лениво при первом обращении к request.data
+    with span('upload.parse_multipart'):
+        data = request.data
+    serializer = FileUploadSerializer(data=data)
     if serializer.is_valid():
         file_obj = serializer.validated_data['file']
         description = serializer.validated_data.get('description', '')
 
+        # Резерв места в квоте (не зависит от числа файлов пользователя)
+        quota_response = _reserve_quota(request, file_obj.size)
+        if quota_response is not None:
+            return quota_response
+
         try:
             # Создаем объект модели
             user_file = UserFile(
@@ -131,9 +184,13 @@ def file_upload_view(request):
                 description=description
             )
             # Передаем данные для шифрования во временный атрибут
-            user_file._file_data = file_obj.read()
-            # Сохраняем (шифрование произойдет в методе save модели)
-            user_file.save()
+            with span('upload.read', bytes=file_obj.size):
+                user_file._file_data = file_obj.read()
+            # Сохраняем (шифрование произойдет в методе save модели); объем файла
+            # учитывается в квоте сигналом, резерв снимается в той же транзакции
+            with transaction.atomic():
+                user_file.save()
+                UserStorageQuota.release(request.user.pk, file_obj.size)
 
             log_user_action(request.user, 'file_upload', {
                 'file_id': user_file.id,
@@ -142,29 +199,129 @@ def file_upload_view(request):
 
             return Response({
                 'message': 'Файл успешно загружен и зашифрован',
-                'file_info': {
-                    'id': user_file.id,
-                    'name': user_file.original_name,
-                    'size': user_file.file_size,
-                    'type': user_file.content_type,
-                    'description': user_file.description
-                }
+                'file_info': _file_info(user_file)
             }, status=status.HTTP_201_CREATED)
 
         except Exception as e:
+            UserStorageQuota.release(request.user.pk, file_obj.size)
             log_security_event('file_upload_error', request, {'error': str(e)})
             return Response({'error': 'Ошибка при сохранении файла'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _session_status(session):
+    received = session.received_chunks()
+    received_set = set(received)
+    return {
+        'id': str(session.id),
+        'name': session.original_name,
+        'size': session.total_size,
+        'chunk_size': session.chunk_size,
+        'chunk_count': session.chunk_count,
+        'received': received,
+        'missing': [index for index in range(session.chunk_count) if index not in received_set],
+        'expires_at': session.expires_at,
+    }
+
+
+def _get_upload_session(request, session_id):
+    return get_object_or_404(UploadSession, id=session_id, user=request.user, expires_at__gt=timezone.now())
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@traced('view.upload_session_create')
+def upload_session_create_view(request):
+    """
+    Начало загрузки по частям: клиент сообщает имя, размер и тип файла и получает
+    id сессии и размер части. Части отправляются PUT на uploads/<id>/chunks/<смещение>/.
+    """
+    serializer = UploadSessionSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    # Место резервируется на все время сессии и освобождается при ее удалении
+    quota_response = _reserve_quota(request, data['size'])
+    if quota_response is not None:
+        return quota_response
+
+    session = UploadSession.objects.create(
+        user=request.user,
+        original_name=data['name'],
+        content_type=data['content_type'],
+        description=data.get('description', ''),
+        total_size=data['size'],
+        chunk_size=getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 1024 * 1024),
+    )
+    return Response(_session_status(session), status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([permissions.IsAuthenticated])
+@traced('view.upload_session')
+def upload_session_view(request, session_id):
+    """Состояние загрузки (какие части получены) для возобновления; DELETE — отмена"""
+    session = _get_upload_session(request, session_id)
+    if request.method == 'DELETE':
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(_session_status(session))
+
+
+@api_view(['PUT'])
+@permission_classes([permissions.IsAuthenticated])
+@traced('view.upload_chunk')
+def upload_chunk_view(request, session_id, offset):
+    """
+    Прием одной части (тело запроса — сырые байты, application/octet-stream).
+    Часть сразу шифруется в отдельный сегмент, в памяти не больше одной части.
+    """
+    session = _get_upload_session(request, session_id)
+    # Тело не разбирается парсерами DRF: размер ограничен DATA_UPLOAD_MAX_MEMORY_SIZE
+    data = request.body
+    try:
+        segment = session.store_chunk(offset, data)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'index': segment.index, 'offset': offset, 'size': segment.size})
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@traced('view.upload_complete')
+def upload_complete_view(request, session_id):
+    """Завершение загрузки: проверка частей и создание файла"""
+    # Место в квоте зарезервировано при создании сессии
+    session = _get_upload_session(request, session_id)
+    try:
+        user_file = session.finalize()
+    except ValueError as e:
+        return Response({'error': str(e), 'missing': session.missing_chunks()}, status=status.HTTP_409_CONFLICT)
+
+    log_user_action(request.user, 'file_upload', {
+        'file_id': user_file.id,
+        'name': user_file.original_name,
+        'segments': user_file.segment_count,
+    })
+    return Response({
+        'message': 'Файл успешно загружен и зашифрован',
+        'file_info': _file_info(user_file),
+    }, status=status.HTTP_201_CREATED)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@conditional_on_user_data('files')
+@traced('view.user_files')
 def user_files_view(request):
     """
     Эндпоинт для получения списка файлов пользователя (метаданные)
     """
-    files = UserFile.objects.filter(user=request.user)
+    # Содержимое файлов для списка не нужно
+    files = UserFile.objects.filter(user=request.user).only(
+        'id', 'original_name', 'file_size', 'content_type', 'description', 'uploaded_at', 'metadata'
+    )
 
     files_data = [{
         'id': f.id,
@@ -172,7 +329,9 @@ def user_files_view(request):
         'size': f.file_size,
         'type': f.content_type,
         'description': f.description,
-        'uploaded_at': f.uploaded_at
+        'uploaded_at': f.uploaded_at,
+        # Для аудио — длительность и пики волны (появляются после обработки воркером)
+        'metadata': f.metadata,
     } for f in files]
 
     return Response(files_data)
@@ -180,6 +339,7 @@ def user_files_view(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@traced('view.download_file')
 def download_file_view(request, file_id):
     """
     Расшифровывает и отдает контент файла для просмотра/воспроизведения.
@@ -189,11 +349,17 @@ def download_file_view(request, file_id):
     user_file = get_object_or_404(UserFile, id=file_id, user=request.user)
 
     try:
-        # Дешифруем данные (возвращает bytes)
-        decrypted_content = user_file.get_decrypted_data()
-
-        # Формируем HTTP ответ с правильным Content-Type (например, image/jpeg)
-        response = HttpResponse(decrypted_content, content_type=user_file.content_type)
+        if user_file.segment_count:
+            # Файл, загруженный по частям, отдается по сегменту: в памяти не весь файл
+            response = StreamingHttpResponse(
+                streaming_content(request, user_file.iter_decrypted_segments()),
+                content_type=user_file.content_type,
+            )
+            response['Content-Length'] = str(user_file.file_size)
+        else:
+            # Дешифруем данные (возвращает bytes) и формируем HTTP ответ
+            # с правильным Content-Type (например, image/jpeg)
+            response = HttpResponse(user_file.get_decrypted_data(), content_type=user_file.content_type)
 
         # Заголовок inline говорит браузеру попытаться открыть файл (показать картинку/плеер),
         # а не предлагать сразу скачать его на диск.
@@ -208,6 +374,87 @@ def download_file_view(request, file_id):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@traced('view.files_archive')
+def files_archive_view(request):
+    """
+    ZIP-архив файлов пользователя: ?ids=1,2,3 или ?ids=all.
+    Архив формируется по ходу отдачи, без временных файлов и без буферизации
+    файлов целиком (см. users.utils.archive.iter_zip).
+    """
+    ids = request.query_params.get('ids', '')
+    files = UserFile.objects.filter(user=request.user)
+    if ids != 'all':
+        try:
+            id_list = {int(file_id) for file_id in ids.split(',') if file_id.strip()}
+        except ValueError:
+            return Response({'error': 'ids: список id через запятую или all'}, status=status.HTTP_400_BAD_REQUEST)
+        if not id_list:
+            return Response({'error': 'Не указаны файлы'}, status=status.HTTP_400_BAD_REQUEST)
+        files = files.filter(id__in=id_list)
+        if files.count() != len(id_list):
+            raise Http404('Файл не найден')
+
+    # Содержимое каждого файла загружается только в момент его записи в архив
+    files = files.only('id', 'original_name', 'file_size', 'segment_count', 'uploaded_at').order_by('id')
+    log_user_action(request.user, 'files_archive', {'ids': ids})
+
+    response = StreamingHttpResponse(
+        streaming_content(request, iter_zip(files.iterator(chunk_size=100))),
+        content_type='application/zip',
+    )
+    response['Content-Disposition'] = 'attachment; filename="files.zip"'
+    return response
+
+
+def _thumbnail_etag_value(file_id, generated_at):
+    return f'"thumb-{file_id}-{int(generated_at.timestamp() * 1000)}"'
+
+
+def _thumbnail_etag(request, file_id):
+    """ETag миниатюры по времени ее создания: индексный запрос без чтения блоба"""
+    generated_at = UserFilePreview.objects.filter(file_id=file_id, file__user=request.user).values_list(
+        'generated_at', flat=True).first()
+    return _thumbnail_etag_value(file_id, generated_at) if generated_at else None
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@condition(etag_func=_thumbnail_etag)
+@traced('view.file_thumbnail')
+def file_thumbnail_view(request, file_id):
+    """
+    Миниатюра изображения для галереи. Ее строит только воркер очереди: расшифровка
+    и декодирование исходника в запросе заняли бы поток сервера.
+    Пока задача не выполнена - 202 с Retry-After (задача ставится, если ее нет).
+    Не-изображения, файлы больше THUMBNAIL_MAX_SOURCE_BYTES и файлы, для которых
+    задача завершилась без миниатюры, - 404.
+    """
+    user_file = get_object_or_404(UserFile.objects.defer('encrypted_data'), id=file_id, user=request.user)
+    preview = UserFilePreview.objects.filter(file=user_file).first()
+    if preview is None:
+        if not UserFilePreview.can_generate(user_file):
+            raise Http404('Миниатюра недоступна')
+        statuses = set(Task.objects.filter(
+            name='files.generate_thumbnail', payload={'file_id': user_file.pk}).values_list('status', flat=True))
+        if not statuses & {Task.PENDING, Task.RUNNING}:
+            if statuses:
+                raise Http404('Миниатюра недоступна')
+            enqueue('files.generate_thumbnail', file_id=user_file.pk)
+        response = Response({'detail': 'Миниатюра готовится'}, status=status.HTTP_202_ACCEPTED)
+        response['Retry-After'] = str(getattr(settings, 'THUMBNAIL_RETRY_AFTER', 2))
+        return response
+
+    response = HttpResponse(preview.get_decrypted_thumbnail(), content_type=preview.content_type)
+    response['ETag'] = _thumbnail_etag_value(file_id, preview.generated_at)
+    # Ответ зависит от пользователя: только кеш браузера
+    patch_vary_headers(response, ('Authorization',))
+    patch_cache_control(response, private=True, max_age=getattr(settings, 'THUMBNAIL_CACHE_MAX_AGE', 0))
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@traced('view.weather')
 def weather_view(request):
     """
     Возвращает текущую погоду и историю наблюдений
@@ -219,4 +466,31 @@ def weather_view(request):
     return Response({
         'current': current_weather,
         'history': history_data[::-1]
-    })
\ No newline at end of file
+    })
+
+
+def _get_profile_file(profile_id, index):
+    paths = get_profile_paths(profile_id)
+    if paths is None or not paths[index].exists():
+        raise Http404('Профиль не найден')
+    return paths[index]
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_summary_view(request, profile_id):
+    """
+    Сводка сохраненного профиля запроса (топ функций, SQL, время шифрования)
+    """
+    summary_path = _get_profile_file(profile_id, 1)
+    return FileResponse(open(summary_path, 'rb'), content_type='application/json')
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_download_view(request, profile_id):
+    """
+    Скачивание pstats-дампа профиля (открывается через pstats / snakeviz)
+    """
+    prof_path = _get_profile_file(profile_id, 0)
+    return FileResponse(open(prof_path, 'rb'), as_attachment=True, filename=prof_path.name)